@@ -0,0 +1,90 @@
+"""sync schema: snapshot_id, sync_jobs, connected_services stats, response_validators, api_quota_usage
+
+Revision ID: 0000_sync_schema
+Revises:
+Create Date: 2026-10-18 11:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0000_sync_schema"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Базы, поднятые через init_db (create_all), уже содержат часть этого — всё создаём только при отсутствии
+COLUMNS = [
+    ("user_playlists", sa.Column("snapshot_id", sa.String(), nullable=True)),
+    ("connected_services", sa.Column("stats", sa.JSON(), nullable=True)),
+    ("connected_services", sa.Column("stats_updated_at", sa.DateTime(), nullable=True)),
+]
+
+ACTIVE = sa.text("status IN ('queued', 'running')")
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    for table, column in COLUMNS:
+        if column.name not in {c["name"] for c in inspector.get_columns(table)}:
+            op.add_column(table, column)
+
+    if "sync_jobs" not in tables:
+        op.create_table(
+            "sync_jobs",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("platform", sa.String(), nullable=False),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("max_attempts", sa.Integer(), nullable=False),
+            sa.Column("error", sa.String()),
+            sa.Column("run_after", sa.DateTime()),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("started_at", sa.DateTime()),
+            sa.Column("finished_at", sa.DateTime()),
+        )
+        op.create_index(
+            "uq_sync_job_active", "sync_jobs", ["user_id", "platform"], unique=True,
+            postgresql_where=ACTIVE, sqlite_where=ACTIVE,
+        )
+
+    if "response_validators" not in tables:
+        op.create_table(
+            "response_validators",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("platform", sa.String(), nullable=False),
+            sa.Column("url_hash", sa.String(64), nullable=False),
+            sa.Column("url", sa.String(), nullable=False),
+            sa.Column("etag", sa.String(), nullable=False),
+            sa.Column("body", sa.JSON(), nullable=False),
+            sa.Column("updated_at", sa.DateTime()),
+            sa.UniqueConstraint("user_id", "platform", "url_hash", name="uq_validator_account_url"),
+        )
+
+    if "api_quota_usage" not in tables:
+        op.create_table(
+            "api_quota_usage",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("platform", sa.String(), nullable=False),
+            sa.Column("day", sa.Date(), nullable=False),
+            sa.Column("units", sa.Integer(), nullable=False),
+            sa.Column("updated_at", sa.DateTime()),
+            sa.UniqueConstraint("platform", "day", name="uq_quota_platform_day"),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("api_quota_usage")
+    op.drop_table("response_validators")
+    op.drop_index("uq_sync_job_active", table_name="sync_jobs")
+    op.drop_table("sync_jobs")
+    for table, column in reversed(COLUMNS):
+        op.drop_column(table, column.name)
@@ -0,0 +1,69 @@
+"""hot path indexes, unique connected_services (user_id, platform)
+
+Revision ID: 0001_hot_path_indexes
+Revises: 0000_sync_schema
+Create Date: 2026-10-18 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_hot_path_indexes"
+down_revision: Union[str, None] = "0000_sync_schema"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (имя, таблица, колонки) — фильтры синхронизации и API, которые без индексов уходят в seq scan
+INDEXES = [
+    ("ix_tracks_title_artist", "tracks", ["title", "artist"]),
+    ("ix_user_playlists_user_platform_external", "user_playlists", ["user_id", "source_platform", "external_id"]),
+    ("ix_playlist_tracks_playlist_order", "playlist_tracks", ["playlist_id", "order_index", "id"]),
+    ("ix_user_favorites_user_platform", "user_favorites", ["user_id", "platform"]),
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    is_postgres = bind.dialect.name == "postgresql"
+
+    # Дубли подключений (add_connected_service раньше всегда вставлял строку) — оставляем последнее
+    op.execute(
+        "DELETE FROM connected_services WHERE id NOT IN ("
+        "SELECT MAX(id) FROM connected_services GROUP BY user_id, platform)"
+    )
+    # Связи, записанные до диффа плейлистов, могли остаться без order_index — нумеруем их,
+    # чтобы keyset-курсор по (order_index, id) проходил весь плейлист. UPDATE ... FROM и
+    # NULLS LAST понимают и Postgres, и sqlite (3.33+)
+    op.execute(
+        "UPDATE playlist_tracks SET order_index = r.rn - 1 FROM ("
+        "SELECT id, row_number() OVER (PARTITION BY playlist_id ORDER BY order_index NULLS LAST, id) AS rn "
+        "FROM playlist_tracks WHERE playlist_id IN "
+        "(SELECT DISTINCT playlist_id FROM playlist_tracks WHERE order_index IS NULL)"
+        ") r WHERE playlist_tracks.id = r.id"
+    )
+
+    existing = {c["name"] for c in sa.inspect(bind).get_unique_constraints("connected_services")}
+    if "uq_connected_service_user_platform" not in existing:
+        # batch: sqlite не умеет ALTER ... ADD CONSTRAINT и пересобирает таблицу, Postgres — обычный ALTER
+        with op.batch_alter_table("connected_services") as batch:
+            batch.create_unique_constraint("uq_connected_service_user_platform", ["user_id", "platform"])
+
+    if is_postgres:
+        # CONCURRENTLY не блокирует запись в таблицы на время построения, но не работает в транзакции
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
+    with op.batch_alter_table("connected_services") as batch:
+        batch.drop_constraint("uq_connected_service_user_platform", type_="unique")
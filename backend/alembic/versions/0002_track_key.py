@@ -0,0 +1,99 @@
+"""tracks.track_key: normalized identity key with unique index
+
+Revision ID: 0002_track_key
+Revises: 0001_hot_path_indexes
+Create Date: 2026-10-18 13:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.track_key import track_key
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_track_key"
+down_revision: Union[str, None] = "0001_hot_path_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH = 1000
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if "track_key" not in {c["name"] for c in sa.inspect(bind).get_columns("tracks")}:
+        op.add_column("tracks", sa.Column("track_key", sa.String(), nullable=True))
+
+    # Ключи считаются в Python той же функцией, что и при синхронизации
+    tracks = sa.table("tracks", sa.column("id"), sa.column("title"), sa.column("artist"),
+                      sa.column("duration"), sa.column("track_key"))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(tracks.c.id, tracks.c.title, tracks.c.artist, tracks.c.duration)
+            .where(tracks.c.id > last_id)
+            .order_by(tracks.c.id)
+            .limit(BATCH)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            tracks.update().where(tracks.c.id == sa.bindparam("row_id")).values(track_key=sa.bindparam("key")),
+            [{"row_id": row.id, "key": track_key(row.title, row.artist, row.duration)} for row in rows],
+        )
+        last_id = rows[-1].id
+
+    # Дубли по ключу сливаем в самую раннюю строку: связи переносим, конфликтующие удаляем
+    op.execute(
+        "CREATE TEMPORARY TABLE track_merge AS "
+        "SELECT id AS old_id, MIN(id) OVER (PARTITION BY track_key) AS new_id FROM tracks"
+    )
+    op.execute("DELETE FROM track_merge WHERE old_id = new_id")
+    op.execute(
+        "DELETE FROM playlist_tracks WHERE id IN ("
+        "SELECT pt.id FROM playlist_tracks pt JOIN track_merge m ON pt.track_id = m.old_id "
+        "WHERE EXISTS (SELECT 1 FROM playlist_tracks keep "
+        "WHERE keep.playlist_id = pt.playlist_id AND keep.track_id = m.new_id))"
+    )
+    # Один и тот же трек мог быть в плейлисте под несколькими дублями — оставляем первую связь
+    op.execute(
+        "DELETE FROM playlist_tracks WHERE id IN ("
+        "SELECT pt.id FROM playlist_tracks pt JOIN track_merge m ON pt.track_id = m.old_id "
+        "WHERE EXISTS (SELECT 1 FROM playlist_tracks other JOIN track_merge om ON other.track_id = om.old_id "
+        "WHERE other.playlist_id = pt.playlist_id AND om.new_id = m.new_id AND other.id < pt.id))"
+    )
+    op.execute(
+        "UPDATE playlist_tracks SET track_id = ("
+        "SELECT new_id FROM track_merge WHERE old_id = playlist_tracks.track_id) "
+        "WHERE track_id IN (SELECT old_id FROM track_merge)"
+    )
+    op.execute(
+        "DELETE FROM tracks_availability WHERE id IN ("
+        "SELECT ta.id FROM tracks_availability ta JOIN track_merge m ON ta.track_id = m.old_id "
+        "WHERE EXISTS (SELECT 1 FROM tracks_availability keep "
+        "WHERE keep.platform = ta.platform AND keep.track_id = m.new_id))"
+    )
+    op.execute(
+        "DELETE FROM tracks_availability WHERE id IN ("
+        "SELECT ta.id FROM tracks_availability ta JOIN track_merge m ON ta.track_id = m.old_id "
+        "WHERE EXISTS (SELECT 1 FROM tracks_availability other JOIN track_merge om ON other.track_id = om.old_id "
+        "WHERE other.platform = ta.platform AND om.new_id = m.new_id AND other.id < ta.id))"
+    )
+    op.execute(
+        "UPDATE tracks_availability SET track_id = ("
+        "SELECT new_id FROM track_merge WHERE old_id = tracks_availability.track_id) "
+        "WHERE track_id IN (SELECT old_id FROM track_merge)"
+    )
+    op.execute("DELETE FROM tracks WHERE id IN (SELECT old_id FROM track_merge)")
+    op.execute("DROP TABLE track_merge")
+
+    op.create_index("uq_tracks_track_key", "tracks", ["track_key"], unique=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    # Слитые дубли не восстанавливаются — убираем только индекс и колонку
+    op.drop_index("uq_tracks_track_key", table_name="tracks", if_exists=True)
+    op.drop_column("tracks", "track_key")
@@ -0,0 +1,36 @@
+"""tracks.isrc with unique index
+
+Revision ID: 0003_track_isrc
+Revises: 0002_track_key
+Create Date: 2026-10-18 14:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_track_isrc"
+down_revision: Union[str, None] = "0002_track_key"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if "isrc" not in {c["name"] for c in sa.inspect(bind).get_columns("tracks")}:
+        op.add_column("tracks", sa.Column("isrc", sa.String(), nullable=True))
+    # Колонка новая и пустая — ISRC заполнятся при следующих синхронизациях Spotify
+    if bind.dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index("uq_tracks_isrc", "tracks", ["isrc"], unique=True,
+                            if_not_exists=True, postgresql_concurrently=True)
+    else:
+        op.create_index("uq_tracks_isrc", "tracks", ["isrc"], unique=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("uq_tracks_isrc", table_name="tracks", if_exists=True)
+    op.drop_column("tracks", "isrc")
@@ -0,0 +1,35 @@
+"""pg_trgm and tsvector search indexes over tracks
+
+Revision ID: 0004_track_search_index
+Revises: 0003_track_isrc
+Create Date: 2026-10-18 15:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.services.track_search import SEARCH_INDEX_DDL
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_track_search_index"
+down_revision: Union[str, None] = "0003_track_isrc"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Только Postgres: на остальных СУБД поиск идёт по индексу в памяти (services/track_search.py)
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    with op.get_context().autocommit_block():
+        for ddl in SEARCH_INDEX_DDL:
+            op.execute(ddl)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_tracks_search_tsv")
+    op.execute("DROP INDEX IF EXISTS ix_tracks_search_trgm")
@@ -0,0 +1,32 @@
+"""tracks_availability (platform, last_checked_at) index for the re-check scheduler
+
+Revision ID: 0005_availability_recheck_index
+Revises: 0004_track_search_index
+Create Date: 2026-10-18 16:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_availability_recheck_index"
+down_revision: Union[str, None] = "0004_track_search_index"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NAME = "ix_tracks_availability_platform_checked"
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index(NAME, "tracks_availability", ["platform", "last_checked_at"],
+                            if_not_exists=True, postgresql_concurrently=True)
+    else:
+        op.create_index(NAME, "tracks_availability", ["platform", "last_checked_at"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index(NAME, table_name="tracks_availability", if_exists=True)
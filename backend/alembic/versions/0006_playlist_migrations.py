@@ -0,0 +1,58 @@
+"""playlist_migrations: cross-platform playlist transfer jobs
+
+Revision ID: 0006_playlist_migrations
+Revises: 0005_availability_recheck_index
+Create Date: 2026-10-18 17:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_playlist_migrations"
+down_revision: Union[str, None] = "0005_availability_recheck_index"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE = sa.text("status IN ('queued', 'running')")
+
+
+def upgrade() -> None:
+    # init_db (create_all) мог уже создать таблицу
+    if "playlist_migrations" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "playlist_migrations",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("playlist_id", sa.Integer(), sa.ForeignKey("user_playlists.id"), nullable=False),
+        sa.Column("target_platform", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("stage", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("max_attempts", sa.Integer(), nullable=False),
+        sa.Column("total_tracks", sa.Integer(), nullable=False),
+        sa.Column("matched_tracks", sa.Integer(), nullable=False),
+        sa.Column("added_tracks", sa.Integer(), nullable=False),
+        sa.Column("searched_track_ids", sa.JSON(), nullable=True),
+        sa.Column("missing_track_ids", sa.JSON(), nullable=True),
+        sa.Column("target_ids", sa.JSON(), nullable=True),
+        sa.Column("target_playlist_id", sa.String(), nullable=True),
+        sa.Column("error", sa.String()),
+        sa.Column("run_after", sa.DateTime()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("started_at", sa.DateTime()),
+        sa.Column("finished_at", sa.DateTime()),
+    )
+    op.create_index(
+        "uq_playlist_migration_active", "playlist_migrations", ["playlist_id", "target_platform"], unique=True,
+        postgresql_where=ACTIVE, sqlite_where=ACTIVE,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_playlist_migration_active", table_name="playlist_migrations")
+    op.drop_table("playlist_migrations")
@@ -0,0 +1,36 @@
+"""playlist_migrations: record platform writes before sending them
+
+Revision ID: 0007_migration_write_progress
+Revises: 0006_playlist_migrations
+Create Date: 2026-10-18 18:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007_migration_write_progress"
+down_revision: Union[str, None] = "0006_playlist_migrations"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = [
+    sa.Column("known_playlist_ids", sa.JSON(), nullable=True),
+    sa.Column("pending_add", sa.Integer(), nullable=True),
+]
+
+
+def upgrade() -> None:
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("playlist_migrations")}
+    for column in COLUMNS:
+        if column.name not in existing:
+            op.add_column("playlist_migrations", column)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("playlist_migrations") as batch:
+        for column in reversed(COLUMNS):
+            batch.drop_column(column.name)
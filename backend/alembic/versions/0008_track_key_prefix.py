@@ -0,0 +1,42 @@
+"""tracks.key_prefix: indexed "artist|title|" part of track_key
+
+Revision ID: 0008_track_key_prefix
+Revises: 0007_migration_write_progress
+Create Date: 2026-10-18 19:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008_track_key_prefix"
+down_revision: Union[str, None] = "0007_migration_write_progress"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NAME = "ix_tracks_key_prefix"
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if "key_prefix" not in {c["name"] for c in sa.inspect(bind).get_columns("tracks")}:
+        op.add_column("tracks", sa.Column("key_prefix", sa.String(), nullable=True))
+    # Корзина длительности — цифры после последнего "|" (или пусто): без неё остаётся префикс
+    op.execute(
+        "UPDATE tracks SET key_prefix = rtrim(track_key, '0123456789') "
+        "WHERE key_prefix IS NULL AND track_key IS NOT NULL"
+    )
+    if bind.dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index(NAME, "tracks", ["key_prefix"], if_not_exists=True, postgresql_concurrently=True)
+    else:
+        op.create_index(NAME, "tracks", ["key_prefix"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index(NAME, table_name="tracks", if_exists=True)
+    with op.batch_alter_table("tracks") as batch:
+        batch.drop_column("key_prefix")
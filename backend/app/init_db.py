@@ -1,5 +1,7 @@
 from app.database import engine
 from app.models import Base
+from app.services.track_search import ensure_search_indexes
 
 def init_db():
     Base.metadata.create_all(bind = engine)
+    ensure_search_indexes(engine)
@@ -1,11 +1,15 @@
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
-from app.routers import auth, favorites, oauth, connected_services, playlists, yandex_music, youtube
+from app.routers import auth, favorites, oauth, connected_services, playlists, yandex_music, youtube, sync_jobs, migrations, search, availability
 from fastapi.openapi.utils import get_openapi
+from app.services.youtube_quota import QuotaExceeded
+from app.services.resilience import PlatformUnavailable
 import os
 import logging
 import time
+from datetime import datetime
 
 app = FastAPI(title="Orbitune API")
 
@@ -44,6 +48,26 @@ async def log_requests(request: Request, call_next):
         logging.error(f"Request failed: {request.method} {request.url.path} in {process_time:.3f}s - Error: {str(e)}")
         raise
 
+# Квота YouTube исчерпана для приоритета запроса — 429 со временем сброса
+@app.exception_handler(QuotaExceeded)
+async def quota_exceeded_handler(request: Request, exc: QuotaExceeded):
+    retry_after = max(int((exc.retry_at - datetime.utcnow()).total_seconds()), 1)
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "retry_at": exc.retry_at.isoformat()},
+        headers={"Retry-After": str(retry_after)},
+    )
+
+# Breaker платформы открыт — 503, пока она не поднимется
+@app.exception_handler(PlatformUnavailable)
+async def platform_unavailable_handler(request: Request, exc: PlatformUnavailable):
+    retry_after = max(int((exc.retry_at - datetime.utcnow()).total_seconds()), 1)
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "retry_at": exc.retry_at.isoformat()},
+        headers={"Retry-After": str(retry_after)},
+    )
+
 app.include_router(auth.router, prefix="/auth", tags=["Auth"])
 app.include_router(favorites.router, prefix="/favorites", tags=["Favorites"])
 app.include_router(oauth.router)
@@ -51,6 +75,10 @@ app.include_router(connected_services.router)
 app.include_router(playlists.router, prefix="/playlists", tags=["Playlists"])
 app.include_router(yandex_music.router)
 app.include_router(youtube.router)
+app.include_router(sync_jobs.router)
+app.include_router(migrations.router)
+app.include_router(search.router)
+app.include_router(availability.router)
 
 @app.get("/", include_in_schema=False)
 def root():
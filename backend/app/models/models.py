@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, String, Integer, Boolean, DateTime, ForeignKey, UniqueConstraint, JSON
+    Column, String, Integer, Boolean, Date, DateTime, ForeignKey, UniqueConstraint, JSON, Index, text
 ) 
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.dialects.postgresql import JSONB
@@ -34,9 +34,13 @@ class ConnectedService(Base):
     refresh_token = Column(String)
     expires_at = Column(DateTime)
     sync = Column(Boolean, default=True)
+    stats = Column(JSON, nullable=True)
+    stats_updated_at = Column(DateTime, nullable=True)
 
     user = relationship('User', back_populates='connected_services')
 
+    __table_args__ = (UniqueConstraint("user_id", "platform", name="uq_connected_service_user_platform"),)
+
 class UserFavorite(Base):
     __tablename__ = 'user_favorites'
 
@@ -53,6 +57,8 @@ class UserFavorite(Base):
 
     user = relationship('User', back_populates='favorites')
 
+    __table_args__ = (Index("ix_user_favorites_user_platform", "user_id", "platform"),)
+
 
 class UserPlaylist(Base):
     __tablename__ = 'user_playlists'
@@ -67,12 +73,17 @@ class UserPlaylist(Base):
     is_public = Column(Boolean, default=False)
     tracks_number = Column(Integer, nullable=False)
     image_url = Column(String)
+    snapshot_id = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship('User', back_populates='playlists')
     tracks = relationship('PlaylistTrack', back_populates='playlist')
 
+    __table_args__ = (
+        Index("ix_user_playlists_user_platform_external", "user_id", "source_platform", "external_id"),
+    )
+
 
 class PlaylistTrack(Base):
     __tablename__ = 'playlist_tracks'
@@ -87,7 +98,11 @@ class PlaylistTrack(Base):
     playlist = relationship('UserPlaylist', back_populates='tracks')
     track = relationship('Track', back_populates='playlist_tracks')
 
-    __table_args__ = (UniqueConstraint("playlist_id", "track_id", name="uq_track_per_playlist"),)
+    __table_args__ = (
+        UniqueConstraint("playlist_id", "track_id", name="uq_track_per_playlist"),
+        # Порядок треков плейлиста и keyset-курсор /playlists/{id}/tracks
+        Index("ix_playlist_tracks_playlist_order", "playlist_id", "order_index", "id"),
+    )
 
 
 class Track(Base):
@@ -99,11 +114,24 @@ class Track(Base):
     album = Column(String)
     duration = Column(Integer)
     image_url = Column(String)
+    # Нормализованный ключ (services/track_key.py): по нему треки дедуплицируются между платформами
+    track_key = Column(String, nullable=True)
+    # "artist|title|" из track_key — строки одной записи с любой длительностью (индексируемый IN)
+    key_prefix = Column(String, nullable=True)
+    # ISRC записи (пока отдаёт только Spotify) — точное совпадение, проверяется раньше track_key
+    isrc = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     availability = relationship("TrackAvailability", back_populates="track")
     playlist_tracks = relationship("PlaylistTrack", back_populates="track")
 
+    __table_args__ = (
+        Index("ix_tracks_title_artist", "title", "artist"),
+        Index("uq_tracks_track_key", "track_key", unique=True),
+        Index("ix_tracks_key_prefix", "key_prefix"),
+        Index("uq_tracks_isrc", "isrc", unique=True),
+    )
+
 
 class TrackAvailability(Base):
     __tablename__ = "tracks_availability"
@@ -118,5 +146,97 @@ class TrackAvailability(Base):
 
     track = relationship("Track", back_populates="availability")
 
-    __table_args__ = (UniqueConstraint("track_id", "platform", name="uq_track_platform"),)
+    __table_args__ = (
+        UniqueConstraint("track_id", "platform", name="uq_track_platform"),
+        # Выбор самых давно проверенных строк платформы (services/availability_recheck.py)
+        Index("ix_tracks_availability_platform_checked", "platform", "last_checked_at"),
+    )
+
+
+class SyncJob(Base):
+    __tablename__ = "sync_jobs"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    platform = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued / running / done / failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    error = Column(String)
+    run_after = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    # Не больше одной активной задачи на (user, platform) — повторные запуски схлопываются в неё
+    __table_args__ = (
+        Index(
+            "uq_sync_job_active", "user_id", "platform", unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+            sqlite_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+
+class ResponseValidator(Base):
+    __tablename__ = "response_validators"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    platform = Column(String, nullable=False)  # как в connected_services
+    url_hash = Column(String(64), nullable=False)  # sha256 от URL — сам URL бывает слишком длинным для индекса
+    url = Column(String, nullable=False)
+    etag = Column(String, nullable=False)
+    body = Column(JSON, nullable=False)  # тело последнего ответа 200 — его отдаём на 304
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (UniqueConstraint("user_id", "platform", "url_hash", name="uq_validator_account_url"),)
+
+
+class ApiQuotaUsage(Base):
+    __tablename__ = "api_quota_usage"
+
+    id = Column(Integer, primary_key=True)
+    platform = Column(String, nullable=False)
+    day = Column(Date, nullable=False)  # сутки квоты платформы (у YouTube — по тихоокеанскому времени)
+    units = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (UniqueConstraint("platform", "day", name="uq_quota_platform_day"),)
+
 
+class PlaylistMigration(Base):
+    __tablename__ = "playlist_migrations"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    playlist_id = Column(Integer, ForeignKey("user_playlists.id"), nullable=False)
+    target_platform = Column(String, nullable=False)  # ключ сервиса: spotify / yandex / youtube
+    status = Column(String, nullable=False, default="queued")  # queued / running / done / failed
+    stage = Column(String, nullable=False, default="resolving")  # resolving / creating / adding / done
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    total_tracks = Column(Integer, nullable=False, default=0)
+    matched_tracks = Column(Integer, nullable=False, default=0)
+    added_tracks = Column(Integer, nullable=False, default=0)  # сколько из target_ids уже добавлено — точка продолжения
+    searched_track_ids = Column(JSON, nullable=True)  # уже искали на платформе (найденные — в tracks_availability)
+    missing_track_ids = Column(JSON, nullable=True)   # не нашлись на целевой платформе
+    target_ids = Column(JSON, nullable=True)          # внешние id для добавления, в порядке плейлиста
+    target_playlist_id = Column(String, nullable=True)
+    # Запись на платформу фиксируется до запроса: повтор после падения не создаёт дубли
+    known_playlist_ids = Column(JSON, nullable=True)  # одноимённые плейлисты аккаунта до create; не NULL — create отправлялся
+    pending_add = Column(Integer, nullable=True)      # размер отправленной, но не подтверждённой пачки добавления
+    error = Column(String)
+    run_after = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    # Как у sync_jobs: один активный перенос плейлиста на платформу
+    __table_args__ = (
+        Index(
+            "uq_playlist_migration_active", "playlist_id", "target_platform", unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+            sqlite_where=text("status IN ('queued', 'running')"),
+        ),
+    )
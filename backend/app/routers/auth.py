@@ -1,14 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Response, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.routers.crud import create_user, get_user_by_email, get_user_by_nickname
+from app.routers.crud import create_user, get_user_by_email, get_user_by_nickname, get_connected_services
 from passlib.hash import bcrypt
 import random
 from email_validator import validate_email, EmailNotValidError
 from pydantic import BaseModel
 import logging
 import json
-from app.models.models import ConnectedService
+from app.services.platforms.platforms import CONNECTION_PLATFORMS
+from app.services.sync_jobs import enqueue_sync
 
 router = APIRouter()
 
@@ -70,7 +71,7 @@ async def register(data: RegisterRequest, request: Request, response: Response,
     return {"user": {"id": user.id, "email": user.email, "nickname": user.nickname, "is_admin": user.is_admin}}
 
 @router.post("/login")
-async def login(data: LoginRequest, request: Request, response: Response, db: Session = Depends(get_db), background_tasks: BackgroundTasks = None):
+async def login(data: LoginRequest, request: Request, response: Response, db: Session = Depends(get_db)):
     try:
         logging.info(f"[LOGIN] Received: {data}")
         email = data.email
@@ -88,22 +89,11 @@ async def login(data: LoginRequest, request: Request, response: Response, db: Se
         request.session["user_id"] = user.id
         request.session["user_email"] = user.email
         request.session["user_nickname"] = user.nickname
-        # --- Асинхронная синхронизация платформ ---
+        # --- Фоновая синхронизация платформ: ставим задачи в очередь, выполняют воркеры ---
+        connected = {s.platform for s in get_connected_services(db, user.id)}
         for plat in ("spotify", "yandex"):
-            plat_service = db.query(ConnectedService).filter_by(user_id=user.id, platform=plat).first()
-            if plat_service and background_tasks is not None:
-                def make_sync_bg(platform):
-                    def sync_bg():
-                        from app.services.platforms.platforms import get_platform_service
-                        try:
-                            logging.info(f"[LOGIN][BG] Start {platform} sync for user_id={user.id}")
-                            service = get_platform_service(platform, db, user.id)
-                            service.sync_user_playlists_and_favorites()
-                            logging.info(f"[LOGIN][BG] {platform} sync finished for user_id={user.id}")
-                        except Exception as e:
-                            logging.error(f"[LOGIN][BG] {platform} sync error: {e}")
-                    return sync_bg
-                background_tasks.add_task(make_sync_bg(plat))
+            if CONNECTION_PLATFORMS[plat] in connected:
+                enqueue_sync(db, user.id, plat)
         logging.info(f"[LOGIN] Success: {user.email}, {user.nickname}, admin={user.is_admin}")
         return {"user": {"id": user.id, "email": user.email, "nickname": user.nickname, "is_admin": user.is_admin}}
     except Exception as e:
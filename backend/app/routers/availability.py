@@ -0,0 +1,30 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Body
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.models.models import UserPlaylist
+from app.services.availability import resolve_playlist, resolve_tracks, MAX_TRACK_IDS
+
+router = APIRouter(prefix="/availability", tags=["availability"])
+
+
+def _platforms(platforms: Optional[str]):
+    # "spotify,youtube" -> ["spotify", "youtube"]; пусто — все платформы
+    return [p.strip() for p in platforms.split(",") if p.strip()] if platforms else None
+
+@router.get("/playlists/{playlist_id}")
+def playlist_availability(playlist_id: int, platforms: Optional[str] = None, db: Session = Depends(get_db)):
+    """{"track_ids": [...], "platforms": {platform: {"ids": [...], "urls": [...]}}} в порядке плейлиста."""
+    if not db.get(UserPlaylist, playlist_id):
+        raise HTTPException(status_code=404, detail="Playlist not found")
+    return resolve_playlist(db, playlist_id, _platforms(platforms))
+
+@router.post("/tracks")
+def tracks_availability(
+    track_ids: List[int] = Body(..., embed=True),
+    platforms: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    if len(track_ids) > MAX_TRACK_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_TRACK_IDS} track ids per request")
+    return resolve_tracks(db, track_ids, _platforms(platforms))
@@ -3,14 +3,21 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.routers.crud import get_connected_services
 from app.models.models import ConnectedService, UserPlaylist, PlaylistTrack, UserFavorite
+from app.services.token_manager import forget_token
+from app.services.conditional_cache import forget_validators
+from app.services.youtube_quota import QuotaExceeded
+from app.services.resilience import PlatformUnavailable
 import logging
 
 router = APIRouter(prefix="/connected_services", tags=["connected-services"])
 
 @router.get("")
-def list_connected_services(user_id: int, db: Session = Depends(get_db)):
+def list_connected_services(user_id: int, refresh: bool = False, db: Session = Depends(get_db)):
     try:
+        from app.services.service_stats import collect_stats
         services = get_connected_services(db, user_id)
+        # Статистика из кэша (обновляется синхронизацией); устаревшая — параллельно по платформам
+        all_stats = collect_stats(db, user_id, services, force=refresh)
         result = []
         for s in services:
             info = {
@@ -21,24 +28,16 @@ def list_connected_services(user_id: int, db: Session = Depends(get_db)):
                 "expires_at": s.expires_at,
                 "sync": s.sync,
             }
-            try:
-                service = None
-                try:
-                    from app.services.platforms.platforms import get_platform_service
-                    service = get_platform_service(s.platform, db, user_id)
-                except Exception as e:
-                    logging.error(f"Error creating platform service for {s.platform}: {e}")
-                if service and hasattr(service, 'get_stats'):
-                    stats = service.get_stats()
-                    info["display_name"] = stats.get("display_name")
-                    info["subscription_type"] = stats.get("subscription_type", "—")
-                    if "songs" in stats:
-                        info["songs"] = stats.get("songs", 0)
-                    if "playlists" in stats:
-                        info["playlists"] = stats.get("playlists", 0)
-            except Exception as e:
-                logging.error(f"Error getting {s.platform} stats: {str(e)}")
-                info["error"] = f"Could not retrieve service information: {str(e)}"
+            stats = all_stats.get(s.id)
+            if stats:
+                if "error" in stats:
+                    info["error"] = f"Could not retrieve service information: {stats['error']}"
+                info["display_name"] = stats.get("display_name")
+                info["subscription_type"] = stats.get("subscription_type", "—")
+                if "songs" in stats:
+                    info["songs"] = stats.get("songs", 0)
+                if "playlists" in stats:
+                    info["playlists"] = stats.get("playlists", 0)
             result.append(info)
         return result
     except Exception as e:
@@ -61,6 +60,8 @@ def disconnect_service(user_id: int, platform: str, db: Session = Depends(get_db
         # 5. Удалить саму привязку в connected_services
         db.query(ConnectedService).filter_by(user_id=user_id, platform=platform).delete(synchronize_session=False)
         db.commit()
+        forget_token(user_id, platform)
+        forget_validators(user_id, platform)
         return {"ok": True}
     except Exception as e:
         logging.error(f"Error disconnecting service: {str(e)}")
@@ -71,11 +72,12 @@ def sync_platform(user_id: int, platform: str, db: Session = Depends(get_db)):
     import logging
     logging.info(f"[SYNC-ROUTER] Вызван sync для user_id={user_id}, platform={platform}")
     try:
-        from app.services.platforms.platforms import get_platform_service
-        service = get_platform_service(platform, db, user_id)
-        service.sync_user_playlists_and_favorites()
+        from app.services.sync_lock import run_platform_sync
+        result = run_platform_sync(db, user_id, platform)
         logging.info(f"[SYNC-ROUTER] sync_user_playlists_and_favorites вызван для user_id={user_id}, platform={platform}")
-        return {"ok": True}
+        return {"ok": True, "coalesced": result["coalesced"]}
+    except (QuotaExceeded, PlatformUnavailable):
+        raise
     except Exception as e:
         logging.error(f"Error syncing {platform}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error syncing {platform}: {str(e)}")
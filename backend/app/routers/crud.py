@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from app.models.models import User, ConnectedService, UserPlaylist, Track
 from sqlalchemy.exc import IntegrityError
+from app.services.sync_writer import dialect_insert
 
 def create_user(db: Session, email: str, password_hash: str, nickname: str, is_admin: bool = False):
     db_user = User(email=email, password_hash=password_hash, nickname=nickname, is_admin=is_admin)
@@ -27,11 +28,20 @@ def create_playlist(db: Session, user_id: int, title: str, description: str = No
     return playlist
 
 def add_connected_service(db: Session, user_id: int, platform: str, external_user_id: str, access_token: str, refresh_token: str = None, expires_at = None):
-    service = ConnectedService(user_id=user_id, platform=platform, external_user_id=external_user_id, access_token=access_token, refresh_token=refresh_token, expires_at=expires_at)
-    db.add(service)
+    # Повторное подключение обновляет существующую строку (unique user_id + platform)
+    values = {
+        "external_user_id": external_user_id,
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "expires_at": expires_at,
+    }
+    stmt = dialect_insert(db, ConnectedService).values(user_id=user_id, platform=platform, **values)
+    if not refresh_token:
+        # Google отдаёт refresh_token только при первом согласии — старый не затираем
+        values.pop("refresh_token")
+    db.execute(stmt.on_conflict_do_update(index_elements=["user_id", "platform"], set_=values))
     db.commit()
-    db.refresh(service)
-    return service
+    return db.query(ConnectedService).filter_by(user_id=user_id, platform=platform).first()
 
 def get_connected_services(db: Session, user_id: int):
     return db.query(ConnectedService).filter(ConnectedService.user_id == user_id).all()
\ No newline at end of file
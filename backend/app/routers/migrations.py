@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.models.models import ConnectedService, PlaylistMigration, UserPlaylist
+from app.services.platforms.platforms import PLATFORM_SERVICES, CONNECTION_PLATFORMS, PLATFORM_BY_CONNECTION
+from app.services.playlist_migration import enqueue_migration, migration_to_dict
+
+router = APIRouter(prefix="/migrations", tags=["migrations"])
+
+@router.post("")
+def create_migration(user_id: int, playlist_id: int, target_platform: str, db: Session = Depends(get_db)):
+    target_platform = PLATFORM_BY_CONNECTION.get(target_platform, target_platform)
+    if target_platform not in PLATFORM_SERVICES:
+        raise HTTPException(status_code=400, detail=f"Unknown platform: {target_platform}")
+    playlist = db.get(UserPlaylist, playlist_id)
+    if not playlist or playlist.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Playlist not found")
+    if playlist.source_platform == target_platform:
+        raise HTTPException(status_code=400, detail="Playlist is already on this platform")
+    connected = db.query(ConnectedService.id).filter_by(
+        user_id=user_id, platform=CONNECTION_PLATFORMS[target_platform]
+    ).first()
+    if not connected:
+        raise HTTPException(status_code=400, detail=f"{target_platform} is not connected")
+    migration = enqueue_migration(db, user_id, playlist_id, target_platform)
+    return migration_to_dict(migration)
+
+@router.get("")
+def list_migrations(user_id: int, limit: int = 20, db: Session = Depends(get_db)):
+    migrations = (
+        db.query(PlaylistMigration)
+        .filter(PlaylistMigration.user_id == user_id)
+        .order_by(PlaylistMigration.created_at.desc())
+        .limit(min(limit, 100))
+        .all()
+    )
+    return {"migrations": [migration_to_dict(m) for m in migrations]}
+
+@router.get("/{migration_id}")
+def get_migration(migration_id: int, db: Session = Depends(get_db)):
+    migration = db.get(PlaylistMigration, migration_id)
+    if not migration:
+        raise HTTPException(status_code=404, detail="Migration not found")
+    return migration_to_dict(migration)
@@ -1,8 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, func, tuple_
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, SessionLocal
 from app.models.models import UserPlaylist, PlaylistTrack, Track, ConnectedService
-from app.services.platforms.platforms import get_platform_service, PLATFORM_SERVICES
+from app.services.platforms.platforms import PLATFORM_SERVICES
+from app.services.sync_lock import run_platform_sync
+import json
 import logging
 from typing import List, Dict, Any
 
@@ -12,9 +16,8 @@ router = APIRouter()
 def sync_platform(user_id: int, platform: str, db: Session = Depends(get_db)):
     """Явно вызываемый endpoint для синхронизации любой платформы"""
     try:
-        service = get_platform_service(platform, db, user_id)
-        service.sync_user_playlists_and_favorites()
-        return {"success": True}
+        result = run_platform_sync(db, user_id, platform)
+        return {"success": True, "coalesced": result["coalesced"]}
     except Exception as e:
         logging.error(f"[SYNC_PLATFORM] Internal error: {e}", exc_info=True)
         return {"success": False, "error": str(e)}
@@ -45,35 +48,112 @@ def get_playlists(user_id: int = None, platform: str = None, db: Session = Depen
         logging.error(f"Error getting playlists: {str(e)}")
         return {"playlists": [], "error": str(e)}
 
+TRACKS_PAGE_MAX = 1000
+STREAM_BATCH = 500
+
+
+def _tracks_query(playlist_id: int, after=None, limit: int = None):
+    # Колонки, а не ORM-объекты; порядок и курсор — (order_index, id) связи плейлист-трек
+    stmt = (
+        select(
+            PlaylistTrack.id.label("row_id"),
+            PlaylistTrack.order_index,
+            Track.id,
+            Track.title,
+            Track.artist,
+            Track.album,
+            Track.duration,
+            Track.image_url,
+        )
+        .join(Track, Track.id == PlaylistTrack.track_id)
+        .where(PlaylistTrack.playlist_id == playlist_id)
+        .order_by(PlaylistTrack.order_index, PlaylistTrack.id)
+    )
+    if after is not None:
+        stmt = stmt.where(tuple_(PlaylistTrack.order_index, PlaylistTrack.id) > after)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def _track_row(row):
+    return {
+        "id": row.id,
+        "title": row.title,
+        "artist": row.artist,
+        "album": row.album,
+        "duration": row.duration,
+        "image_url": row.image_url,
+        "order_index": row.order_index,
+    }
+
+
+def _encode_cursor(row):
+    return f"{row.order_index}:{row.row_id}"
+
+
+def _decode_cursor(cursor: str):
+    try:
+        order_index, row_id = cursor.split(":", 1)
+        return int(order_index), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _stream_tracks(playlist_id: int, after):
+    # Своя сессия: get_db закрывается раньше, чем отдан ответ. Строки идут из серверного
+    # курсора пачками по STREAM_BATCH — весь плейлист в памяти не собирается
+    db = SessionLocal()
+    try:
+        result = db.execute(_tracks_query(playlist_id, after).execution_options(yield_per=STREAM_BATCH))
+        for rows in result.partitions():
+            yield "".join(json.dumps(_track_row(row), ensure_ascii=False) + "\n" for row in rows)
+    finally:
+        db.close()
+
+
 @router.get("/{playlist_id}/tracks")
-def get_playlist_tracks(playlist_id: str, platform: str = None, db: Session = Depends(get_db)):
+def get_playlist_tracks(
+    playlist_id: str,
+    platform: str = None,
+    cursor: str = None,
+    limit: int = None,
+    stream: bool = False,
+    db: Session = Depends(get_db),
+):
+    """Треки плейлиста. limit/cursor — keyset-пагинация (next_cursor из ответа),
+    stream=true — NDJSON по одному треку на строку, начиная с cursor."""
+    after = _decode_cursor(cursor) if cursor else None
     try:
         # Сначала ищем по external_id, если не найдено — по id, с учётом платформы
-        query = db.query(UserPlaylist).filter((UserPlaylist.external_id == playlist_id) | (UserPlaylist.id == playlist_id))
+        query = db.query(UserPlaylist.id).filter((UserPlaylist.external_id == playlist_id) | (UserPlaylist.id == playlist_id))
         if platform:
             query = query.filter(UserPlaylist.source_platform == platform)
         pl = query.first()
         if not pl:
-            return {"tracks": [], "tracks_count": 0}
-        tracks = (
-            db.query(Track)
-            .join(PlaylistTrack, PlaylistTrack.track_id == Track.id)
-            .filter(PlaylistTrack.playlist_id == pl.id)
-            .order_by(PlaylistTrack.order_index)
-            .all()
-        )
+            if stream:
+                return StreamingResponse(iter(()), media_type="application/x-ndjson")
+            return {"tracks": [], "tracks_count": 0, "next_cursor": None}
+        tracks_count = db.execute(
+            select(func.count()).select_from(PlaylistTrack).where(PlaylistTrack.playlist_id == pl.id)
+        ).scalar()
+        if stream:
+            return StreamingResponse(
+                _stream_tracks(pl.id, after),
+                media_type="application/x-ndjson",
+                headers={"X-Tracks-Count": str(tracks_count)},
+            )
+        page_size = min(limit, TRACKS_PAGE_MAX) if limit and limit > 0 else None
+        # Берём на одну строку больше — так видно, есть ли следующая страница
+        rows = db.execute(_tracks_query(pl.id, after, page_size + 1 if page_size else None)).all()
+        next_cursor = None
+        if page_size and len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = _encode_cursor(rows[-1])
         return {
-            "tracks": [
-                {
-                    "id": t.id,
-                    "title": t.title,
-                    "artist": t.artist,
-                    "album": t.album,
-                    "duration": t.duration,
-                    "image_url": t.image_url
-                } for t in tracks
-            ],
-            "tracks_count": len(tracks)
+            "tracks": [_track_row(row) for row in rows],
+            "tracks_count": tracks_count,
+            "next_cursor": next_cursor,
         }
     except Exception as e:
         logging.error(f"Error getting playlist tracks: {str(e)}")
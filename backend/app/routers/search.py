@@ -0,0 +1,19 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.services.federated_search import search
+from app.services.platforms.platforms import get_platform_services
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+@router.get("")
+def search_tracks(
+    q: str = Query(..., min_length=1, max_length=200),
+    user_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=50),
+    db: Session = Depends(get_db),
+):
+    # Без user_id — только локальный каталог; с ним — ещё и платформы подключённых аккаунтов
+    services = get_platform_services(db, user_id) if user_id is not None else {}
+    return search(db, q, limit=limit, services=services)
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.models.models import SyncJob
+from app.services.platforms.platforms import PLATFORM_SERVICES
+from app.services.sync_jobs import enqueue_sync, job_to_dict
+
+router = APIRouter(prefix="/sync_jobs", tags=["sync-jobs"])
+
+@router.post("")
+def create_sync_job(user_id: int, platform: str, db: Session = Depends(get_db)):
+    if platform not in PLATFORM_SERVICES:
+        raise HTTPException(status_code=400, detail=f"Unknown platform: {platform}")
+    job = enqueue_sync(db, user_id, platform)
+    return job_to_dict(job)
+
+@router.get("")
+def list_sync_jobs(user_id: int, limit: int = 20, db: Session = Depends(get_db)):
+    jobs = (
+        db.query(SyncJob)
+        .filter(SyncJob.user_id == user_id)
+        .order_by(SyncJob.created_at.desc())
+        .limit(min(limit, 100))
+        .all()
+    )
+    return {"jobs": [job_to_dict(job) for job in jobs]}
+
+@router.get("/{job_id}")
+def get_sync_job(job_id: int, db: Session = Depends(get_db)):
+    job = db.get(SyncJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_dict(job)
@@ -4,7 +4,8 @@ from app.database import get_db
 from app.models.models import ConnectedService
 # from app.libs.yandex_music_token import get_token  # Оставлено для истории, если Яндекс снова откроет ручную авторизацию
 from pydantic import BaseModel
-from app.services.platforms.yandex import YandexMusicService
+from app.services.sync_jobs import enqueue_sync
+from app.services.token_manager import remember_token
 
 router = APIRouter(prefix="/yandex_music", tags=["yandex-music"])
 
@@ -38,12 +39,14 @@ def get_and_save_xtoken(data: YandexMusicAuthRequest, db: Session = Depends(get_
         else:
             service.access_token = xtoken
         db.commit()
-        # --- Автоматическая синхронизация после добавления xtoken ---
+        remember_token(data.user_id, 'yandex-music', xtoken)
+        # --- Автоматическая синхронизация после добавления xtoken (в фоне, через очередь) ---
+        sync_job_id = None
         try:
-            YandexMusicService(db, data.user_id).sync_user_playlists_and_favorites()
+            sync_job_id = enqueue_sync(db, data.user_id, "yandex").id
         except Exception as sync_err:
             import logging
-            logging.error(f"[YANDEX SYNC] Ошибка при автосинхронизации: {sync_err}")
-        return {"ok": True, "xtoken": xtoken}
+            logging.error(f"[YANDEX SYNC] Не удалось поставить автосинхронизацию в очередь: {sync_err}")
+        return {"ok": True, "xtoken": xtoken, "sync_job_id": sync_job_id}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Ошибка получения xtoken: {e}")
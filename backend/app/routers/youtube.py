@@ -3,10 +3,17 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models.models import ConnectedService
 from app.services.platforms.youtube import YouTubeService
+from app.services.sync_writer import write_playlist
+from app.services import youtube_quota
 from typing import List
 
 router = APIRouter(prefix="/youtube", tags=["youtube"])
 
+@router.get("/quota")
+def get_youtube_quota():
+    # Остаток суточной квоты Data API (общей для всех пользователей) и доступное каждому приоритету
+    return youtube_quota.usage()
+
 @router.get("/playlists")
 def get_youtube_playlists(request: Request, db: Session = Depends(get_db)):
     user_id = request.session.get("user_id")
@@ -15,7 +22,7 @@ def get_youtube_playlists(request: Request, db: Session = Depends(get_db)):
     service = db.query(ConnectedService).filter_by(user_id=user_id, platform="youtube").first()
     if not service:
         raise HTTPException(status_code=404, detail="YouTube not connected")
-    playlists = YouTubeService(db, user_id).get_playlists()
+    playlists = YouTubeService(db, user_id, connection=service).get_playlists()
     return {"playlists": playlists}
 
 @router.post("/import_playlists")
@@ -29,7 +36,7 @@ def import_youtube_playlists(data: dict, request: Request, db: Session = Depends
     service = db.query(ConnectedService).filter_by(user_id=user_id, platform="youtube").first()
     if not service:
         raise HTTPException(status_code=404, detail="YouTube not connected")
-    yt_service = YouTubeService(db, user_id)
+    yt_service = YouTubeService(db, user_id, connection=service)
     all_playlists = {pl["id"]: pl for pl in yt_service.get_playlists()}
     for pid in playlist_ids:
         pl = all_playlists.get(pid)
@@ -37,7 +44,7 @@ def import_youtube_playlists(data: dict, request: Request, db: Session = Depends
             continue
         # Импортируем только выбранные плейлисты и их треки
         tracks = yt_service.get_playlist_tracks(pid)
-        from app.models.models import UserPlaylist, PlaylistTrack, Track, TrackAvailability
+        from app.models.models import UserPlaylist
         session = db
         db_pl = session.query(UserPlaylist).filter_by(user_id=user_id, external_id=pl["id"], source_platform="youtube").first()
         if not db_pl:
@@ -60,41 +67,6 @@ def import_youtube_playlists(data: dict, request: Request, db: Session = Depends
             db_pl.updated_at = None
             db_pl.image_url = pl.get("cover_url")
             db_pl.tracks_number = len(tracks)
-        session.query(PlaylistTrack).filter(PlaylistTrack.playlist_id == db_pl.id).delete()
-        seen_track_ids = set()
-        for idx, t in enumerate(tracks):
-            db_track = session.query(Track).filter_by(title=t["title"], artist=t["artist"]).first()
-            if not db_track:
-                db_track = Track(
-                    title=t["title"],
-                    artist=t["artist"],
-                    album=t.get("album"),
-                    duration=t.get("duration"),
-                    image_url=t.get("cover_url")
-                )
-                session.add(db_track)
-                session.flush()
-            avail = session.query(TrackAvailability).filter_by(track_id=db_track.id, platform="youtube").first()
-            if not avail:
-                avail = TrackAvailability(
-                    track_id=db_track.id,
-                    platform="youtube",
-                    external_id=t["id"],
-                    url=None,
-                    available=True
-                )
-                session.add(avail)
-            else:
-                avail.external_id = t["id"]
-                avail.available = True
-                avail.last_checked_at = datetime.utcnow()
-            if db_track.id not in seen_track_ids:
-                session.add(PlaylistTrack(
-                    playlist_id=db_pl.id,
-                    platform="youtube",
-                    track_id=db_track.id,
-                    order_index=idx
-                ))
-                seen_track_ids.add(db_track.id)
+        write_playlist(session, db_pl.id, "youtube", tracks)
         session.commit()
     return {"ok": True}
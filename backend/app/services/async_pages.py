@@ -0,0 +1,92 @@
+# Параллельная догрузка страниц платформ: когда по первой странице уже известен total,
+# остальные запросы уходят одновременно (не больше concurrency на вызов) и собираются
+# обратно в исходном порядке. Запросы идут через общий HTTP-клиент процесса (http_client:
+# keep-alive пул и подменяемый транспорт) на общем пуле потоков — без своих сессий и циклов.
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+from app.services.http_client import get_http_client
+
+MAX_WORKERS = 16  # потоков догрузки на процесс; их делят все одновременные синхронизации
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="pages")
+    return _executor
+
+
+def _forget_pool():
+    # Потоки пула не переживают fork — в дочернем процессе создаём пул заново
+    global _executor
+    _executor = None
+
+
+os.register_at_fork(after_in_child=_forget_pool)
+
+
+def _fetch_one(url, headers, etag=None, guard=None):
+    # Возвращает (status, json | None, ETag ответа | None).
+    # guard (RequestGuard) — лимиты, повторы на 429/5xx и breaker платформы
+    if etag:
+        headers = {**headers, "If-None-Match": etag}
+
+    def send():
+        return get_http_client().get(url, headers=headers)
+
+    try:
+        resp = guard.call(send) if guard else send()
+    except requests.RequestException:
+        # Сетевую ошибку отдаём как неуспешный статус, чтобы не ронять всю пачку
+        return (0, None, None)
+    if resp.status_code == 200:
+        return (200, resp.json(), resp.headers.get("ETag"))
+    return (resp.status_code, None, None)
+
+
+def _fetch_all(urls, headers, concurrency, etags=None, guard=None):
+    etags = etags or {}
+    pool = _pool()
+    results = [None] * len(urls)
+    queue = iter(enumerate(urls))
+    pending = {}
+
+    def submit_next():
+        for i, url in queue:
+            pending[pool.submit(_fetch_one, url, headers, etags.get(url), guard)] = i
+            return
+
+    for _ in range(max(concurrency, 1)):
+        submit_next()
+    try:
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+                submit_next()
+    finally:
+        # Breaker открылся или ответ не разобрался — ещё не начатые запросы не отправляем
+        for future in pending:
+            future.cancel()
+    return results
+
+
+def fetch_pages(urls, headers, concurrency=4, guard=None):
+    """Возвращает [(status, json | None)] в порядке urls."""
+    if not urls:
+        return []
+    return [(status, data) for status, data, _ in _fetch_all(urls, headers, concurrency, guard=guard)]
+
+
+def fetch_pages_conditional(urls, headers, etags, concurrency=4, guard=None):
+    """Как fetch_pages, но с If-None-Match из etags {url: etag}; возвращает [(status, json | None, etag | None)]."""
+    if not urls:
+        return []
+    return _fetch_all(urls, headers, concurrency, etags, guard)
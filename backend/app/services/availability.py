@@ -0,0 +1,72 @@
+# Где можно проиграть треки: внешние id и ссылки на всех платформах для плейлиста или
+# списка треков одним запросом с join. Ответ колоночный — по массиву на платформу в
+# порядке track_ids, — плеер ставит очередь без запросов по каждому треку.
+from sqlalchemy import select, and_
+from sqlalchemy.orm import Session
+from app.models.models import PlaylistTrack, TrackAvailability
+from app.services.sync_writer import BATCH_SIZE
+
+MAX_TRACK_IDS = 5000
+
+
+def _columnar(track_ids, rows, platforms=None):
+    position = {track_id: i for i, track_id in enumerate(track_ids)}
+    columns = {}
+    for row in rows:
+        if row.platform is None or (platforms and row.platform not in platforms):
+            continue
+        column = columns.get(row.platform)
+        if column is None:
+            column = columns[row.platform] = {"ids": [None] * len(track_ids), "urls": [None] * len(track_ids)}
+        i = position[row.track_id]
+        column["ids"][i] = row.external_id
+        column["urls"][i] = row.url
+    return {"track_ids": track_ids, "platforms": columns}
+
+
+def resolve_playlist(db: Session, playlist_id: int, platforms=None):
+    """Доступность всех треков плейлиста в его порядке: связи и доступность — одним запросом."""
+    availability = and_(
+        TrackAvailability.track_id == PlaylistTrack.track_id,
+        TrackAvailability.available.is_(True),
+    )
+    if platforms:
+        availability = and_(availability, TrackAvailability.platform.in_(platforms))
+    rows = db.execute(
+        select(
+            PlaylistTrack.track_id,
+            TrackAvailability.platform,
+            TrackAvailability.external_id,
+            TrackAvailability.url,
+        )
+        .outerjoin(TrackAvailability, availability)
+        .where(PlaylistTrack.playlist_id == playlist_id)
+        .order_by(PlaylistTrack.order_index, PlaylistTrack.id)
+    ).all()
+    track_ids = []
+    seen = set()
+    for row in rows:
+        if row.track_id not in seen:
+            seen.add(row.track_id)
+            track_ids.append(row.track_id)
+    return _columnar(track_ids, rows, platforms)
+
+
+def resolve_tracks(db: Session, track_ids, platforms=None):
+    """Доступность произвольного списка треков в порядке запроса (повторы схлопываются)."""
+    track_ids = list(dict.fromkeys(track_ids))
+    rows = []
+    for i in range(0, len(track_ids), BATCH_SIZE):
+        stmt = select(
+            TrackAvailability.track_id,
+            TrackAvailability.platform,
+            TrackAvailability.external_id,
+            TrackAvailability.url,
+        ).where(
+            TrackAvailability.track_id.in_(track_ids[i:i + BATCH_SIZE]),
+            TrackAvailability.available.is_(True),
+        )
+        if platforms:
+            stmt = stmt.where(TrackAvailability.platform.in_(platforms))
+        rows.extend(db.execute(stmt).all())
+    return _columnar(track_ids, rows, platforms)
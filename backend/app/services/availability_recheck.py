@@ -0,0 +1,130 @@
+# Фоновая перепроверка tracks_availability: удалённые с платформы треки не должны оставаться
+# available навсегда. Воркеры раз в TICK забирают самые давно проверенные строки каждой
+# платформы и проверяют их пакетными запросами платформы (Spotify /tracks, YouTube
+# videos.list, Яндекс /tracks). Размер пачки рассчитан так, чтобы каждая строка проверялась
+# раз в RECHECK_INTERVAL равномерно по суткам, а не всплеском. Проверяем через случайный
+# аккаунт, а флаг общий, поэтому недоступным трек становится только при удалении для всех:
+# региональный запрет одного аккаунта синхронизация другого тут же откатила бы.
+import logging
+import math
+import os
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, func, or_
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.models import ConnectedService, TrackAvailability
+from app.services.platforms.platforms import CONNECTION_PLATFORMS, get_platform_service
+from app.services.resilience import PlatformRequestError, PlatformUnavailable
+from app.services.youtube_quota import BACKGROUND, QuotaExceeded
+
+RECHECK_INTERVAL = timedelta(hours=float(os.getenv("AVAILABILITY_RECHECK_HOURS", "168")))
+TICK = 60.0            # секунд между проходами воркера
+COUNTS_TTL = 3600.0    # число строк на платформу пересчитываем раз в час
+MAX_BATCH = 5000       # потолок строк на платформу за проход
+
+_counts = {}
+_counts_at = 0.0
+
+
+def _platform_counts(db: Session):
+    global _counts, _counts_at
+    if time.monotonic() - _counts_at > COUNTS_TTL:
+        rows = db.execute(
+            select(TrackAvailability.platform, func.count()).group_by(TrackAvailability.platform)
+        ).all()
+        _counts = {platform: count for platform, count in rows}
+        _counts_at = time.monotonic()
+    return _counts
+
+
+def batch_size(total: int, share: float = 1.0):
+    # Строк за проход, чтобы за RECHECK_INTERVAL пройти все; share — доля этого процесса
+    ticks = RECHECK_INTERVAL.total_seconds() / TICK
+    return min(math.ceil(total * share / ticks), MAX_BATCH)
+
+
+def _service_for(db: Session, platform: str):
+    # lookup_availability отвечает одинаково для любого аккаунта — берём случайный, чтобы размазать лимиты
+    connection = (
+        db.query(ConnectedService)
+        .filter(ConnectedService.platform == CONNECTION_PLATFORMS[platform])
+        .order_by(func.random())
+        .first()
+    )
+    if connection is None:
+        return None
+    service = get_platform_service(platform, db, connection.user_id, connection=connection)
+    service.priority = BACKGROUND
+    return service
+
+
+def _claim(db: Session, platform: str, limit: int):
+    """Самые давно проверенные строки; last_checked_at сдвигается сразу — другие воркеры их не возьмут."""
+    now = datetime.utcnow()
+    rows = db.execute(
+        select(TrackAvailability.id, TrackAvailability.external_id)
+        .where(
+            TrackAvailability.platform == platform,
+            or_(TrackAvailability.last_checked_at.is_(None), TrackAvailability.last_checked_at < now - RECHECK_INTERVAL),
+        )
+        .order_by(TrackAvailability.last_checked_at.asc().nullsfirst())
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if rows:
+        db.execute(
+            update(TrackAvailability)
+            .where(TrackAvailability.id.in_([row.id for row in rows]))
+            .values(last_checked_at=now)
+        )
+    db.commit()
+    return rows
+
+
+def recheck_platform(db: Session, platform: str, limit: int):
+    """Проверяет до limit строк платформы; возвращает число обновлённых."""
+    service = _service_for(db, platform)
+    if service is None:
+        return 0
+    rows = _claim(db, platform, limit)
+    if not rows:
+        return 0
+    external_ids = list(dict.fromkeys(row.external_id for row in rows))
+    results = {}
+    with service.operation():
+        for i in range(0, len(external_ids), service.LOOKUP_BATCH):
+            try:
+                results.update(service.lookup_availability(external_ids[i:i + service.LOOKUP_BATCH]))
+            except (QuotaExceeded, PlatformUnavailable, PlatformRequestError) as e:
+                # Непроверенные строки уже сдвинуты — дойдут до них в следующем интервале
+                logging.warning(f"[AVAILABILITY] {platform}: перепроверка прервана: {e}")
+                break
+    now = datetime.utcnow()
+    updates = [
+        {"id": row.id, "available": results[row.external_id], "last_checked_at": now}
+        for row in rows if row.external_id in results
+    ]
+    if updates:
+        db.execute(update(TrackAvailability), updates)
+        db.commit()
+    gone = sum(1 for u in updates if not u["available"])
+    logging.info(f"[AVAILABILITY] {platform}: проверено {len(updates)}/{len(rows)}, недоступно {gone}")
+    return len(updates)
+
+
+def run_recheck_tick(share: float = 1.0):
+    db = SessionLocal()
+    try:
+        for platform, total in _platform_counts(db).items():
+            limit = batch_size(total, share)
+            if platform not in CONNECTION_PLATFORMS or not limit:
+                continue
+            try:
+                recheck_platform(db, platform, limit)
+            except Exception as e:
+                # Ошибка одной платформы не останавливает проверку остальных
+                db.rollback()
+                logging.error(f"[AVAILABILITY] {platform}: recheck error: {e}", exc_info=True)
+    finally:
+        db.close()
@@ -0,0 +1,97 @@
+# Хранилище валидаторов ответов (ETag) по (аккаунт, URL) для условных запросов к API
+# платформ: повторный запрос уходит с If-None-Match, и 304 означает "страница не менялась" —
+# тело берём из сохранённого, а синхронизация может не разбирать и не писать такие данные.
+# Чтение — через свою сессию (вызывается из потоков конвейера синхронизации). Свежие
+# валидаторы возвращаются вызывающему и сохраняются в транзакции записи плейлиста, только
+# после успешной записи: иначе упавшая синхронизация получила бы 304 на несохранённые данные.
+import hashlib
+import logging
+from datetime import datetime
+from sqlalchemy import delete, select
+from app.database import SessionLocal
+from app.models.models import ResponseValidator
+from app.services.sync_writer import dialect_insert
+
+
+def _url_hash(url):
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def load_validators(user_id: int, platform: str, urls):
+    """{url: (etag, body)} для тех urls, по которым уже есть сохранённый ответ."""
+    if not urls:
+        return {}
+    by_hash = {_url_hash(url): url for url in urls}
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(ResponseValidator.url_hash, ResponseValidator.etag, ResponseValidator.body)
+            .where(
+                ResponseValidator.user_id == user_id,
+                ResponseValidator.platform == platform,
+                ResponseValidator.url_hash.in_(list(by_hash)),
+            )
+        ).all()
+    finally:
+        db.close()
+    return {by_hash[row.url_hash]: (row.etag, row.body) for row in rows}
+
+
+def save_validators(session, user_id: int, platform: str, entries):
+    """entries — [(url, etag, body)] из свежих ответов 200. Пишет в сессию записи плейлиста
+    без commit: валидаторы фиксируются вместе с данными, которые они описывают."""
+    if not entries:
+        return
+    now = datetime.utcnow()
+    rows = {
+        _url_hash(url): {
+            "user_id": user_id,
+            "platform": platform,
+            "url_hash": _url_hash(url),
+            "url": url,
+            "etag": etag,
+            "body": body,
+            "updated_at": now,
+        }
+        for url, etag, body in entries
+    }
+    stmt = dialect_insert(session, ResponseValidator).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "platform", "url_hash"],
+        set_={"etag": stmt.excluded.etag, "body": stmt.excluded.body, "updated_at": stmt.excluded.updated_at},
+    )
+    try:
+        # Savepoint: ошибка кэша не должна откатить саму запись плейлиста
+        with session.begin_nested():
+            session.execute(stmt)
+    except Exception as e:
+        # Кэш валидаторов — оптимизация: без него просто скачаем страницу целиком в следующий раз
+        logging.warning(f"[ETAG] Не удалось сохранить валидаторы user_id={user_id} platform={platform}: {e}")
+
+
+def forget_validators(user_id: int, platform: str):
+    db = SessionLocal()
+    try:
+        db.execute(delete(ResponseValidator).where(
+            ResponseValidator.user_id == user_id,
+            ResponseValidator.platform == platform,
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def resolve_conditional(urls, responses, stored):
+    """responses — [(status, json | None, etag | None)] в порядке urls.
+    Возвращает ([(status, body, changed)], свежие валидаторы): на 304 — сохранённое тело и
+    changed=False. Валидаторы сохраняет вызывающий (save_validators) после записи данных."""
+    results = []
+    fresh = []
+    for url, (status, body, etag) in zip(urls, responses):
+        if status == 304 and url in stored:
+            results.append((200, stored[url][1], False))
+            continue
+        if status == 200 and etag and body is not None:
+            fresh.append((url, etag, body))
+        results.append((status, body, True))
+    return results, fresh
@@ -0,0 +1,171 @@
+# Поиск треков по всем источникам: сначала локальный каталог (services/track_search.py),
+# затем параллельно платформы подключённых аккаунтов с общим бюджетом времени. Результаты
+# сливаются по нормализации track_key — одна запись с id на каждой платформе. Ответы платформ кэшируются
+# в процессе (TTL + LRU) по нормализованному запросу и общие для всех пользователей, так что
+# популярные запросы до платформ не доходят.
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.models import TrackAvailability
+from app.services.track_key import normalize_title, primary_artist, duration_bucket
+from app.services.track_search import search_tracks
+
+CACHE_TTL = 600          # секунд жизни ответа платформы
+CACHE_SIZE = 2000        # запросов x платформ в кэше
+PLATFORM_TIMEOUT = 3.0   # секунд на все платформы — опоздавшие в ответ не попадут
+PLATFORM_LIMIT = 10      # результатов с каждой платформы
+
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+
+_cache = TTLCache(CACHE_SIZE, CACHE_TTL)
+
+
+def normalize_query(query: str):
+    # Ключ кэша: только регистр и пробелы. normalize_title здесь не годится — он выбрасывает
+    # "feat. X", "(remastered)" и пунктуацию, а с ними платформы отдают другую выдачу
+    return " ".join((query or "").casefold().split())
+
+
+def _local_availability(db: Session, track_ids):
+    availability = {}
+    if not track_ids:
+        return availability
+    rows = db.execute(
+        select(TrackAvailability.track_id, TrackAvailability.platform, TrackAvailability.external_id, TrackAvailability.url)
+        .where(TrackAvailability.track_id.in_(track_ids), TrackAvailability.available.is_(True))
+    ).all()
+    for row in rows:
+        availability.setdefault(row.track_id, {})[row.platform] = {"id": row.external_id, "url": row.url}
+    return availability
+
+
+def _search_platforms(services, query: str, normalized: str):
+    """({platform: [track]}, {platform: статус}) — из кэша или живым запросом в пределах бюджета."""
+    results, statuses = {}, {}
+    pending = []
+    for platform, service in services.items():
+        cached = _cache.get((platform, normalized))
+        if cached is not None:
+            results[platform] = cached
+            statuses[platform] = "cache"
+        else:
+            pending.append((platform, service))
+    if not pending:
+        return results, statuses
+    pool = ThreadPoolExecutor(max_workers=len(pending))
+    deadline = time.monotonic() + PLATFORM_TIMEOUT
+    try:
+        futures = [(platform, pool.submit(service.search, query, PLATFORM_LIMIT)) for platform, service in pending]
+        for platform, future in futures:
+            try:
+                found = future.result(timeout=max(deadline - time.monotonic(), 0))
+            except TimeoutError:
+                statuses[platform] = "timeout"
+            except Exception as e:
+                # Квота, лежащая платформа, неподходящий токен — поиск по остальным всё равно отдаём
+                logging.warning(f"[SEARCH] {platform}: {e}")
+                statuses[platform] = "error"
+            else:
+                _cache.set((platform, normalized), found)
+                results[platform] = found
+                statuses[platform] = "ok"
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results, statuses
+
+
+def _round_robin(lists):
+    # Первые результаты каждой платформы раньше вторых — ни одна платформа не вытесняет остальные
+    for rank in range(max((len(items) for items in lists), default=0)):
+        for items in lists:
+            if rank < len(items):
+                yield items[rank]
+
+
+class _Merger:
+    """Сливает результаты по нормализованным исполнителю и названию; длительности должны
+    попасть в одну или соседние корзины track_key, а неизвестная (YouTube) совпадает с любой."""
+
+    def __init__(self):
+        self.items = []
+        self._by_name = {}
+
+    def add(self, title, artist, duration, make_item):
+        artist_key = primary_artist(artist)
+        name = (artist_key, normalize_title(title, artist_key))
+        bucket = duration_bucket(duration)
+        for other_bucket, item in self._by_name.get(name, []):
+            if bucket is None or other_bucket is None or abs(bucket - other_bucket) <= 1:
+                return item
+        item = make_item()
+        self._by_name.setdefault(name, []).append((bucket, item))
+        self.items.append(item)
+        return item
+
+
+def search(db: Session, q: str, limit: int = 20, services=None):
+    """services — {платформа: сервис} подключённых аккаунтов; без них ищем только локально."""
+    normalized = normalize_query(q)
+    if not normalized:
+        return {"query": q, "results": [], "platforms": {}}
+    merger = _Merger()
+    local = search_tracks(db, q, limit)
+    availability = _local_availability(db, [row["id"] for row in local])
+    for row in local:
+        merger.add(row["title"], row["artist"], row["duration"], lambda: {
+            "track_id": row["id"],
+            "title": row["title"],
+            "artist": row["artist"],
+            "album": row["album"],
+            "duration": row["duration"],
+            "cover_url": row["image_url"],
+            "platforms": dict(availability.get(row["id"], {})),
+        })
+    results, statuses = _search_platforms(services or {}, q, normalized)
+    tagged = [[(platform, t) for t in tracks] for platform, tracks in results.items()]
+    for platform, t in _round_robin(tagged):
+        item = merger.add(t["title"], t["artist"], t.get("duration"), lambda: {
+            "track_id": None,
+            "title": t["title"],
+            "artist": t["artist"],
+            "album": t.get("album"),
+            "duration": t.get("duration"),
+            "cover_url": t.get("cover_url"),
+            "platforms": {},
+        })
+        item["platforms"].setdefault(platform, {"id": str(t["id"]), "url": t.get("url")})
+        if item["duration"] is None:
+            item["duration"] = t.get("duration")
+        if item["cover_url"] is None:
+            item["cover_url"] = t.get("cover_url")
+    return {"query": q, "results": merger.items[:limit], "platforms": statuses}
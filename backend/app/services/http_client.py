@@ -0,0 +1,61 @@
+# Общий HTTP-клиент процесса для платформ и oauth: пул keep-alive соединений на хост,
+# таймауты по умолчанию и подменяемый транспорт (requests adapter) для тестов
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_TIMEOUT = (5, 30)  # (connect, read), секунды
+POOL_CONNECTIONS = 16      # сколько хостов держим в пуле
+POOL_MAXSIZE = 32          # keep-alive соединений на один хост
+
+
+class HttpClient:
+    def __init__(self, adapter=None, timeout=DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.adapter = adapter or HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HttpClient()
+    return _client
+
+
+def set_http_transport(adapter=None, timeout=DEFAULT_TIMEOUT) -> HttpClient:
+    # Подменяет транспорт клиента процесса (например, на фейковый adapter в тестах).
+    # Без аргументов — пересоздаёт клиент, что нужно и после fork в воркерах.
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = HttpClient(adapter=adapter, timeout=timeout)
+    return _client
@@ -0,0 +1,48 @@
+# Мемоизация обращений к платформе в пределах одной операции (синхронизация, запрос):
+# пока открыт operation_scope, каждый ресурс запрашивается не больше одного раза,
+# в том числе при одновременных вызовах из потоков конвейера синхронизации
+import functools
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+
+def memoized(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cache = getattr(self, "_memo", None)
+        if cache is None:
+            return method(self, *args, **kwargs)
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        with self._memo_lock:
+            future = cache.get(key)
+            owner = future is None
+            if owner:
+                future = cache[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            result = method(self, *args, **kwargs)
+        except BaseException as e:
+            # Ошибку не кэшируем — следующий вызов попробует снова
+            with self._memo_lock:
+                cache.pop(key, None)
+            future.set_exception(e)
+            raise
+        future.set_result(result)
+        return result
+    return wrapper
+
+
+@contextmanager
+def operation_scope(service):
+    if getattr(service, "_memo", None) is not None:
+        # Вложенная операция живёт в кэше внешней
+        yield service
+        return
+    service._memo = {}
+    service._memo_lock = threading.Lock()
+    try:
+        yield service
+    finally:
+        service._memo = None
@@ -7,9 +7,8 @@ from app.routers.crud import add_connected_service
 from sqlalchemy.orm import Session
 from starlette.requests import Request as StarletteRequest
 from starlette.responses import Response
-import importlib
-
-requests = importlib.import_module("requests")
+from app.services.http_client import get_http_client
+from app.services.token_manager import expires_at_from, remember_token
 
 router = APIRouter(prefix="/oauth/google", tags=["oauth-google"])
 
@@ -23,7 +22,7 @@ def google_login(request: StarletteRequest):
         "client_id": GOOGLE_CLIENT_ID,
         "redirect_uri": GOOGLE_REDIRECT_URI,
         "response_type": "code",
-        "scope": "openid email profile https://www.googleapis.com/auth/youtube.readonly",
+        "scope": "openid email profile https://www.googleapis.com/auth/youtube",
         "access_type": "offline",
         "prompt": "consent"
     }
@@ -43,7 +42,7 @@ def google_callback(request: StarletteRequest, db: Session = Depends(get_db)):
         "redirect_uri": GOOGLE_REDIRECT_URI,
         "grant_type": "authorization_code"
     }
-    resp = requests.post(token_url, data=data)
+    resp = get_http_client().post(token_url, data=data)
     if resp.status_code != 200:
         return RedirectResponse(f"http://127.0.0.1:5173/auth?oauth=fail&platform=google&reason=token_error")
     tokens = resp.json()
@@ -51,14 +50,16 @@ def google_callback(request: StarletteRequest, db: Session = Depends(get_db)):
     refresh_token = tokens.get("refresh_token")
     if not access_token:
         return RedirectResponse(f"http://127.0.0.1:5173/auth?oauth=fail&platform=google&reason=no_access_token")
-    userinfo = requests.get("https://www.googleapis.com/oauth2/v2/userinfo", headers={"Authorization": f"Bearer {access_token}"}).json()
+    userinfo = get_http_client().get("https://www.googleapis.com/oauth2/v2/userinfo", headers={"Authorization": f"Bearer {access_token}"}).json()
     external_user_id = userinfo.get("id")
     if not external_user_id:
         return RedirectResponse(f"http://127.0.0.1:5173/auth?oauth=fail&platform=google&reason=no_external_user_id")
     user_id = request.session.get("user_id")
     if not user_id:
         return RedirectResponse("http://127.0.0.1:5173/auth?oauth=fail&platform=google&reason=no_user_id")
-    add_connected_service(db, user_id, "youtube", external_user_id, access_token, refresh_token)
+    expires_at = expires_at_from(tokens.get("expires_in"))
+    add_connected_service(db, user_id, "youtube", external_user_id, access_token, refresh_token, expires_at)
+    remember_token(user_id, "youtube", access_token, expires_at)
     from app.models.models import User
     user = db.query(User).filter_by(id=user_id).first()
     nickname = user.nickname if user else "home"
@@ -7,9 +7,8 @@ from app.routers.crud import add_connected_service
 from sqlalchemy.orm import Session
 from starlette.requests import Request as StarletteRequest
 from starlette.responses import Response
-import importlib
-
-requests = importlib.import_module("requests")
+from app.services.http_client import get_http_client
+from app.services.token_manager import expires_at_from, remember_token
 
 router = APIRouter(prefix="/oauth/spotify", tags=["oauth-spotify"])
 
@@ -23,7 +22,7 @@ def spotify_login(request: StarletteRequest):
         "client_id": SPOTIFY_CLIENT_ID,
         "response_type": "code",
         "redirect_uri": SPOTIFY_REDIRECT_URI,
-        "scope": "user-read-email user-library-read playlist-read-private streaming",
+        "scope": "user-read-email user-library-read playlist-read-private playlist-modify-private playlist-modify-public streaming",
         "show_dialog": "true"
     }
     url = f"https://accounts.spotify.com/authorize?{urlencode(params)}"
@@ -42,7 +41,7 @@ def spotify_callback(request: StarletteRequest, db: Session = Depends(get_db)):
         "client_id": SPOTIFY_CLIENT_ID,
         "client_secret": SPOTIFY_CLIENT_SECRET
     }
-    resp = requests.post(token_url, data=data)
+    resp = get_http_client().post(token_url, data=data)
     if resp.status_code != 200:
         return RedirectResponse(f"http://127.0.0.1:5173/auth?oauth=fail&platform=spotify&reason=token_error")
     tokens = resp.json()
@@ -51,7 +50,7 @@ def spotify_callback(request: StarletteRequest, db: Session = Depends(get_db)):
     if not access_token:
         return RedirectResponse(f"http://127.0.0.1:5173/auth?oauth=fail&platform=spotify&reason=no_access_token")
     # Получаем инфо о пользователе
-    userinfo = requests.get("https://api.spotify.com/v1/me", headers={"Authorization": f"Bearer {access_token}"}).json()
+    userinfo = get_http_client().get("https://api.spotify.com/v1/me", headers={"Authorization": f"Bearer {access_token}"}).json()
     external_user_id = userinfo.get("id")
     if not external_user_id:
         return RedirectResponse(f"http://127.0.0.1:5173/auth?oauth=fail&platform=spotify&reason=no_external_user_id")
@@ -59,14 +58,16 @@ def spotify_callback(request: StarletteRequest, db: Session = Depends(get_db)):
     user_id = request.session.get("user_id")
     if not user_id:
         return RedirectResponse("http://127.0.0.1:5173/auth?oauth=fail&platform=spotify&reason=no_user_id")
-    add_connected_service(db, user_id, "spotify", external_user_id, access_token, refresh_token)
-    # Синхронизация плейлистов и треков пользователя
+    expires_at = expires_at_from(tokens.get("expires_in"))
+    add_connected_service(db, user_id, "spotify", external_user_id, access_token, refresh_token, expires_at)
+    remember_token(user_id, "spotify", access_token, expires_at)
+    # Синхронизация плейлистов и треков пользователя — в очереди, редирект не ждёт
     try:
-        from app.services.platforms.platforms import SpotifyService
-        SpotifyService(db, user_id).sync_user_playlists_and_favorites()
+        from app.services.sync_jobs import enqueue_sync
+        enqueue_sync(db, user_id, "spotify")
     except Exception as e:
         import logging
-        logging.error(f"[SPOTIFY SYNC] Ошибка при синхронизации: {e}")
+        logging.error(f"[SPOTIFY SYNC] Не удалось поставить синхронизацию в очередь: {e}")
     # Получаем nickname пользователя для редиректа
     from app.models.models import User
     user = db.query(User).filter_by(id=user_id).first()
@@ -1,10 +1,141 @@
 # Base class for all platform services
 from sqlalchemy.orm import Session
+from app.models.models import ConnectedService
+from app.services.http_client import get_http_client
+from app.services.async_pages import fetch_pages, fetch_pages_conditional
+from app.services.conditional_cache import load_validators, resolve_conditional, save_validators
+from app.services.memo import operation_scope
+from app.services.resilience import RequestGuard, PlatformRequestError
+from app.services.token_manager import get_access_token, refresh_access_token
 
 class BasePlatformService:
-    def __init__(self, db: Session, user_id: int):
+    CONNECTION_PLATFORM = None  # имя платформы в connected_services
+    PAGE_CONCURRENCY = 4  # одновременных запросов страниц к платформе
+    ADD_TRACKS_BATCH = 100  # сколько треков платформа принимает одним запросом добавления
+    LOOKUP_BATCH = 50  # сколько id принимает пакетный запрос треков (перепроверка доступности)
+
+    def __init__(self, db: Session, user_id: int, connection: ConnectedService = None):
         self.db = db
         self.user_id = user_id
+        self.token = None
+        # interactive — запрос пользователя, background — синхронизация из очереди (для квот платформ)
+        self.priority = "interactive"
+        # Строка connected_services загружается один раз (или приходит готовой из фабрики)
+        self.connection = connection if connection is not None else self._load_connection()
+
+    def _load_connection(self):
+        if not self.CONNECTION_PLATFORM:
+            return None
+        return self.db.query(ConnectedService).filter_by(user_id=self.user_id, platform=self.CONNECTION_PLATFORM).first()
+
+    @property
+    def http(self):
+        # Общий пул keep-alive соединений процесса — тёплые соединения для всех платформ
+        return get_http_client()
+
+    def _get_token(self):
+        if self.connection is None:
+            return None
+        return get_access_token(self.user_id, self.CONNECTION_PLATFORM, connection=self.connection)
+
+    def _current_token(self):
+        # Токен из кэша менеджера; если подходит expires_at, он обновится заранее
+        self.token = self._get_token() or self.token
+        return self.token
+
+    def _headers(self):
+        return {}
+
+    def _guard(self):
+        return RequestGuard(self.CONNECTION_PLATFORM, self.user_id)
+
+    def _http_get(self, url, headers):
+        # Все GET к платформе идут через лимиты, повторы на 429/5xx и breaker
+        return self._guard().call(lambda: self.http.get(url, headers=headers))
+
+    def _get(self, url):
+        # GET с заголовками авторизации; на 401 один раз обновляем токен и повторяем
+        resp = self._http_get(url, self._headers())
+        if resp.status_code == 401 and self._refresh_token():
+            resp = self._http_get(url, self._headers())
+        return resp
+
+    def _http_post(self, url, headers, idempotent=False, **kwargs):
+        # Запись на платформу: 429 повторяем, 5xx — нет (запрос мог уже выполниться)
+        return self._guard().call(lambda: self.http.post(url, headers=headers, **kwargs), idempotent=idempotent)
+
+    def _post(self, url, idempotent=False, **kwargs):
+        # 401 приходит до выполнения запроса — после обновления токена повторять безопасно
+        resp = self._http_post(url, self._headers(), idempotent=idempotent, **kwargs)
+        if resp.status_code == 401 and self._refresh_token():
+            resp = self._http_post(url, self._headers(), idempotent=idempotent, **kwargs)
+        return resp
+
+    def _page_failed(self, url, status):
+        # Недокачанная страница — весь список неполный: лучше упасть, чем сохранить обрезанный плейлист
+        raise PlatformRequestError(self.CONNECTION_PLATFORM, url, status)
+
+    def _refresh_token(self):
+        token = refresh_access_token(self.user_id, self.CONNECTION_PLATFORM, stale_token=self.token)
+        if not token:
+            return False
+        self.token = token
+        return True
+
+    def operation(self):
+        # Пока открыт контекст, повторные запросы профиля, плейлистов и лайков берутся из кэша
+        return operation_scope(self)
+
+    def _save_stats(self, stats):
+        # Статистику считает синхронизация — заодно обновляем кэш для /connected_services
+        from app.services.service_stats import store_stats
+        store_stats(self.db, self.connection, stats)
+
+    def _fetch_pages(self, urls):
+        # Параллельно забирает страницы; на 401 один раз обновляем токен и дозапрашиваем упавшие
+        results = fetch_pages(urls, self._headers(), self.PAGE_CONCURRENCY, guard=self._guard())
+        expired = [i for i, (status, _) in enumerate(results) if status == 401]
+        if expired and self._refresh_token():
+            retried = fetch_pages([urls[i] for i in expired], self._headers(), self.PAGE_CONCURRENCY, guard=self._guard())
+            for i, result in zip(expired, retried):
+                results[i] = result
+        return results
+
+    def _fetch_pages_conditional(self, urls):
+        """([(status, body, changed)], свежие валидаторы) с If-None-Match по сохранённым ETag;
+        на 304 — сохранённое тело. Валидаторы сохраняются через _save_validators после записи."""
+        stored = load_validators(self.user_id, self.CONNECTION_PLATFORM, urls)
+        etags = {url: etag for url, (etag, _) in stored.items()}
+        responses = fetch_pages_conditional(urls, self._headers(), etags, self.PAGE_CONCURRENCY, guard=self._guard())
+        expired = [i for i, (status, _, _) in enumerate(responses) if status == 401]
+        if expired and self._refresh_token():
+            retried = fetch_pages_conditional([urls[i] for i in expired], self._headers(), etags, self.PAGE_CONCURRENCY, guard=self._guard())
+            for i, response in zip(expired, retried):
+                responses[i] = response
+        return resolve_conditional(urls, responses, stored)
+
+    def _save_validators(self, session, fresh):
+        # В транзакции записи плейлиста — до commit вместе с данными
+        save_validators(session, self.user_id, self.CONNECTION_PLATFORM, fresh)
+
+    def _get_conditional(self, url):
+        # Одиночный условный GET через общий пул соединений (для постраничных курсоров)
+        stored = load_validators(self.user_id, self.CONNECTION_PLATFORM, [url])
+        etag = stored[url][0] if url in stored else None
+
+        def get():
+            headers = self._headers()
+            if etag:
+                headers = {**headers, "If-None-Match": etag}
+            return self._http_get(url, headers)
+
+        resp = get()
+        if resp.status_code == 401 and self._refresh_token():
+            resp = get()
+        body = resp.json() if resp.status_code == 200 else None
+        response = (resp.status_code, body, resp.headers.get("ETag"))
+        results, fresh = resolve_conditional([url], [response], stored)
+        return results[0], fresh
 
     def get_playlists(self):
         raise NotImplementedError
@@ -26,3 +157,34 @@ class BasePlatformService:
 
     def get_liked_playlist_info(self):
         raise NotImplementedError
+
+    # --- Запись (перенос плейлистов, services/playlist_migration.py) ---
+
+    def search(self, query, limit=10):
+        """Поиск треков по произвольной строке — список dict как у _track_from_api."""
+        raise NotImplementedError
+
+    def search_tracks(self, track, limit=5):
+        """Кандидаты на платформе для трека (dict как у _track_from_api) — список таких же dict."""
+        raise NotImplementedError
+
+    def create_playlist(self, title, description=None, public=False):
+        """Создаёт плейлист и возвращает его внешний id."""
+        raise NotImplementedError
+
+    def add_tracks(self, playlist_id, external_ids):
+        """Добавляет в конец плейлиста не больше ADD_TRACKS_BATCH треков."""
+        raise NotImplementedError
+
+    def find_playlists(self, title):
+        """Внешние id плейлистов аккаунта с таким названием — найти созданный, но не записанный у нас."""
+        return [str(pl["id"]) for pl in self.get_playlists() if pl["title"] == title]
+
+    def playlist_size(self, playlist_id):
+        """Сколько треков в плейлисте на платформе — проверка, дошла ли неподтверждённая пачка добавления."""
+        raise NotImplementedError
+
+    def lookup_availability(self, external_ids):
+        """{external_id: доступен ли} для не больше LOOKUP_BATCH id одним запросом к платформе.
+        False — только если трек удалён для всех, а не недоступен в стране этого аккаунта."""
+        raise NotImplementedError
@@ -2,16 +2,36 @@ from .spotify import SpotifyService
 from .yandex import YandexMusicService
 from .youtube import YouTubeService
 from .base import BasePlatformService
+from app.models.models import ConnectedService
 
-# TODO добавить полноценную фабрику для выбора сервиса по платформе и возможно определисть некоторые функции в общие
 PLATFORM_SERVICES = {
     'spotify': SpotifyService,
     'yandex': YandexMusicService,
     'youtube': YouTubeService,
 }
 
-def get_platform_service(platform: str, db, user_id):
+# Под каким именем платформа хранится в connected_services
+CONNECTION_PLATFORMS = {
+    'spotify': 'spotify',
+    'yandex': 'yandex-music',
+    'youtube': 'youtube',
+}
+
+PLATFORM_BY_CONNECTION = {conn: platform for platform, conn in CONNECTION_PLATFORMS.items()}
+
+def get_platform_service(platform: str, db, user_id, connection: ConnectedService = None):
+    # Принимаем и ключ сервиса ('yandex'), и имя из connected_services ('yandex-music')
+    platform = PLATFORM_BY_CONNECTION.get(platform, platform)
     cls = PLATFORM_SERVICES.get(platform)
     if not cls:
         raise ValueError(f"Unknown platform: {platform}")
-    return cls(db, user_id)
\ No newline at end of file
+    return cls(db, user_id, connection=connection)
+
+def get_platform_services(db, user_id):
+    """Все подключённые сервисы пользователя, собранные из одного запроса к connected_services."""
+    services = {}
+    for connection in db.query(ConnectedService).filter(ConnectedService.user_id == user_id).all():
+        platform = PLATFORM_BY_CONNECTION.get(connection.platform)
+        if platform and platform not in services:
+            services[platform] = PLATFORM_SERVICES[platform](db, user_id, connection=connection)
+    return services
\ No newline at end of file
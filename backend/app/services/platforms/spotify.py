@@ -1,80 +1,50 @@
+import os
 import logging
-import requests
+from urllib.parse import urlencode
 
-from app.models.models import ConnectedService
 from sqlalchemy.orm import Session
 from datetime import datetime
 from .base import BasePlatformService
+from app.services.resilience import PlatformRequestError
+from app.services.sync_writer import write_playlist
+from app.services.sync_pipeline import run_sync_pipeline
+from app.services.memo import memoized
 
 
 class SpotifyService(BasePlatformService):
-    BASE_URL = "https://api.spotify.com/v1"
+    # Переопределяется для прогонов против локального фейкового сервера платформы
+    BASE_URL = os.getenv("SPOTIFY_API_BASE", "https://api.spotify.com/v1")
+    CONNECTION_PLATFORM = "spotify"
+    PAGE_CONCURRENCY = 8
 
-    def __init__(self, db: Session, user_id: int):
-        super().__init__(db, user_id)
+    def __init__(self, db: Session, user_id: int, connection=None):
+        super().__init__(db, user_id, connection)
         self.token = self._get_token()
 
-    def _get_token(self):
-        service = self.db.query(ConnectedService).filter_by(user_id=self.user_id, platform="spotify").first()
-        if not service:
-            return None
-        return service.access_token
-
     def _headers(self):
-        return {"Authorization": f"Bearer {self.token}"}
-
-    def _refresh_token(self):
-        import os
-        import logging
-        from app.models.models import ConnectedService
-        service = self.db.query(ConnectedService).filter_by(user_id=self.user_id, platform="spotify").first()
-        if not service or not service.refresh_token:
-            logging.warning(f"[SPOTIFY] Нет refresh_token для user_id={self.user_id}")
-            return False
-        data = {
-            "grant_type": "refresh_token",
-            "refresh_token": service.refresh_token,
-            "client_id": os.getenv("SPOTIFY_CLIENT_ID"),
-            "client_secret": os.getenv("SPOTIFY_CLIENT_SECRET"),
-        }
-        resp = requests.post("https://accounts.spotify.com/api/token", data=data)
-        logging.info(f"[SPOTIFY] refresh_token status={resp.status_code} body={resp.text[:200]}")
-        if resp.status_code == 200:
-            tokens = resp.json()
-            service.access_token = tokens["access_token"]
-            self.db.commit()
-            self.token = tokens["access_token"]
-            logging.info(f"[SPOTIFY] access_token обновлён для user_id={self.user_id}")
-            return True
-        logging.error(f"[SPOTIFY] Не удалось обновить access_token для user_id={self.user_id}")
-        return False
+        return {"Authorization": f"Bearer {self._current_token()}"}
 
+    @memoized
     def get_user_profile(self):
         import logging
-        resp = requests.get(f"{self.BASE_URL}/me", headers=self._headers())
+        resp = self._get(f"{self.BASE_URL}/me")
         logging.info(f"[SPOTIFY] get_user_profile status={resp.status_code} body={resp.text[:200]}")
-        if resp.status_code == 401:
-            if self._refresh_token():
-                resp = requests.get(f"{self.BASE_URL}/me", headers=self._headers())
-                logging.info(f"[SPOTIFY] get_user_profile (after refresh) status={resp.status_code} body={resp.text[:200]}")
         if resp.status_code != 200:
             return None
         return resp.json()
 
+    @memoized
     def get_playlists(self, limit=50):
         import logging
         playlists = []
         offset = 0
         while True:
             url = f"{self.BASE_URL}/me/playlists?limit={limit}&offset={offset}"
-            resp = requests.get(url, headers=self._headers())
+            resp = self._get(url)
             logging.info(f"[SPOTIFY] get_playlists status={resp.status_code} url={url} body={resp.text[:200]}")
-            if resp.status_code == 401:
-                if self._refresh_token():
-                    resp = requests.get(url, headers=self._headers())
-                    logging.info(f"[SPOTIFY] get_playlists (after refresh) status={resp.status_code} url={url} body={resp.text[:200]}")
             if resp.status_code != 200:
-                break
+                # Неполный список плейлистов синхронизация приняла бы за удаление остальных
+                self._page_failed(url, resp.status_code)
             items = resp.json().get("items", [])
             if not items:
                 break
@@ -85,6 +55,7 @@ class SpotifyService(BasePlatformService):
                     "description": pl.get("description", ""),
                     "tracks_count": pl["tracks"]["total"],
                     "cover_url": pl["images"][0]["url"] if pl["images"] else None,
+                    "snapshot_id": pl.get("snapshot_id"),
                     "source_platform": "spotify"
                 })
             if len(items) < limit:
@@ -92,34 +63,71 @@ class SpotifyService(BasePlatformService):
             offset += limit
         return playlists
 
+    def _track_from_api(self, t):
+        return {
+            "id": t["id"],
+            "title": t["name"],
+            "artist": ", ".join([a["name"] for a in t["artists"]]),
+            "album": t["album"]["name"],
+            "duration": t["duration_ms"] // 1000,
+            "cover_url": t["album"]["images"][0]["url"] if t["album"]["images"] else None,
+            "isrc": (t.get("external_ids") or {}).get("isrc"),
+            "url": (t.get("external_urls") or {}).get("spotify"),
+            "platform": "spotify"
+        }
+
+    def _get_all_items(self, path, limit):
+        # Первая страница синхронно — в ней total; остальные offset'ы известны и грузятся параллельно
+        first_url = f"{self.BASE_URL}{path}?limit={limit}&offset=0"
+        resp = self._get(first_url)
+        if resp.status_code != 200:
+            self._page_failed(first_url, resp.status_code)
+        data = resp.json()
+        items = list(data.get("items", []))
+        urls = [
+            f"{self.BASE_URL}{path}?limit={limit}&offset={offset}"
+            for offset in range(limit, data.get("total", 0), limit)
+        ]
+        for url, (status, page) in zip(urls, self._fetch_pages(urls)):
+            if status != 200 or not page:
+                self._page_failed(url, status)
+            items.extend(page.get("items", []))
+        return items
+
+    def _get_pages_conditional(self, path, limit):
+        # Как _get_all_items, но с If-None-Match: (страницы, changed, свежие валидаторы);
+        # changed=False — всё ответило 304. Валидаторы сохраняются только вместе с записью данных
+        first_url = f"{self.BASE_URL}{path}?limit={limit}&offset=0"
+        (status, data, changed), fresh = self._get_conditional(first_url)
+        if status != 200 or not data:
+            self._page_failed(first_url, status)
+        pages = [data]
+        urls = [
+            f"{self.BASE_URL}{path}?limit={limit}&offset={offset}"
+            for offset in range(limit, data.get("total", 0), limit)
+        ]
+        results, fresh_pages = self._fetch_pages_conditional(urls)
+        for url, (status, page, page_changed) in zip(urls, results):
+            if status != 200 or not page:
+                self._page_failed(url, status)
+            changed = changed or page_changed
+            pages.append(page)
+        return pages, changed, fresh + fresh_pages
+
+    @memoized
+    def _liked_pages(self):
+        # У Liked Songs нет snapshot_id — неизменность определяем по ETag страниц /me/tracks
+        return self._get_pages_conditional("/me/tracks", 50)
+
+    @memoized
     def get_favorite_tracks_all(self):
-        tracks = []
-        offset = 0
-        limit = 50
-        while True:
-            url = f"{self.BASE_URL}/me/tracks?limit={limit}&offset={offset}"
-            resp = requests.get(url, headers=self._headers())
-            if resp.status_code != 200:
-                break
-            items = resp.json().get("items", [])
-            if not items:
-                break
-            tracks.extend([
-                {
-                    "id": item["track"]["id"],
-                    "title": item["track"]["name"],
-                    "artist": ", ".join([a["name"] for a in item["track"]["artists"]]),
-                    "album": item["track"]["album"]["name"],
-                    "duration": item["track"]["duration_ms"] // 1000,
-                    "cover_url": item["track"]["album"]["images"][0]["url"] if item["track"]["album"]["images"] else None,
-                    "platform": "spotify"
-                }
-                for item in items
-            ])
-            if len(items) < limit:
-                break
-            offset += limit
-        return tracks
+        pages, _, _ = self._liked_pages()
+        return [
+            self._track_from_api(item["track"])
+            for page in pages
+            for item in page.get("items", [])
+            if item.get("track")
+        ]
 
     def get_favorite_tracks(self, limit=50):
         return self.get_favorite_tracks_all()
@@ -146,7 +154,7 @@ class SpotifyService(BasePlatformService):
             }
 
     def sync_user_playlists_and_favorites(self):
-        from app.models.models import UserPlaylist, UserFavorite, Track, PlaylistTrack, TrackAvailability
+        from app.models.models import UserPlaylist, UserFavorite, PlaylistTrack
         logging.info(f"[SPOTIFY SYNC] user_id={self.user_id} token={self.token}")
         playlists = self.get_playlists()
         logging.info(f"[SPOTIFY SYNC] Получено плейлистов из Spotify: {len(playlists)}")
@@ -156,7 +164,8 @@ class SpotifyService(BasePlatformService):
         # --- Сохраняем Liked Songs в user_favorites (удаляем старый) ---
         session.query(UserFavorite).filter_by(user_id=self.user_id, platform="spotify").delete()
         session.flush()
-        liked_tracks = self.get_favorite_tracks_all()
+        liked_pages, liked_changed, liked_validators = self._liked_pages()
+        liked_count = sum(1 for page in liked_pages for item in page.get("items", []) if item.get("track"))
         session.add(UserFavorite(
             user_id=self.user_id,
             external_id=liked["id"],
@@ -164,7 +173,7 @@ class SpotifyService(BasePlatformService):
             platform="spotify",
             title=liked["title"],
             description=liked.get("description"),
-            tracks_number=len(liked_tracks),
+            tracks_number=liked_count,
             updated_at=datetime.utcnow()
         ))
         logging.info(f"[SPOTIFY SYNC] Сохранён Liked Songs: {liked['id']}")
@@ -177,13 +186,25 @@ class SpotifyService(BasePlatformService):
         for db_pl in db_playlists:
             if str(db_pl.external_id) not in spotify_ids and db_pl.external_id != liked["id"]:
                 session.query(PlaylistTrack).filter(PlaylistTrack.playlist_id == db_pl.id).delete()
+                # Связей больше нет — при повторной подписке тот же snapshot_id не должен пропустить запись
+                db_pl.snapshot_id = None
         session.flush()
+        db_by_external_id = {str(db_pl.external_id): db_pl for db_pl in db_playlists}
+        # Снимаем snapshot_id заранее: после commit объекты истекают и перечитывались бы по одному
+        db_snapshots = {ext_id: db_pl.snapshot_id for ext_id, db_pl in db_by_external_id.items()}
         # Обновляем или добавляем плейлисты и их треки
+        changed = []
         for pl in playlists:
             if pl["title"].lower() == "liked songs":
                 continue
-            tracks = self.get_playlist_tracks(pl["id"])
-            db_pl = session.query(UserPlaylist).filter_by(user_id=self.user_id, external_id=str(pl["id"]), source_platform="spotify").first()
+            # snapshot_id меняется при любом изменении плейлиста — если совпал, треки не трогаем
+            if pl.get("snapshot_id") and db_snapshots.get(str(pl["id"])) == pl["snapshot_id"]:
+                continue
+            changed.append(pl)
+        skipped = len(playlists) - len(changed)
+
+        def write(pl, tracks):
+            db_pl = db_by_external_id.get(str(pl["id"]))
             if not db_pl:
                 db_pl = UserPlaylist(
                     user_id=self.user_id,
@@ -198,49 +219,19 @@ class SpotifyService(BasePlatformService):
                 )
                 session.add(db_pl)
                 session.flush()
-            session.query(PlaylistTrack).filter(PlaylistTrack.playlist_id == db_pl.id).delete()
-            seen_track_ids = set()
-            for idx, t in enumerate(tracks):
-                db_track = session.query(Track).filter_by(title=t["title"], artist=t["artist"]).first()
-                if not db_track:
-                    db_track = Track(
-                        title=t["title"],
-                        artist=t["artist"],
-                        album=t.get("album"),
-                        duration=t.get("duration"),
-                        image_url=t.get("cover_url")
-                    )
-                    session.add(db_track)
-                    session.flush()
-                track_avail_key = (db_track.id, "spotify")
-                if not hasattr(self, '_seen_availability'):
-                    self._seen_availability = set()
-                if track_avail_key in self._seen_availability:
-                    continue
-                self._seen_availability.add(track_avail_key)
-                avail = session.query(TrackAvailability).filter_by(track_id=db_track.id, platform="spotify").first()
-                if not avail:
-                    avail = TrackAvailability(
-                        track_id=db_track.id,
-                        platform="spotify",
-                        external_id=t["id"],
-                        url=None,
-                        available=True
-                    )
-                    session.add(avail)
-                else:
-                    avail.external_id = t["id"]
-                    avail.available = True
-                    avail.last_checked_at = datetime.utcnow()
-                if db_track.id not in seen_track_ids:
-                    session.add(PlaylistTrack(
-                        playlist_id=db_pl.id,
-                        platform="spotify",
-                        track_id=db_track.id,
-                        order_index=idx
-                    ))
-                    seen_track_ids.add(db_track.id)
+            else:
+                db_pl.title = pl["title"]
+                db_pl.description = pl.get("description")
+                db_pl.image_url = pl.get("cover_url")
+                db_pl.updated_at = datetime.utcnow()
+                db_pl.tracks_number = len(tracks)
+            write_playlist(session, db_pl.id, "spotify", tracks)
+            db_pl.snapshot_id = pl.get("snapshot_id")
             session.commit()
+
+        # Треки плейлистов качаются параллельно, пишутся по одному в этом потоке
+        run_sync_pipeline(changed, lambda pl: self.get_playlist_tracks(pl["id"]), write, label="SPOTIFY SYNC")
+        logging.info(f"[SPOTIFY SYNC] Пропущено неизменённых плейлистов (snapshot_id): {skipped}")
         # --- Liked Songs как плейлист ---
         liked_playlist = session.query(UserPlaylist).filter_by(
             user_id=self.user_id,
@@ -257,74 +248,48 @@ class SpotifyService(BasePlatformService):
                 updated_at=datetime.utcnow(),
                 image_url=None,
                 is_public=True,
-                tracks_number=len(liked_tracks)
+                tracks_number=liked_count
             )
             session.add(liked_playlist)
             session.commit()
+            liked_changed = True
         else:
             liked_playlist.updated_at = datetime.utcnow()
             liked_playlist.is_public = True
-            liked_playlist.tracks_number = len(liked_tracks)
-        session.query(PlaylistTrack).filter(PlaylistTrack.playlist_id == liked_playlist.id).delete()
-        seen_track_ids = set()
-        for idx, t in enumerate(liked_tracks):
-            db_track = session.query(Track).filter_by(title=t["title"], artist=t["artist"]).first()
-            if not db_track:
-                db_track = Track(
-                    title=t["title"],
-                    artist=t["artist"],
-                    album=t.get("album"),
-                    duration=t.get("duration"),
-                    image_url=t.get("cover_url")
-                )
-                session.add(db_track)
-                session.flush()
-            track_avail_key = (db_track.id, "spotify")
-            if not hasattr(self, '_seen_availability'):
-                self._seen_availability = set()
-            if track_avail_key in self._seen_availability:
-                continue
-            self._seen_availability.add(track_avail_key)
-            avail = session.query(TrackAvailability).filter_by(track_id=db_track.id, platform="spotify").first()
-            if not avail:
-                avail = TrackAvailability(
-                    track_id=db_track.id,
-                    platform="spotify",
-                    external_id=t["id"],
-                    url=None,
-                    available=True
-                )
-                session.add(avail)
-            else:
-                avail.external_id = t["id"]
-                avail.available = True
-                avail.last_checked_at = datetime.utcnow()
-            if db_track.id not in seen_track_ids:
-                session.add(PlaylistTrack(
-                    playlist_id=liked_playlist.id,
-                    platform="spotify",
-                    track_id=db_track.id,
-                    order_index=idx
-                ))
-                seen_track_ids.add(db_track.id)
+            liked_playlist.tracks_number = liked_count
+        if liked_changed:
+            write_playlist(session, liked_playlist.id, "spotify", self.get_favorite_tracks_all())
+        else:
+            logging.info("[SPOTIFY SYNC] Liked Songs не изменились (ETag) — связи не переписываем")
         fav = session.query(UserFavorite).filter_by(user_id=self.user_id, platform="spotify").first()
         if fav:
-            fav.tracks_number = len(liked_tracks)
+            fav.tracks_number = liked_count
+        # ETag фиксируем в той же транзакции, что и связи: упавшая запись не даст 304 в следующий раз
+        self._save_validators(session, liked_validators)
         session.commit()
+        self._save_stats({
+            "external_user_id": profile.get("id"),
+            "display_name": profile.get("display_name"),
+            "songs": liked_count,
+            "playlists": len([pl for pl in playlists if pl["title"].lower() != "liked songs"]),
+            "subscription_type": profile.get("product", "—"),
+        })
         logging.info(f"[SPOTIFY SYNC] Коммит завершён для user_id={self.user_id}")
-        if hasattr(self, '_seen_availability'):
-            del self._seen_availability
 
     def get_liked_songs_count(self):
         url = f"{self.BASE_URL}/me/tracks?limit=1"
-        resp = requests.get(url, headers=self._headers())
+        resp = self._get(url)
         if resp.status_code != 200:
             return 0
         return resp.json().get("total", 0)
 
     def get_playlists_count(self):
-        playlists = self.get_playlists()
-        return len([pl for pl in playlists if pl["title"].lower() != "liked songs"])
+        # Достаточно total из первой страницы — пагинировать весь список ради числа не нужно
+        url = f"{self.BASE_URL}/me/playlists?limit=1"
+        resp = self._get(url)
+        if resp.status_code != 200:
+            return 0
+        return resp.json().get("total", 0)
 
     def get_liked_playlist_info(self):
         profile = self.get_user_profile() or {}
@@ -335,37 +300,64 @@ class SpotifyService(BasePlatformService):
         }
 
     def get_playlist_tracks(self, playlist_id, limit=100):
-        tracks = []
-        offset = 0
-        while True:
-            url = f"{self.BASE_URL}/playlists/{playlist_id}/tracks?limit={limit}&offset={offset}"
-            resp = requests.get(url, headers=self._headers())
-            if resp.status_code != 200:
-                break
-            items = resp.json().get("items", [])
-            if not items:
-                break
-            for item in items:
-                t = item.get("track")
-                if not t:
-                    continue
-                tracks.append({
-                    "id": t["id"],
-                    "title": t["name"],
-                    "artist": ", ".join([a["name"] for a in t["artists"]]),
-                    "album": t["album"]["name"],
-                    "duration": t["duration_ms"] // 1000,
-                    "cover_url": t["album"]["images"][0]["url"] if t["album"]["images"] else None,
-                    "platform": "spotify"
-                })
-            if len(items) < limit:
-                break
-            offset += limit
-        return tracks
+        return [
+            self._track_from_api(item["track"])
+            for item in self._get_all_items(f"/playlists/{playlist_id}/tracks", limit)
+            if item.get("track")
+        ]
 
     def get_playlist_tracks_count(self, playlist_id):
         url = f"{self.BASE_URL}/playlists/{playlist_id}"
-        resp = requests.get(url, headers=self._headers())
+        resp = self._get(url)
         if resp.status_code != 200:
             return 0
         return resp.json().get("tracks", {}).get("total", 0)
+
+    def search(self, query, limit=10):
+        url = f"{self.BASE_URL}/search?{urlencode({'q': query, 'type': 'track', 'limit': limit})}"
+        resp = self._get(url)
+        if resp.status_code != 200:
+            self._page_failed(url, resp.status_code)
+        return [self._track_from_api(t) for t in resp.json().get("tracks", {}).get("items", []) if t]
+
+    def search_tracks(self, track, limit=5):
+        # По ISRC Spotify находит ровно эту запись; без него — поиск по полям названия и исполнителя
+        if track.get("isrc"):
+            found = self.search(f"isrc:{track['isrc']}", limit)
+            if found:
+                return found
+        return self.search(f"track:{track['title']} artist:{track['artist']}", limit)
+
+    def create_playlist(self, title, description=None, public=False):
+        profile = self.get_user_profile() or {}
+        url = f"{self.BASE_URL}/users/{profile.get('id')}/playlists"
+        resp = self._post(url, json={"name": title, "description": description or "", "public": public})
+        if resp.status_code not in (200, 201):
+            raise PlatformRequestError(self.CONNECTION_PLATFORM, url, resp.status_code)
+        return resp.json()["id"]
+
+    def add_tracks(self, playlist_id, external_ids):
+        url = f"{self.BASE_URL}/playlists/{playlist_id}/tracks"
+        resp = self._post(url, json={"uris": [f"spotify:track:{track_id}" for track_id in external_ids]})
+        if resp.status_code not in (200, 201):
+            raise PlatformRequestError(self.CONNECTION_PLATFORM, url, resp.status_code)
+
+    def playlist_size(self, playlist_id):
+        url = f"{self.BASE_URL}/playlists/{playlist_id}?fields=tracks.total"
+        resp = self._get(url)
+        if resp.status_code != 200:
+            self._page_failed(url, resp.status_code)
+        return resp.json().get("tracks", {}).get("total", 0)
+
+    def lookup_availability(self, external_ids):
+        # Без market: ответ не зависит от страны проверяющего аккаунта. Недоступен только удалённый
+        # трек (приходит null) или снятый во всех странах (пустой available_markets)
+        url = f"{self.BASE_URL}/tracks?{urlencode({'ids': ','.join(external_ids)})}"
+        resp = self._get(url)
+        if resp.status_code != 200:
+            self._page_failed(url, resp.status_code)
+        tracks = resp.json().get("tracks", [])
+        return {
+            external_id: bool(t) and t.get("available_markets") != []
+            for external_id, t in zip(external_ids, tracks)
+        }
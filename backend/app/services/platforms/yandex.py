@@ -1,36 +1,42 @@
-import requests
+import os
+import json
+from urllib.parse import urlencode
 from .base import BasePlatformService
-from app.models.models import ConnectedService
+from app.services.resilience import PlatformRequestError
+from app.services.sync_writer import write_playlist
+from app.services.sync_pipeline import run_sync_pipeline
+from app.services.memo import memoized
 from sqlalchemy.orm import Session
 from datetime import datetime
 
 class YandexMusicService(BasePlatformService):
-    BASE_URL = "https://api.music.yandex.net"
+    # Переопределяется для прогонов против локального фейкового сервера платформы
+    BASE_URL = os.getenv("YANDEX_API_BASE", "https://api.music.yandex.net")
+    CONNECTION_PLATFORM = "yandex-music"
+    LOOKUP_BATCH = 100
 
-    def __init__(self, db: Session, user_id: int):
-        super().__init__(db, user_id)
+    def __init__(self, db: Session, user_id: int, connection=None):
+        super().__init__(db, user_id, connection)
         self.token = self._get_token()
 
-    def _get_token(self):
-        # Получаем xtoken для Яндекс.Музыки из ConnectedService (теперь только ручной ввод)
-        service = self.db.query(ConnectedService).filter_by(user_id=self.user_id, platform="yandex-music").first()
-        if not service:
-            return None
-        return service.access_token
-
     def _headers(self):
-        return {"Authorization": f"OAuth {self.token}"}
+        # xtoken вводится вручную и не истекает — обновлять нечего, берём из кэша
+        return {"Authorization": f"OAuth {self._current_token()}"}
 
+    @memoized
     def get_user_profile(self):
-        resp = requests.get(f"{self.BASE_URL}/account/status", headers=self._headers())
+        resp = self._get(f"{self.BASE_URL}/account/status")
         if resp.status_code != 200:
             return None
         return resp.json().get("result", {})
 
+    @memoized
     def get_playlists(self, limit=100):
-        resp = requests.get(f"{self.BASE_URL}/users/{self.user_id}/playlists/list", headers=self._headers())
+        url = f"{self.BASE_URL}/users/{self.user_id}/playlists/list"
+        resp = self._get(url)
         if resp.status_code != 200:
-            return []
+            # Пустой список синхронизация приняла бы за удаление всех плейлистов
+            self._page_failed(url, resp.status_code)
         playlists = resp.json().get("result", [])
         return [
             {
@@ -44,44 +50,65 @@ class YandexMusicService(BasePlatformService):
             for pl in playlists
         ]
 
+    def _track_from_api(self, t):
+        return {
+            "id": t["id"],
+            "title": t["title"],
+            "artist": t["artists"][0]["name"] if t.get("artists") else "",
+            "album": t.get("albums", [{}])[0].get("title", "") if t.get("albums") else "",
+            "duration": t.get("durationMs", 0) // 1000,
+            "cover_url": None,  # Можно доработать
+            "platform": "yandex"
+        }
+
+    @memoized
     def get_favorite_tracks_all(self):
         # Получить все треки из "Моей музыки" (лайкнутые)
-        tracks = []
-        offset = 0
         page_size = 100
-        while True:
-            url = f"{self.BASE_URL}/users/{self.user_id}/likes/tracks?limit={page_size}&offset={offset}"
-            resp = requests.get(url, headers=self._headers())
-            if resp.status_code != 200:
-                break
-            items = resp.json().get("result", {}).get("tracks", [])
-            if not items:
-                break
-            tracks.extend([
-                {
-                    "id": t["id"],
-                    "title": t["title"],
-                    "artist": t["artists"][0]["name"] if t.get("artists") else "",
-                    "album": t.get("albums", [{}])[0].get("title", "") if t.get("albums") else "",
-                    "duration": t.get("durationMs", 0) // 1000,
-                    "cover_url": None,  # Можно доработать
-                    "platform": "yandex"
-                }
-                for t in items
-            ])
-            if len(items) < page_size:
-                break
-            offset += page_size
-        return tracks
+        url = f"{self.BASE_URL}/users/{self.user_id}/likes/tracks?limit={page_size}&offset=0"
+        resp = self._get(url)
+        if resp.status_code != 200:
+            self._page_failed(url, resp.status_code)
+        result = resp.json().get("result", {})
+        items = list(result.get("tracks", []))
+        if len(items) < page_size:
+            return [self._track_from_api(t) for t in items]
+        total = result.get("pager", {}).get("total") or result.get("total")
+        if total:
+            # Общее число известно — остальные страницы забираем параллельно
+            urls = [
+                f"{self.BASE_URL}/users/{self.user_id}/likes/tracks?limit={page_size}&offset={offset}"
+                for offset in range(page_size, total, page_size)
+            ]
+            for url, (status, page) in zip(urls, self._fetch_pages(urls)):
+                if status != 200 or not page:
+                    self._page_failed(url, status)
+                items.extend(page.get("result", {}).get("tracks", []))
+        else:
+            offset = page_size
+            while True:
+                url = f"{self.BASE_URL}/users/{self.user_id}/likes/tracks?limit={page_size}&offset={offset}"
+                resp = self._get(url)
+                if resp.status_code != 200:
+                    self._page_failed(url, resp.status_code)
+                page_items = resp.json().get("result", {}).get("tracks", [])
+                if not page_items:
+                    break
+                items.extend(page_items)
+                if len(page_items) < page_size:
+                    break
+                offset += page_size
+        return [self._track_from_api(t) for t in items]
 
     def sync_user_playlists_and_favorites(self):
         import logging
-        from app.models.models import UserPlaylist, UserFavorite, Track, PlaylistTrack, TrackAvailability
+        from app.models.models import UserPlaylist, UserFavorite, PlaylistTrack
         logging.info(f"[YANDEX SYNC] user_id={self.user_id} token={self.token}")
         playlists = self.get_playlists()
         logging.info(f"[YANDEX SYNC] Получено плейлистов из Yandex: {len(playlists)}")
         session = self.db
         liked = self.get_liked_playlist_info()
+        liked_tracks = self.get_favorite_tracks_all()
         # Сохраняем Liked Songs в user_favorites (удаляем старый)
         session.query(UserFavorite).filter_by(user_id=self.user_id, platform="yandex").delete()
         session.flush()
@@ -92,7 +119,7 @@ class YandexMusicService(BasePlatformService):
             platform="yandex",
             title=liked["title"],
             description=liked.get("description"),
-            tracks_number=len(self.get_favorite_tracks_all()),
+            tracks_number=len(liked_tracks),
             updated_at=datetime.utcnow()
         ))
         logging.info(f"[YANDEX SYNC] Сохранён Liked Songs: {liked['id']}")
@@ -109,11 +136,10 @@ class YandexMusicService(BasePlatformService):
                 session.query(PlaylistTrack).filter(PlaylistTrack.playlist_id == db_pl.id).delete()
         session.flush()
         # Обновляем или добавляем плейлисты и их треки
-        for pl in playlists:
-            if pl["title"].lower() == "моя музыка":
-                continue
-            tracks = self.get_playlist_tracks(pl["id"])
-            db_pl = session.query(UserPlaylist).filter_by(user_id=self.user_id, external_id=str(pl["id"]), source_platform="yandex").first()
+        db_by_external_id = {str(db_pl.external_id): db_pl for db_pl in db_playlists}
+
+        def write(pl, tracks):
+            db_pl = db_by_external_id.get(str(pl["id"]))
             if not db_pl:
                 db_pl = UserPlaylist(
                     user_id=self.user_id,
@@ -128,51 +154,17 @@ class YandexMusicService(BasePlatformService):
                 )
                 session.add(db_pl)
                 session.flush()
-            session.query(PlaylistTrack).filter(PlaylistTrack.playlist_id == db_pl.id).delete()
-            seen_track_ids = set()
-            for idx, t in enumerate(tracks):
-                db_track = session.query(Track).filter_by(title=t["title"], artist=t["artist"]).first()
-                if not db_track:
-                    db_track = Track(
-                        title=t["title"],
-                        artist=t["artist"],
-                        album=t.get("album"),
-                        duration=t.get("duration"),
-                        image_url=t.get("cover_url")
-                    )
-                    session.add(db_track)
-                    session.flush()
-                track_avail_key = (db_track.id, "yandex")
-                if not hasattr(self, '_seen_availability'):
-                    self._seen_availability = set()
-                if track_avail_key in self._seen_availability:
-                    continue
-                self._seen_availability.add(track_avail_key)
-                avail = session.query(TrackAvailability).filter_by(track_id=db_track.id, platform="yandex").first()
-                if not avail:
-                    avail = TrackAvailability(
-                        track_id=db_track.id,
-                        platform="yandex",
-                        external_id=t["id"],
-                        url=None,
-                        available=True
-                    )
-                    session.add(avail)
-                else:
-                    avail.external_id = t["id"]
-                    avail.available = True
-                    avail.last_checked_at = datetime.utcnow()
-                if db_track.id not in seen_track_ids:
-                    session.add(PlaylistTrack(
-                        playlist_id=db_pl.id,
-                        platform="yandex",
-                        track_id=db_track.id,
-                        order_index=idx
-                    ))
-                    seen_track_ids.add(db_track.id)
+            write_playlist(session, db_pl.id, "yandex", tracks)
             session.commit()
+
+        # Треки плейлистов качаются параллельно, пишутся по одному в этом потоке
+        run_sync_pipeline(
+            [pl for pl in playlists if pl["title"].lower() != "моя музыка"],
+            lambda pl: self.get_playlist_tracks(pl["id"]),
+            write,
+            label="YANDEX SYNC",
+        )
         # --- Liked Songs ---
-        liked_tracks = self.get_favorite_tracks_all()
         liked_playlist = session.query(UserPlaylist).filter_by(
             user_id=self.user_id,
             source_platform="yandex",
@@ -196,55 +188,16 @@ class YandexMusicService(BasePlatformService):
             liked_playlist.updated_at = datetime.utcnow()
             liked_playlist.is_public = True
             liked_playlist.tracks_number = len(liked_tracks)
-        session.query(PlaylistTrack).filter(PlaylistTrack.playlist_id == liked_playlist.id).delete()
-        seen_track_ids = set()
-        for idx, t in enumerate(liked_tracks):
-            db_track = session.query(Track).filter_by(title=t["title"], artist=t["artist"]).first()
-            if not db_track:
-                db_track = Track(
-                    title=t["title"],
-                    artist=t["artist"],
-                    album=t.get("album"),
-                    duration=t.get("duration"),
-                    image_url=t.get("cover_url")
-                )
-                session.add(db_track)
-                session.flush()
-            track_avail_key = (db_track.id, "yandex")
-            if not hasattr(self, '_seen_availability'):
-                self._seen_availability = set()
-            if track_avail_key in self._seen_availability:
-                continue
-            self._seen_availability.add(track_avail_key)
-            avail = session.query(TrackAvailability).filter_by(track_id=db_track.id, platform="yandex").first()
-            if not avail:
-                avail = TrackAvailability(
-                    track_id=db_track.id,
-                    platform="yandex",
-                    external_id=t["id"],
-                    url=None,
-                    available=True
-                )
-                session.add(avail)
-            else:
-                avail.external_id = t["id"]
-                avail.available = True
-                avail.last_checked_at = datetime.utcnow()
-            if db_track.id not in seen_track_ids:
-                session.add(PlaylistTrack(
-                    playlist_id=liked_playlist.id,
-                    platform="yandex",
-                    track_id=db_track.id,
-                    order_index=idx
-                ))
-                seen_track_ids.add(db_track.id)
+        write_playlist(session, liked_playlist.id, "yandex", liked_tracks)
         fav = session.query(UserFavorite).filter_by(user_id=self.user_id, platform="yandex").first()
         if fav:
             fav.tracks_number = len(liked_tracks)
         session.commit()
+        stats = self.get_stats()
+        stats["songs"] = len(liked_tracks)
+        stats["playlists"] = len(yandex_ids)
+        self._save_stats(stats)
         logging.info(f"[YANDEX SYNC] Коммит завершён для user_id={self.user_id}")
-        if hasattr(self, '_seen_availability'):
-            del self._seen_availability
 
     def get_stats(self):
         profile = self.get_user_profile() or {}
@@ -256,26 +209,15 @@ class YandexMusicService(BasePlatformService):
 
     def get_playlist_tracks(self, playlist_id, limit=100):
         url = f"{self.BASE_URL}/users/{self.user_id}/playlists/{playlist_id}/tracks?page-size={limit}"
-        resp = requests.get(url, headers=self._headers())
+        resp = self._get(url)
         if resp.status_code != 200:
-            return []
+            self._page_failed(url, resp.status_code)
         items = resp.json().get("result", {}).get("tracks", [])
-        return [
-            {
-                "id": t["id"],
-                "title": t["title"],
-                "artist": t["artists"][0]["name"] if t.get("artists") else "",
-                "album": t.get("albums", [{}])[0].get("title", "") if t.get("albums") else "",
-                "duration": t.get("durationMs", 0) // 1000,
-                "cover_url": None,  # Можно доработать
-                "platform": "yandex"
-            }
-            for t in items
-        ]
+        return [self._track_from_api(t) for t in items]
 
     def get_playlist_tracks_count(self, playlist_id):
         url = f"{self.BASE_URL}/users/{self.user_id}/playlists/{playlist_id}"
-        resp = requests.get(url, headers=self._headers())
+        resp = self._get(url)
         if resp.status_code != 200:
             return 0
         return resp.json().get("result", {}).get("trackCount", 0)
@@ -286,3 +228,76 @@ class YandexMusicService(BasePlatformService):
             "title": "Моя музыка",
             "description": "Yandex Liked Tracks"
         }
+
+    # --- Запись: uid аккаунта Яндекса из connected_services, а не id пользователя Orbitune ---
+
+    def _account_uid(self):
+        return self.connection.external_user_id if self.connection else None
+
+    def search(self, query, limit=10):
+        url = f"{self.BASE_URL}/search?{urlencode({'text': query, 'type': 'track', 'page': 0})}"
+        resp = self._get(url)
+        if resp.status_code != 200:
+            self._page_failed(url, resp.status_code)
+        results = (resp.json().get("result", {}).get("tracks") or {}).get("results", [])[:limit]
+        found = []
+        for t in results:
+            candidate = self._track_from_api(t)
+            # Для вставки в плейлист Яндексу нужен и альбом — храним id как "трек:альбом"
+            if t.get("albums"):
+                candidate["id"] = f"{t['id']}:{t['albums'][0]['id']}"
+            found.append(candidate)
+        return found
+
+    def search_tracks(self, track, limit=5):
+        return self.search(f"{track['artist']} {track['title']}", limit)
+
+    def create_playlist(self, title, description=None, public=False):
+        url = f"{self.BASE_URL}/users/{self._account_uid()}/playlists/create"
+        resp = self._post(url, data={"title": title, "visibility": "public" if public else "private"})
+        if resp.status_code != 200:
+            raise PlatformRequestError(self.CONNECTION_PLATFORM, url, resp.status_code)
+        return str(resp.json()["result"]["kind"])
+
+    def _playlist_info(self, playlist_id):
+        url = f"{self.BASE_URL}/users/{self._account_uid()}/playlists/{playlist_id}"
+        resp = self._get(url)
+        if resp.status_code != 200:
+            self._page_failed(url, resp.status_code)
+        return resp.json().get("result", {})
+
+    def add_tracks(self, playlist_id, external_ids):
+        # change-relative требует текущую ревизию плейлиста и позицию вставки
+        info = self._playlist_info(playlist_id)
+        tracks = []
+        for external_id in external_ids:
+            track_id, _, album_id = str(external_id).partition(":")
+            tracks.append({"id": track_id, "albumId": album_id} if album_id else {"id": track_id})
+        diff = [{"op": "insert", "at": info.get("trackCount", 0), "tracks": tracks}]
+        url = f"{self.BASE_URL}/users/{self._account_uid()}/playlists/{playlist_id}/change-relative"
+        resp = self._post(url, data={"diff": json.dumps(diff), "revision": info.get("revision", 1)})
+        if resp.status_code != 200:
+            raise PlatformRequestError(self.CONNECTION_PLATFORM, url, resp.status_code)
+
+    def find_playlists(self, title):
+        # Плейлисты аккаунта по uid владельца токена — тот же, что у create_playlist
+        url = f"{self.BASE_URL}/users/{self._account_uid()}/playlists/list"
+        resp = self._get(url)
+        if resp.status_code != 200:
+            self._page_failed(url, resp.status_code)
+        return [str(pl["kind"]) for pl in resp.json().get("result", []) if pl.get("title") == title]
+
+    def playlist_size(self, playlist_id):
+        return self._playlist_info(playlist_id).get("trackCount", 0)
+
+    def lookup_availability(self, external_ids):
+        # /tracks принимает пачку id; у найденных поиском id вида "трек:альбом" берём трек.
+        # Недоступен трек, которого нет в ответе или у которого сняты права (available=false)
+        track_ids = {external_id: str(external_id).partition(":")[0] for external_id in external_ids}
+        url = f"{self.BASE_URL}/tracks"
+        # POST здесь — чтение, повторять его безопасно
+        resp = self._post(url, idempotent=True, data={"track-ids": ",".join(track_ids.values())})
+        if resp.status_code != 200:
+            self._page_failed(url, resp.status_code)
+        available = {str(t.get("id")): t.get("available", True) for t in resp.json().get("result", [])}
+        return {external_id: bool(available.get(track_id, False)) for external_id, track_id in track_ids.items()}
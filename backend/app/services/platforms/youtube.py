@@ -1,65 +1,61 @@
 import os
 import logging
-import requests
+from urllib.parse import urlencode
 
 from datetime import datetime
-from app.models.models import UserPlaylist, PlaylistTrack, Track, TrackAvailability, UserFavorite, ConnectedService
+from app.models.models import UserPlaylist, PlaylistTrack, UserFavorite
 from sqlalchemy.orm import Session
 from .base import BasePlatformService
+from app.services.sync_writer import write_playlist
+from app.services.sync_pipeline import run_sync_pipeline
+from app.services.memo import memoized
+from app.services import youtube_quota
+from app.services.youtube_quota import DEFERRABLE, QuotaExceeded
+from app.services.resilience import PlatformRequestError
 
-YOUTUBE_API_BASE = "https://www.googleapis.com/youtube/v3"
+# Переопределяется для прогонов против локального фейкового сервера платформы
+YOUTUBE_API_BASE = os.getenv("YOUTUBE_API_BASE", "https://www.googleapis.com/youtube/v3")
 
 class YouTubeService(BasePlatformService):
+    CONNECTION_PLATFORM = "youtube"
+    ADD_TRACKS_BATCH = 1  # playlistItems.insert добавляет по одному видео
 
-    def __init__(self, db: Session, user_id: int):
-        super().__init__(db, user_id)
+    def __init__(self, db: Session, user_id: int, connection=None):
+        super().__init__(db, user_id, connection)
         self.token = self._get_token()
-        self.external_user_id = self._get_external_user_id()
-
-    def _get_token(self):
-        service = self.db.query(ConnectedService).filter_by(user_id=self.user_id, platform="youtube").first()
-        if not service:
-            return None
-        return service.access_token
-
-    def _refresh_token(self):
-        service = self.db.query(ConnectedService).filter_by(user_id=self.user_id, platform="youtube").first()
-        if not service or not service.refresh_token:
-            logging.warning(f"[YOUTUBE] Нет refresh_token для user_id={self.user_id}")
-            return False
-        data = {
-            "client_id": os.getenv("GOOGLE_CLIENT_ID"),
-            "client_secret": os.getenv("GOOGLE_CLIENT_SECRET"),
-            "refresh_token": service.refresh_token,
-            "grant_type": "refresh_token"
-        }
-        resp = requests.post("https://oauth2.googleapis.com/token", data=data)
-        logging.info(f"[YOUTUBE] refresh_token status={resp.status_code} body={resp.text[:500]}")
-        if resp.status_code == 200:
-            tokens = resp.json()
-            service.access_token = tokens["access_token"]
-            self.db.commit()
-            self.token = tokens["access_token"]
-            logging.info(f"[YOUTUBE] access_token обновлён для user_id={self.user_id}")
-            return True
-        else:
-            logging.error(f"[YOUTUBE] Не удалось обновить access_token для user_id={self.user_id}. Ответ: {resp.text}")
-            # Удаляем сервис если refresh_token невалиден
-            if resp.status_code == 400 and "invalid_grant" in resp.text:
-                self.db.query(ConnectedService).filter_by(user_id=self.user_id, platform="youtube").delete()
-                self.db.commit()
-                logging.warning(f"[YOUTUBE] ConnectedService удалён для user_id={self.user_id} из-за невалидного refresh_token")
-        return False
-
-    def _get_external_user_id(self):
-        service = self.db.query(ConnectedService).filter_by(user_id=self.user_id, platform="youtube").first()
-        if not service:
-            return None
-        return service.external_user_id
+        self.external_user_id = self.connection.external_user_id if self.connection else None
 
     def _headers(self):
-        return {"Authorization": f"Bearer {self.token}"}
+        return {"Authorization": f"Bearer {self._current_token()}"}
+
+    def _http_get(self, url, headers, priority=None):
+        # Каждый вызов Data API сначала списывает квоту по приоритету операции
+        youtube_quota.spend(youtube_quota.method_for_url(url), priority or self.priority)
+        resp = super()._http_get(url, headers)
+        if resp.status_code == 403 and "quotaExceeded" in resp.text:
+            youtube_quota.mark_exhausted()
+            raise QuotaExceeded(priority or self.priority, youtube_quota.reset_at())
+        return resp
+
+    def _http_post(self, url, headers, idempotent=False, **kwargs):
+        youtube_quota.spend(youtube_quota.method_for_url(url, "insert"), self.priority)
+        resp = super()._http_post(url, headers, idempotent=idempotent, **kwargs)
+        if resp.status_code == 403 and "quotaExceeded" in resp.text:
+            youtube_quota.mark_exhausted()
+            raise QuotaExceeded(self.priority, youtube_quota.reset_at())
+        return resp
+
+    def _fetch_pages(self, urls, priority=None):
+        if urls:
+            youtube_quota.spend(youtube_quota.method_for_url(urls[0]), priority or self.priority, calls=len(urls))
+        return super()._fetch_pages(urls)
 
+    def _fetch_pages_conditional(self, urls, priority=None):
+        if urls:
+            youtube_quota.spend(youtube_quota.method_for_url(urls[0]), priority or self.priority, calls=len(urls))
+        return super()._fetch_pages_conditional(urls)
+
+    @memoized
     def get_playlists(self, limit=50):
         if not self.token:
             return []
@@ -67,12 +63,12 @@ class YouTubeService(BasePlatformService):
         url = f"{YOUTUBE_API_BASE}/playlists?part=snippet,contentDetails&mine=true&maxResults=50"
         retried = False
         while url:
-            resp = requests.get(url, headers=self._headers())
+            resp = self._http_get(url, self._headers())
             logging.info(f"[YOUTUBE] get_playlists status={resp.status_code} url={url} body={resp.text[:200]}")
             if resp.status_code == 401 and not retried:
                 if self._refresh_token():
                     retried = True
-                    resp = requests.get(url, headers=self._headers())
+                    resp = self._http_get(url, self._headers())
                     logging.info(f"[YOUTUBE] get_playlists (after refresh) status={resp.status_code} url={url} body={resp.text[:200]}")
                 else:
                     raise Exception("YouTube access token expired and refresh failed.")
@@ -96,6 +92,7 @@ class YouTubeService(BasePlatformService):
                 url = None
         return playlists
 
+    @memoized
     def get_favorite_tracks_all(self):
         # YouTube Music "Liked songs" = playlist with title "Liked songs" or id "LL..."
         liked_playlist = self.get_liked_playlist_info()
@@ -109,6 +106,7 @@ class YouTubeService(BasePlatformService):
         db_playlists = session.query(UserPlaylist).filter_by(user_id=self.user_id, source_platform="youtube").all()
         youtube_playlists = {pl["id"]: pl for pl in self.get_playlists()}
         logging.info(f"[YOUTUBE SYNC] Получено плейлистов из YouTube: {len(youtube_playlists)}")
+        db_by_external_id = {}
         for db_pl in db_playlists:
             pl_data = youtube_playlists.get(db_pl.external_id)
             if not pl_data:
@@ -118,39 +116,40 @@ class YouTubeService(BasePlatformService):
                 session.delete(db_pl)
                 session.commit()
                 continue
-            tracks = self.get_playlist_tracks(db_pl.external_id)
+            db_by_external_id[db_pl.external_id] = db_pl
+
+        unchanged = 0
+
+        def write(pl_data, fetched):
+            nonlocal unchanged
+            tracks, validators = fetched
+            db_pl = db_by_external_id[pl_data["id"]]
             db_pl.title = pl_data["title"]
             db_pl.description = pl_data.get("description")
             db_pl.updated_at = datetime.utcnow()
             db_pl.image_url = pl_data.get("cover_url")
-            db_pl.tracks_number = len(tracks)
-            session.query(PlaylistTrack).filter(PlaylistTrack.playlist_id == db_pl.id).delete()
-            seen_track_ids = set()
-            for idx, t in enumerate(tracks):
-                db_track = session.query(Track).filter_by(title=t["title"], artist=t["artist"]).first()
-                if not db_track:
-                    db_track = Track(
-                        title=t["title"],
-                        artist=t["artist"],
-                        album=t.get("album"),
-                        duration=t.get("duration"),
-                        image_url=t.get("cover_url")
-                    )
-                    session.add(db_track)
-                    session.flush()
-                if db_track.id not in seen_track_ids:
-                    session.add(PlaylistTrack(
-                        playlist_id=db_pl.id,
-                        platform="youtube",
-                        track_id=db_track.id,
-                        order_index=idx
-                    ))
-                    seen_track_ids.add(db_track.id)
+            if tracks is None:
+                # Все страницы плейлиста ответили 304 — связи в БД актуальны, треки не трогаем
+                unchanged += 1
+            else:
+                db_pl.tracks_number = len(tracks)
+                write_playlist(session, db_pl.id, "youtube", tracks)
+            # ETag страниц фиксируем вместе со связями: упавшая запись не даст 304 в следующий раз
+            self._save_validators(session, validators)
             session.commit()
+
+        # Синхронизируем только импортированные плейлисты: качаем параллельно, пишем по одному
+        run_sync_pipeline(
+            [youtube_playlists[ext_id] for ext_id in db_by_external_id],
+            lambda pl_data: self._changed_playlist_tracks(pl_data["id"]),
+            write,
+            label="YOUTUBE SYNC",
+        )
+        logging.info(f"[YOUTUBE SYNC] Пропущено неизменённых плейлистов (ETag): {unchanged}")
         # Сохраняем "Liked songs" как избранное
         liked = self.get_liked_playlist_info()
         if liked:
-            liked_tracks = self.get_playlist_tracks(liked["id"])
+            liked_tracks = self.get_favorite_tracks_all()
             session.query(UserFavorite).filter_by(user_id=self.user_id, platform="youtube").delete()
             session.flush()
             session.add(UserFavorite(
@@ -164,35 +163,59 @@ class YouTubeService(BasePlatformService):
                 updated_at=datetime.utcnow()
             ))
             session.commit()
+        stats = self.get_stats()
+        stats["songs"] = len(liked_tracks) if liked else 0
+        stats["playlists"] = len(db_by_external_id)
+        self._save_stats(stats)
 
     def get_stats(self):
         # Можно получить имя пользователя через people/me или userinfo
         return {
             "external_user_id": self.external_user_id,
             "display_name": "YouTube User",
-            "songs": 0,
-            "playlists": 0,
             "subscription_type": "—",
         }
 
     def get_playlist_tracks(self, playlist_id, limit=100):
         # --- Получение треков для плейлиста из бд ---
+        # Страницы запрашиваются с If-None-Match: на 304 берём сохранённую страницу без повторной загрузки.
         if not self.token:
             return []
-        tracks = []
+        pages, _, _ = self._playlist_pages(playlist_id)
+        return self._tracks_from_pages(pages)
+
+    def _changed_playlist_tracks(self, playlist_id):
+        # Для синхронизации: (треки | None, свежие валидаторы); None — все страницы ответили 304.
+        # Валидаторы сохраняются в write вместе со связями плейлиста, а не при скачивании
+        if not self.token:
+            return [], []
+        pages, changed, fresh = self._playlist_pages(playlist_id)
+        if not changed:
+            return None, fresh
+        return self._tracks_from_pages(pages), fresh
+
+    def _playlist_pages(self, playlist_id):
+        pages = []
+        changed = False
+        fresh = []
         url = f"{YOUTUBE_API_BASE}/playlistItems?part=snippet,contentDetails&playlistId={playlist_id}&maxResults=50"
-        retried = False
         while url:
-            resp = requests.get(url, headers=self._headers())
-            if resp.status_code == 401 and not retried:
-                if self._refresh_token():
-                    retried = True
-                    resp = requests.get(url, headers=self._headers())
-                else:
-                    break
-            if resp.status_code != 200:
-                break
-            data = resp.json()
+            (status, data, page_changed), page_fresh = self._get_conditional(url)
+            if status != 200 or data is None:
+                self._page_failed(url, status)
+            changed = changed or page_changed
+            fresh.extend(page_fresh)
+            pages.append(data)
+            nextPageToken = data.get("nextPageToken")
+            if nextPageToken:
+                url = f"{YOUTUBE_API_BASE}/playlistItems?part=snippet,contentDetails&playlistId={playlist_id}&maxResults=50&pageToken={nextPageToken}"
+            else:
+                url = None
+        return pages, changed, fresh
+
+    def _tracks_from_pages(self, pages):
+        tracks = []
+        for data in pages:
             for item in data.get("items", []):
                 snippet = item.get("snippet", {})
                 title = snippet.get("title", "")
@@ -208,11 +231,6 @@ class YouTubeService(BasePlatformService):
                     "cover_url": snippet.get("thumbnails", {}).get("medium", {}).get("url"),
                     "platform": "youtube"
                 })
-            nextPageToken = data.get("nextPageToken")
-            if nextPageToken:
-                url = f"{YOUTUBE_API_BASE}/playlistItems?part=snippet,contentDetails&playlistId={playlist_id}&maxResults=50&pageToken={nextPageToken}"
-            else:
-                url = None
         return tracks
 
     def get_playlist_tracks_count(self, playlist_id):
@@ -237,67 +255,36 @@ class YouTubeService(BasePlatformService):
 
     def fetch_service_temp_data(self):
         # --- Получить все плейлисты и треки через API, не трогая БД, для фильтра пользователем ---
-        playlists = self.get_playlists()
-        for pl in playlists:
-            pl['tracks'] = self.get_playlist_tracks_with_duration(pl['id'])
+        with self.operation():
+            playlists = [dict(pl) for pl in self.get_playlists()]
+            for pl in playlists:
+                pl['tracks'] = self.get_playlist_tracks_with_duration(pl['id'])
         return playlists
 
     def get_playlist_tracks_with_duration(self, playlist_id, limit=100):
         # Получаем треки с корректным duration (YouTube API videos?part=contentDetails), ибо он не получается с композицией априори ---
-        if not self.token:
-            return []
-        tracks = []
-        video_ids = []
-        url = f"{YOUTUBE_API_BASE}/playlistItems?part=snippet,contentDetails&playlistId={playlist_id}&maxResults=50"
-        retried = False
-        while url:
-            resp = requests.get(url, headers=self._headers())
-            if resp.status_code == 401 and not retried:
-                if self._refresh_token():
-                    retried = True
-                    resp = requests.get(url, headers=self._headers())
-                else:
-                    break
-            if resp.status_code != 200:
-                break
-            data = resp.json()
-            for item in data.get("items", []):
-                snippet = item.get("snippet", {})
-                title = snippet.get("title", "")
-                artist = snippet.get("videoOwnerChannelTitle", "")
-                video_id = snippet.get("resourceId", {}).get("videoId")
-                video_ids.append(video_id)
-                tracks.append({
-                    "id": video_id,
-                    "title": title,
-                    "artist": artist,
-                    "album": None,
-                    "duration": None,  # Низкий приоритет
-                    "cover_url": snippet.get("thumbnails", {}).get("medium", {}).get("url"),
-                    "platform": "youtube"
-                })
-            nextPageToken = data.get("nextPageToken")
-            if nextPageToken:
-                url = f"{YOUTUBE_API_BASE}/playlistItems?part=snippet,contentDetails&playlistId={playlist_id}&maxResults=50&pageToken={nextPageToken}"
-            else:
-                url = None
-        # Получаем duration батчем, тк приоритет низкий
-        for i in range(0, len(video_ids), 50):
-            batch_ids = video_ids[i:i+50]
-            vurl = f"{YOUTUBE_API_BASE}/videos?part=contentDetails&id={','.join(batch_ids)}"
-            vresp = requests.get(vurl, headers=self._headers())
-            if vresp.status_code == 401:
-                if self._refresh_token():
-                    vresp = requests.get(vurl, headers=self._headers())
-                else:
-                    continue
-            if vresp.status_code != 200:
+        tracks = self.get_playlist_tracks(playlist_id)
+        # Получаем duration батчами по 50 id — все батчи параллельно. Это отложимая работа:
+        # при низком остатке квоты отдаём треки без длительностей
+        video_ids = [t["id"] for t in tracks if t["id"]]
+        vurls = [
+            f"{YOUTUBE_API_BASE}/videos?part=contentDetails&id={','.join(video_ids[i:i+50])}"
+            for i in range(0, len(video_ids), 50)
+        ]
+        try:
+            pages = self._fetch_pages(vurls, priority=DEFERRABLE)
+        except QuotaExceeded as e:
+            logging.info(f"[YOUTUBE] duration для {playlist_id} отложены: {e}")
+            return tracks
+        id_to_duration = {}
+        for status, vdata in pages:
+            if status != 200 or not vdata:
                 continue
-            vdata = vresp.json()
-            id_to_duration = {item['id']: self._parse_duration(item['contentDetails']['duration']) for item in vdata.get('items', [])}
-            for t in tracks:
-                if t['id'] in id_to_duration:
-                    t['duration'] = id_to_duration[t['id']]
+            for item in vdata.get('items', []):
+                id_to_duration[item['id']] = self._parse_duration(item['contentDetails']['duration'])
+        for t in tracks:
+            if t['id'] in id_to_duration:
+                t['duration'] = id_to_duration[t['id']]
         return tracks
 
     def _parse_duration(self, iso_duration):
@@ -315,86 +302,53 @@ class YouTubeService(BasePlatformService):
         return hours * 3600 + minutes * 60 + seconds
 
     def save_selected_playlists(self, playlists_data):
-        session = self.db
-        seen_availability = set()
-        for pl in playlists_data:
-            db_pl = session.query(UserPlaylist).filter_by(user_id=self.user_id, external_id=pl["id"], source_platform="youtube").first()
-            tracks = pl.get("tracks", [])
-            if not db_pl:
-                db_pl = UserPlaylist(
-                    user_id=self.user_id,
-                    title=pl["title"],
-                    description=pl.get("description"),
-                    source_platform="youtube",
-                    external_id=pl["id"],
-                    updated_at=datetime.utcnow(),
-                    image_url=pl.get("cover_url"),
-                    is_public=True,
-                    tracks_number=len(tracks)
-                )
-                session.add(db_pl)
-                session.flush()
-            else:
-                db_pl.title = pl["title"]
-                db_pl.description = pl.get("description")
-                db_pl.updated_at = datetime.utcnow()
-                db_pl.image_url = pl.get("cover_url")
-                db_pl.tracks_number = len(tracks)
-            session.query(PlaylistTrack).filter(PlaylistTrack.playlist_id == db_pl.id).delete()
-            seen_track_ids = set()
-            for idx, t in enumerate(tracks):
-                # --- Tracks: Добавляем все треки при появлении в первый раз, дубликаты пропускаем ---
-                db_track = session.query(Track).filter_by(title=t["title"], artist=t["artist"]).first()
-                if not db_track:
-                    db_track = Track(
-                        title=t["title"],
-                        artist=t["artist"],
-                        album=t.get("album"),
-                        duration=t.get("duration"),
-                        image_url=t.get("cover_url")
+        with self.operation():
+            session = self.db
+            for pl in playlists_data:
+                db_pl = session.query(UserPlaylist).filter_by(user_id=self.user_id, external_id=pl["id"], source_platform="youtube").first()
+                tracks = pl.get("tracks", [])
+                if not db_pl:
+                    db_pl = UserPlaylist(
+                        user_id=self.user_id,
+                        title=pl["title"],
+                        description=pl.get("description"),
+                        source_platform="youtube",
+                        external_id=pl["id"],
+                        updated_at=datetime.utcnow(),
+                        image_url=pl.get("cover_url"),
+                        is_public=True,
+                        tracks_number=len(tracks)
                     )
-                    session.add(db_track)
+                    session.add(db_pl)
                     session.flush()
-                # --- TrackAvailability: пропускаем, если уже добавляли в этой сессии ---
-                track_avail_key = (db_track.id, "youtube")
-                if track_avail_key not in seen_availability:
-                    if not session.query(TrackAvailability).filter_by(track_id=db_track.id, platform="youtube").first():
-                        avail = TrackAvailability(
-                            track_id=db_track.id,
-                            platform="youtube",
-                            external_id=t["id"],
-                            url=None,
-                            available=True
-                        )
-                        session.add(avail)
-                    seen_availability.add(track_avail_key)
-                # --- PlaylistTrack: если трек уже был добавлен в этот плейлист, пропускаем (оставляем только первый order_index) ---
-                if db_track.id not in seen_track_ids:
-                    session.add(PlaylistTrack(
-                        playlist_id=db_pl.id,
-                        platform="youtube",
-                        track_id=db_track.id,
-                        order_index=idx
-                    ))
-                    seen_track_ids.add(db_track.id)
-            session.commit()
-        # Сохраняем "Liked songs" как избранное
-        liked = self.get_liked_playlist_info()
-        if liked:
-            liked_tracks = self.get_playlist_tracks(liked["id"])
-            session.query(UserFavorite).filter_by(user_id=self.user_id, platform="youtube").delete()
-            session.flush()
-            session.add(UserFavorite(
-                user_id=self.user_id,
-                external_id=liked["id"],
-                playlist_id=liked["id"],
-                platform="youtube",
-                title=liked["title"],
-                description=liked.get("description"),
-                tracks_number=len(liked_tracks),
-                updated_at=datetime.utcnow()
-            ))
-            session.commit()
+                else:
+                    db_pl.title = pl["title"]
+                    db_pl.description = pl.get("description")
+                    db_pl.updated_at = datetime.utcnow()
+                    db_pl.image_url = pl.get("cover_url")
+                    db_pl.tracks_number = len(tracks)
+                # --- Треки, доступность и связи с плейлистом пишем пачками ---
+                write_playlist(session, db_pl.id, "youtube", tracks)
+                session.commit()
+            # Сохраняем "Liked songs" как избранное
+            liked = self.get_liked_playlist_info()
+            if liked:
+                # Если "Liked songs" среди выбранных, его треки уже получены
+                selected = next((pl for pl in playlists_data if pl["id"] == liked["id"] and "tracks" in pl), None)
+                liked_tracks = selected["tracks"] if selected else self.get_favorite_tracks_all()
+                session.query(UserFavorite).filter_by(user_id=self.user_id, platform="youtube").delete()
+                session.flush()
+                session.add(UserFavorite(
+                    user_id=self.user_id,
+                    external_id=liked["id"],
+                    playlist_id=liked["id"],
+                    platform="youtube",
+                    title=liked["title"],
+                    description=liked.get("description"),
+                    tracks_number=len(liked_tracks),
+                    updated_at=datetime.utcnow()
+                ))
+                session.commit()
 
     def delete_playlist_by_external_id(self, external_id):
         # Удаляет плейлист пользователя по external_id (YouTube id) и user_id, а также все PlaylistTrack для этого плейлиста.
@@ -404,3 +358,77 @@ class YouTubeService(BasePlatformService):
             session.query(PlaylistTrack).filter(PlaylistTrack.playlist_id == db_pl.id).delete()
             session.delete(db_pl)
             session.commit()
+
+    def search(self, query, limit=10):
+        # search.list стоит 100 единиц — миграция зовёт его только для треков без сохранённой доступности,
+        # а /search кэширует ответы (services/federated_search.py)
+        params = {"part": "snippet", "type": "video", "videoCategoryId": "10", "maxResults": limit, "q": query}
+        url = f"{YOUTUBE_API_BASE}/search?{urlencode(params)}"
+        resp = self._get(url)
+        if resp.status_code != 200:
+            self._page_failed(url, resp.status_code)
+        found = []
+        for item in resp.json().get("items", []):
+            snippet = item.get("snippet", {})
+            video_id = item.get("id", {}).get("videoId")
+            if not video_id:
+                continue
+            found.append({
+                "id": video_id,
+                "title": snippet.get("title", ""),
+                "artist": snippet.get("channelTitle", ""),
+                "album": None,
+                "duration": None,
+                "cover_url": snippet.get("thumbnails", {}).get("medium", {}).get("url"),
+                "url": f"https://www.youtube.com/watch?v={video_id}",
+                "platform": "youtube"
+            })
+        return found
+
+    def search_tracks(self, track, limit=5):
+        return self.search(f"{track['artist']} {track['title']}", limit)
+
+    def create_playlist(self, title, description=None, public=False):
+        url = f"{YOUTUBE_API_BASE}/playlists?part=snippet,status"
+        body = {
+            "snippet": {"title": title, "description": description or ""},
+            "status": {"privacyStatus": "public" if public else "private"},
+        }
+        resp = self._post(url, json=body)
+        if resp.status_code != 200:
+            raise PlatformRequestError(self.CONNECTION_PLATFORM, url, resp.status_code)
+        return resp.json()["id"]
+
+    def add_tracks(self, playlist_id, external_ids):
+        url = f"{YOUTUBE_API_BASE}/playlistItems?part=snippet"
+        for video_id in external_ids:
+            body = {"snippet": {"playlistId": playlist_id, "resourceId": {"kind": "youtube#video", "videoId": video_id}}}
+            resp = self._post(url, json=body)
+            if resp.status_code != 200:
+                raise PlatformRequestError(self.CONNECTION_PLATFORM, url, resp.status_code)
+
+    def playlist_size(self, playlist_id):
+        url = f"{YOUTUBE_API_BASE}/playlists?part=contentDetails&id={playlist_id}"
+        resp = self._get(url)
+        if resp.status_code != 200:
+            self._page_failed(url, resp.status_code)
+        items = resp.json().get("items", [])
+        return items[0].get("contentDetails", {}).get("itemCount", 0) if items else 0
+
+    def lookup_availability(self, external_ids):
+        # Удалённые видео videos.list просто не возвращает; приватные и отклонённые — недоступны.
+        # part=status одинаков для любого аккаунта (региональные запреты — в contentDetails).
+        # Это отложимая работа: при низком остатке квоты spend бросит QuotaExceeded
+        url = f"{YOUTUBE_API_BASE}/videos?part=status&id={','.join(external_ids)}&maxResults=50"
+        resp = self._http_get(url, self._headers(), priority=DEFERRABLE)
+        if resp.status_code == 401 and self._refresh_token():
+            resp = self._http_get(url, self._headers(), priority=DEFERRABLE)
+        if resp.status_code != 200:
+            self._page_failed(url, resp.status_code)
+        playable = {
+            item["id"]
+            for item in resp.json().get("items", [])
+            if item.get("status", {}).get("privacyStatus") != "private"
+            and item.get("status", {}).get("uploadStatus") not in ("rejected", "deleted", "failed")
+        }
+        return {external_id: external_id in playable for external_id in external_ids}
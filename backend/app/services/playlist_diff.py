@@ -0,0 +1,80 @@
+# Инкрементальная синхронизация playlist_tracks: сравниваем сохранённый порядок
+# треков с полученным с платформы и пишем только вставки, удаления и перестановки
+from dataclasses import dataclass, field
+from datetime import datetime
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.orm import Session
+from app.models.models import PlaylistTrack
+
+BATCH_SIZE = 1000
+
+
+@dataclass
+class PlaylistDiff:
+    inserts: list = field(default_factory=list)  # (track_id, order_index)
+    deletes: list = field(default_factory=list)  # id строк playlist_tracks
+    moves: list = field(default_factory=list)    # (id строки, новый order_index)
+
+    @property
+    def is_empty(self):
+        return not (self.inserts or self.deletes or self.moves)
+
+
+def diff_playlist(stored, track_ids):
+    """stored — {track_id: (row_id, order_index)}, track_ids — полученный с платформы порядок."""
+    wanted = {}
+    for idx, track_id in enumerate(track_ids):
+        # Трек в плейлисте уникален (uq_track_per_playlist) — берём первое вхождение
+        wanted.setdefault(track_id, idx)
+    diff = PlaylistDiff()
+    for track_id, (row_id, order_index) in stored.items():
+        if track_id not in wanted:
+            diff.deletes.append(row_id)
+        elif wanted[track_id] != order_index:
+            diff.moves.append((row_id, wanted[track_id]))
+    for track_id, idx in wanted.items():
+        if track_id not in stored:
+            diff.inserts.append((track_id, idx))
+    return diff
+
+
+def load_playlist_state(session: Session, playlist_id: int):
+    rows = session.execute(
+        select(PlaylistTrack.id, PlaylistTrack.track_id, PlaylistTrack.order_index)
+        .where(PlaylistTrack.playlist_id == playlist_id)
+    ).all()
+    return {row.track_id: (row.id, row.order_index) for row in rows}
+
+
+def apply_playlist_diff(session: Session, playlist_id: int, platform: str, diff: PlaylistDiff):
+    for i in range(0, len(diff.deletes), BATCH_SIZE):
+        session.execute(
+            delete(PlaylistTrack)
+            .where(PlaylistTrack.id.in_(diff.deletes[i:i + BATCH_SIZE]))
+            .execution_options(synchronize_session=False)
+        )
+    if diff.moves:
+        session.execute(
+            update(PlaylistTrack),
+            [{"id": row_id, "order_index": idx} for row_id, idx in diff.moves],
+        )
+    now = datetime.utcnow()
+    for i in range(0, len(diff.inserts), BATCH_SIZE):
+        session.execute(insert(PlaylistTrack).values([
+            {
+                "playlist_id": playlist_id,
+                "platform": platform,
+                "track_id": track_id,
+                "order_index": idx,
+                "added_at": now,
+            }
+            for track_id, idx in diff.inserts[i:i + BATCH_SIZE]
+        ]))
+
+
+def sync_playlist_tracks(session: Session, playlist_id: int, platform: str, track_ids):
+    """Приводит playlist_tracks к порядку track_ids минимальным набором изменений."""
+    diff = diff_playlist(load_playlist_state(session, playlist_id), track_ids)
+    if not diff.is_empty:
+        apply_playlist_diff(session, playlist_id, platform, diff)
+    return diff
@@ -0,0 +1,304 @@
+# Перенос плейлиста на другую платформу (Spotify → YouTube → Яндекс). Задачи лежат в
+# playlist_migrations и разбираются теми же воркерами, что и sync_jobs. Каждый трек сначала
+# ищется в tracks_availability, на платформе — только промахи (параллельно, с подбором
+# кандидата через ISRC и track_matcher). Затем создаётся плейлист и треки добавляются пачками
+# по ADD_TRACKS_BATCH платформы. Прогресс коммитится после каждой пачки поиска и добавления,
+# поэтому упавший или отложенный по квоте перенос продолжается с того же места. Запись на
+# платформу отмечается до запроса (known_playlist_ids, pending_add): если запрос прошёл, а
+# commit — нет, повтор сверяется с платформой, а не создаёт плейлист и треки второй раз.
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from sqlalchemy import select, or_, and_
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.models import PlaylistMigration, PlaylistTrack, Track, TrackAvailability, UserPlaylist
+from app.services.platforms.platforms import get_platform_service
+from app.services.sync_jobs import ACTIVE_STATUSES, RETRY_BASE_DELAY, STALE_AFTER
+from app.services.sync_writer import dialect_insert, upsert_availability, BATCH_SIZE
+from app.services.track_matcher import match_groups
+from app.services.youtube_quota import BACKGROUND, QuotaExceeded
+
+SEARCH_CONCURRENCY = 4  # одновременных поисковых запросов к платформе
+SEARCH_CHUNK = 20       # треков между сохранениями прогресса поиска
+
+
+def migration_to_dict(migration: PlaylistMigration):
+    missing = migration.missing_track_ids or []
+    to_add = len(migration.target_ids) if migration.target_ids is not None else None
+    return {
+        "id": migration.id,
+        "user_id": migration.user_id,
+        "playlist_id": migration.playlist_id,
+        "target_platform": migration.target_platform,
+        "status": migration.status,
+        "stage": migration.stage,
+        "attempts": migration.attempts,
+        "max_attempts": migration.max_attempts,
+        "total_tracks": migration.total_tracks,
+        "matched_tracks": migration.matched_tracks,
+        "searched_tracks": len(migration.searched_track_ids or []),
+        "missing_tracks": len(missing),
+        "missing_track_ids": missing,
+        "tracks_to_add": to_add,
+        "added_tracks": migration.added_tracks,
+        "target_playlist_id": migration.target_playlist_id,
+        "error": migration.error,
+        "run_after": migration.run_after,
+        "created_at": migration.created_at,
+        "started_at": migration.started_at,
+        "finished_at": migration.finished_at,
+    }
+
+
+def get_active_migration(db: Session, playlist_id: int, target_platform: str):
+    return db.query(PlaylistMigration).filter(
+        PlaylistMigration.playlist_id == playlist_id,
+        PlaylistMigration.target_platform == target_platform,
+        PlaylistMigration.status.in_(ACTIVE_STATUSES),
+    ).first()
+
+
+def enqueue_migration(db: Session, user_id: int, playlist_id: int, target_platform: str) -> PlaylistMigration:
+    now = datetime.utcnow()
+    stmt = dialect_insert(db, PlaylistMigration).values(
+        user_id=user_id,
+        playlist_id=playlist_id,
+        target_platform=target_platform,
+        status="queued",
+        stage="resolving",
+        attempts=0,
+        max_attempts=3,
+        total_tracks=0,
+        matched_tracks=0,
+        added_tracks=0,
+        run_after=now,
+        created_at=now,
+    )
+    db.execute(stmt.on_conflict_do_nothing(
+        index_elements=[PlaylistMigration.playlist_id, PlaylistMigration.target_platform],
+        index_where=PlaylistMigration.status.in_(ACTIVE_STATUSES),
+    ))
+    db.commit()
+    migration = get_active_migration(db, playlist_id, target_platform)
+    logging.info(f"[MIGRATION] playlist_id={playlist_id} -> {target_platform}: migration {migration.id if migration else None}")
+    return migration
+
+
+def claim_next_migration(db: Session):
+    now = datetime.utcnow()
+    migration = db.execute(
+        select(PlaylistMigration)
+        .where(or_(
+            and_(PlaylistMigration.status == "queued", PlaylistMigration.run_after <= now),
+            and_(PlaylistMigration.status == "running", PlaylistMigration.started_at < now - STALE_AFTER),
+        ))
+        .order_by(PlaylistMigration.run_after)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    ).scalar_one_or_none()
+    if not migration:
+        db.rollback()
+        return None
+    migration.status = "running"
+    migration.attempts += 1
+    migration.started_at = now
+    migration.error = None
+    db.commit()
+    return migration.id
+
+
+def _playlist_tracks(db: Session, playlist_id: int):
+    rows = db.execute(
+        select(Track.id, Track.title, Track.artist, Track.duration, Track.isrc)
+        .join(PlaylistTrack, PlaylistTrack.track_id == Track.id)
+        .where(PlaylistTrack.playlist_id == playlist_id)
+        .order_by(PlaylistTrack.order_index, PlaylistTrack.id)
+    ).all()
+    return [
+        {"track_id": row.id, "title": row.title, "artist": row.artist, "duration": row.duration, "isrc": row.isrc}
+        for row in rows
+    ]
+
+
+def _known_external_ids(db: Session, platform: str, track_ids):
+    known = {}
+    for i in range(0, len(track_ids), BATCH_SIZE):
+        rows = db.execute(
+            select(TrackAvailability.track_id, TrackAvailability.external_id).where(
+                TrackAvailability.platform == platform,
+                TrackAvailability.available.is_(True),
+                TrackAvailability.track_id.in_(track_ids[i:i + BATCH_SIZE]),
+            )
+        ).all()
+        known.update({row.track_id: row.external_id for row in rows})
+    return known
+
+
+def _isrc_candidate(track, candidates):
+    # Совпавший ISRC — та же запись, нечёткое сравнение не нужно
+    isrc = (track.get("isrc") or "").upper()
+    if isrc:
+        for candidate in candidates:
+            if (candidate.get("isrc") or "").upper() == isrc:
+                return candidate
+    return None
+
+
+def _best_candidates(tracks, candidate_groups):
+    """Кандидат (или None) для каждого трека: по ISRC, остальные — одним пакетом track_matcher
+    по названию, исполнителю и длительности, каждый только среди своей выдачи поиска."""
+    found = [_isrc_candidate(t, group) for t, group in zip(tracks, candidate_groups)]
+    rest = [i for i, candidate in enumerate(found) if candidate is None and candidate_groups[i]]
+    matches = match_groups([tracks[i] for i in rest], [candidate_groups[i] for i in rest])
+    for i, match in zip(rest, matches):
+        if match:
+            found[i] = match["candidate"]
+    return found
+
+
+def _resolve(db: Session, migration: PlaylistMigration, service, tracks):
+    track_ids = [t["track_id"] for t in tracks]
+    known = _known_external_ids(db, migration.target_platform, track_ids)
+    searched = set(migration.searched_track_ids or [])
+    pending = [t for t in tracks if t["track_id"] not in known and t["track_id"] not in searched]
+    logging.info(
+        f"[MIGRATION] {migration.id}: {len(known)}/{len(tracks)} уже известны на {migration.target_platform}, "
+        f"ищем {len(pending)}"
+    )
+    with ThreadPoolExecutor(max_workers=SEARCH_CONCURRENCY) as pool:
+        for start in range(0, len(pending), SEARCH_CHUNK):
+            chunk = pending[start:start + SEARCH_CHUNK]
+            futures = [pool.submit(service.search_tracks, t) for t in chunk]
+            done, error = [], None
+            for t, future in zip(chunk, futures):
+                try:
+                    done.append((t, future.result()))
+                except Exception as e:
+                    # Квота или ошибка платформы: найденное остальными поисками чанка всё равно сохраняем
+                    error = error or e
+            found = _best_candidates([t for t, _ in done], [candidates for _, candidates in done])
+            matched = [(candidate, t["track_id"]) for candidate, (t, _) in zip(found, done) if candidate]
+            if matched:
+                # Найденное сохраняем как доступность — следующие переносы возьмут его без поиска
+                upsert_availability(db, migration.target_platform, [c for c, _ in matched], [tid for _, tid in matched])
+                known.update({tid: str(c["id"]) for c, tid in matched})
+            searched.update(t["track_id"] for t, _ in done)
+            migration.searched_track_ids = sorted(searched)
+            migration.matched_tracks = len(known)
+            db.commit()
+            if error is not None:
+                raise error
+    target_ids = []
+    seen = set()
+    for track_id in track_ids:
+        external_id = known.get(track_id)
+        # Два трека могли сопоставиться с одним и тем же видео/треком платформы
+        if external_id is not None and external_id not in seen:
+            seen.add(external_id)
+            target_ids.append(external_id)
+    migration.matched_tracks = len(known)
+    migration.missing_track_ids = [track_id for track_id in track_ids if track_id not in known]
+    migration.target_ids = target_ids
+    db.commit()
+
+
+def _create_target(db: Session, migration: PlaylistMigration, service, playlist: UserPlaylist):
+    if migration.known_playlist_ids is not None:
+        # create уже отправлялся, но id не дошёл до БД — ищем плейлист, которого тогда ещё не было
+        before = set(migration.known_playlist_ids)
+        created = [pid for pid in service.find_playlists(playlist.title) if pid not in before]
+        if created:
+            logging.info(f"[MIGRATION] {migration.id}: плейлист {created[0]} создан прошлой попыткой")
+            return created[0]
+    else:
+        migration.known_playlist_ids = service.find_playlists(playlist.title)
+        db.commit()
+    return service.create_playlist(playlist.title, playlist.description, bool(playlist.is_public))
+
+
+def _confirm_pending_add(db: Session, migration: PlaylistMigration, service):
+    # Пачка ушла на платформу, а счётчик не закоммичен: дошла — засчитываем, нет — отправим снова
+    size = service.playlist_size(migration.target_playlist_id)
+    if size >= migration.added_tracks + migration.pending_add:
+        logging.info(f"[MIGRATION] {migration.id}: пачка из {migration.pending_add} треков уже добавлена")
+        migration.added_tracks += migration.pending_add
+    migration.pending_add = None
+    db.commit()
+
+
+def _migrate(db: Session, migration: PlaylistMigration):
+    playlist = db.get(UserPlaylist, migration.playlist_id)
+    service = get_platform_service(migration.target_platform, db, migration.user_id)
+    if service.connection is None:
+        raise ValueError(f"{migration.target_platform} is not connected for user {migration.user_id}")
+    service.priority = BACKGROUND
+    with service.operation():
+        if migration.target_ids is None:
+            migration.stage = "resolving"
+            tracks = _playlist_tracks(db, migration.playlist_id)
+            migration.total_tracks = len(tracks)
+            db.commit()
+            _resolve(db, migration, service, tracks)
+        if migration.target_playlist_id is None:
+            migration.stage = "creating"
+            migration.target_playlist_id = _create_target(db, migration, service, playlist)
+            db.commit()
+        migration.stage = "adding"
+        db.commit()
+        batch = service.ADD_TRACKS_BATCH
+        target_ids = migration.target_ids
+        while migration.added_tracks < len(target_ids):
+            if migration.pending_add:
+                _confirm_pending_add(db, migration, service)
+                continue
+            ids = target_ids[migration.added_tracks:migration.added_tracks + batch]
+            migration.pending_add = len(ids)
+            db.commit()
+            service.add_tracks(migration.target_playlist_id, ids)
+            migration.added_tracks += len(ids)
+            migration.pending_add = None
+            db.commit()
+        migration.stage = "done"
+
+
+def run_migration(migration_id: int):
+    db = SessionLocal()
+    try:
+        migration = db.get(PlaylistMigration, migration_id)
+        try:
+            _migrate(db, migration)
+        except QuotaExceeded as e:
+            # Как у sync_jobs: ждём сброса квоты, попытку не засчитываем; прогресс уже закоммичен
+            db.rollback()
+            migration = db.get(PlaylistMigration, migration_id)
+            migration.status = "queued"
+            migration.attempts -= 1
+            migration.error = str(e)[:1000]
+            migration.run_after = e.retry_at
+            db.commit()
+            logging.info(f"[MIGRATION] {migration_id} отложен до {e.retry_at}: {e}")
+            return
+        except Exception as e:
+            db.rollback()
+            migration = db.get(PlaylistMigration, migration_id)
+            migration.error = str(e)[:1000]
+            if migration.attempts < migration.max_attempts:
+                migration.status = "queued"
+                migration.run_after = datetime.utcnow() + RETRY_BASE_DELAY * (2 ** (migration.attempts - 1))
+                logging.warning(f"[MIGRATION] {migration_id} упал (попытка {migration.attempts}), продолжим после {migration.run_after}: {e}")
+            else:
+                migration.status = "failed"
+                migration.finished_at = datetime.utcnow()
+                logging.error(f"[MIGRATION] {migration_id} failed: {e}", exc_info=True)
+            db.commit()
+            return
+        migration.status = "done"
+        migration.finished_at = datetime.utcnow()
+        db.commit()
+        logging.info(
+            f"[MIGRATION] {migration_id} done: {migration.added_tracks}/{migration.total_tracks} треков "
+            f"на {migration.target_platform}, не найдено {len(migration.missing_track_ids or [])}"
+        )
+    finally:
+        db.close()
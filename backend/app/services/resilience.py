@@ -0,0 +1,241 @@
+# Устойчивость HTTP-пути к платформам: token bucket на платформу и на аккаунт, повторы
+# на 429/5xx/сетевые ошибки с экспоненциальной задержкой (Retry-After имеет приоритет) и
+# circuit breaker, который перестаёт долбить лежащую платформу. Все запросы к платформам,
+# включая параллельную догрузку страниц (async_pages), идут через RequestGuard.call.
+import os
+import random
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+import requests
+
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0       # секунды, удваивается с каждой попыткой
+BACKOFF_MAX = 30.0
+MAX_RETRY_AFTER = 60.0   # дольше внутри запроса не ждём — отдаём ошибку, задача повторится позже
+FAILURE_THRESHOLD = 5    # подряд неудач (5xx/сеть), после которых платформа считается лежащей
+OPEN_TIMEOUT = 30.0      # сколько breaker держит платформу закрытой до пробного запроса
+PROBE_TIMEOUT = 120.0    # пробный запрос без исхода дольше этого считается потерянным
+
+# connected_services.platform -> (запросов в секунду, burst) на платформу и на аккаунт
+RATE_LIMITS = {
+    "spotify": {"platform": (10.0, 20), "account": (5.0, 10)},
+    "youtube": {"platform": (10.0, 20), "account": (5.0, 10)},
+    "yandex-music": {"platform": (5.0, 10), "account": (3.0, 6)},
+}
+DEFAULT_RATE_LIMIT = {"platform": (5.0, 10), "account": (3.0, 6)}
+
+# Доля общих лимитов на этот процесс: воркеры очереди делят лимиты между собой
+_rate_share = float(os.getenv("PLATFORM_RATE_SHARE", "1.0"))
+
+
+class PlatformUnavailable(Exception):
+    def __init__(self, platform: str, retry_at: datetime):
+        super().__init__(f"{platform} is temporarily unavailable, retry after {retry_at:%H:%M:%S} UTC")
+        self.platform = platform
+        self.retry_at = retry_at
+
+
+class PlatformRequestError(Exception):
+    """Страница не получена и после повторов — данные неполные, сохранять их нельзя."""
+
+    def __init__(self, platform: str, url: str, status: int):
+        super().__init__(f"{platform} request failed with status {status}: {url}")
+        self.platform = platform
+        self.url = url
+        self.status = status
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Забирает токен (в долг, если их нет) и возвращает, сколько секунд подождать до запроса."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def pause(self, seconds: float):
+        # Платформа прислала Retry-After — до его истечения токенов не выдаём никому
+        with self._lock:
+            self._tokens = min(self._tokens, -seconds * self.rate)
+            self._updated = time.monotonic()
+
+
+class CircuitBreaker:
+    def __init__(self, platform: str, threshold: int = FAILURE_THRESHOLD, open_timeout: float = OPEN_TIMEOUT):
+        self.platform = platform
+        self.threshold = threshold
+        self.open_timeout = open_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    def check(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            now = time.monotonic()
+            elapsed = now - self._opened_at
+            # Пробный запрос без исхода (отменён, упал вне HTTP) не держит breaker открытым вечно
+            probe_lost = self._probe_started is not None and now - self._probe_started >= PROBE_TIMEOUT
+            if elapsed >= self.open_timeout and (self._probe_started is None or probe_lost):
+                # half-open: пропускаем один пробный запрос
+                self._probe_started = now
+                return
+            wait = max(self.open_timeout - elapsed, 1.0)
+        raise PlatformUnavailable(self.platform, datetime.utcnow() + timedelta(seconds=wait))
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logging.info(f"[RESILIENCE] {self.platform}: платформа снова отвечает, breaker закрыт")
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probe_started is not None or (self._opened_at is None and self._failures >= self.threshold):
+                logging.warning(f"[RESILIENCE] {self.platform}: {self._failures} ошибок подряд, breaker открыт на {self.open_timeout}s")
+                self._opened_at = time.monotonic()
+            self._probe_started = None
+
+    def release_probe(self):
+        # Попытка закончилась без ответа платформы — освобождаем слот для следующего пробного запроса
+        with self._lock:
+            self._probe_started = None
+
+
+_buckets = {}
+_breakers = {}
+_registry_lock = threading.Lock()
+
+
+def set_rate_share(share: float):
+    # Вызывается в процессе до первых запросов; уже созданные bucket'ы пересоздаются
+    global _rate_share
+    with _registry_lock:
+        _rate_share = share
+        _buckets.clear()
+
+
+def _bucket(key, rate, capacity):
+    with _registry_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = _buckets[key] = TokenBucket(rate * _rate_share, max(int(capacity * _rate_share), 1))
+        return bucket
+
+
+def _breaker(platform):
+    with _registry_lock:
+        breaker = _breakers.get(platform)
+        if breaker is None:
+            breaker = _breakers[platform] = CircuitBreaker(platform)
+        return breaker
+
+
+def retry_after_seconds(value):
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((when.replace(tzinfo=None) - datetime.utcnow()).total_seconds(), 0.0)
+
+
+def backoff_delay(attempt: int):
+    # Full jitter: параллельные воркеры не повторяют запросы синхронно
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+class RequestGuard:
+    """Лимиты, повторы и breaker для запросов одного аккаунта к одной платформе."""
+
+    def __init__(self, platform: str, account):
+        limits = RATE_LIMITS.get(platform, DEFAULT_RATE_LIMIT)
+        self.platform = platform
+        self.platform_bucket = _bucket((platform,), *limits["platform"])
+        self.account_bucket = _bucket((platform, account), *limits["account"])
+        self.breaker = _breaker(platform)
+
+    def before_attempt(self):
+        """Секунды ожидания перед запросом; PlatformUnavailable, если breaker открыт."""
+        self.breaker.check()
+        return max(self.platform_bucket.reserve(), self.account_bucket.reserve())
+
+    def after_response(self, status: int, retry_after, attempt: int, idempotent: bool = True):
+        """None — ответ окончательный, число — подождать столько секунд и повторить.
+        status 0 — сетевая ошибка. Неидемпотентный запрос (добавление треков) после 5xx и
+        сетевой ошибки не повторяем: платформа могла его уже выполнить."""
+        if status == 0 or status >= 500:
+            self.breaker.record_failure()
+            if not idempotent:
+                return None
+        else:
+            # 429 — платформа жива, просто просит притормозить
+            self.breaker.record_success()
+            if status != 429:
+                return None
+        if attempt >= MAX_RETRIES:
+            return None
+        delay = retry_after_seconds(retry_after)
+        if delay is None:
+            return backoff_delay(attempt)
+        if delay > MAX_RETRY_AFTER:
+            return None
+        if status == 429:
+            # Ждать будут все запросы к платформе: пауза ложится на общий bucket,
+            # и следующий before_attempt сам выдержит Retry-After
+            self.platform_bucket.pause(delay)
+            return 0.0
+        return delay
+
+    def abandon_attempt(self):
+        """Попытка после before_attempt прервана без after_response (отмена, неожиданная ошибка)."""
+        self.breaker.release_probe()
+
+    def call(self, send, idempotent: bool = True):
+        attempt = 0
+        while True:
+            try:
+                time.sleep(self.before_attempt())
+                resp = send()
+            except requests.RequestException as e:
+                delay = self.after_response(0, None, attempt, idempotent)
+                if delay is None:
+                    raise
+                logging.warning(f"[RESILIENCE] {self.platform}: сетевая ошибка ({e}), повтор через {delay:.1f}s")
+            except PlatformUnavailable:
+                raise
+            except BaseException:
+                self.abandon_attempt()
+                raise
+            else:
+                delay = self.after_response(resp.status_code, resp.headers.get("Retry-After"), attempt, idempotent)
+                if delay is None:
+                    return resp
+                logging.warning(f"[RESILIENCE] {self.platform}: {resp.status_code}, повтор через {delay:.1f}s")
+            attempt += 1
+            if delay:
+                time.sleep(delay)
@@ -0,0 +1,61 @@
+# Кэш статистики подключённых сервисов (connected_services.stats): пишется в конце каждой
+# синхронизации, живёт STATS_TTL; устаревшие записи обновляются параллельно по платформам
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from app.models.models import ConnectedService
+
+STATS_TTL = timedelta(minutes=30)
+STATS_TIMEOUT = 10  # секунд на живое обновление всех платформ
+
+
+def is_fresh(connection: ConnectedService):
+    return (
+        connection.stats is not None
+        and connection.stats_updated_at is not None
+        and connection.stats_updated_at + STATS_TTL > datetime.utcnow()
+    )
+
+
+def store_stats(db: Session, connection: ConnectedService, stats: dict):
+    if connection is None or not stats or "error" in stats:
+        return
+    connection.stats = stats
+    connection.stats_updated_at = datetime.utcnow()
+    db.commit()
+
+
+def collect_stats(db: Session, user_id: int, connections, force: bool = False):
+    """{connection.id: stats} — свежие из кэша, остальные запрашиваются у платформ параллельно."""
+    from app.services.platforms.platforms import PLATFORM_BY_CONNECTION, get_platform_service
+    result = {}
+    stale = []
+    for connection in connections:
+        if not force and is_fresh(connection):
+            result[connection.id] = connection.stats
+        elif connection.platform in PLATFORM_BY_CONNECTION:
+            # Сервисы создаём здесь: конструктору может понадобиться сессия, а она не потокобезопасна
+            stale.append((connection, get_platform_service(connection.platform, db, user_id, connection=connection)))
+    if not stale:
+        return result
+    pool = ThreadPoolExecutor(max_workers=len(stale))
+    deadline = time.monotonic() + STATS_TIMEOUT
+    try:
+        futures = [(connection, pool.submit(service.get_stats)) for connection, service in stale]
+        for connection, future in futures:
+            try:
+                stats = future.result(timeout=max(deadline - time.monotonic(), 0))
+            except Exception as e:
+                logging.error(f"Error getting {connection.platform} stats: {str(e)}")
+                stats = connection.stats or {"error": str(e) or "timeout"}
+            else:
+                # Счётчики, которые платформа не отдаёт дёшево (YouTube), остаются от синхронизации
+                stats = {**(connection.stats or {}), **stats}
+                store_stats(db, connection, stats)
+            result[connection.id] = stats
+    finally:
+        # Не ждём зависшую платформу — ответ отдаём по общему бюджету времени
+        pool.shutdown(wait=False, cancel_futures=True)
+    return result
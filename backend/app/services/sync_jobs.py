@@ -0,0 +1,161 @@
+# Очередь фоновых синхронизаций на таблице sync_jobs. Задачи разбирают отдельные
+# процессы-воркеры (app.worker) со своими сессиями БД; повторный запуск для того же
+# (user, platform) не создаёт новую задачу, а возвращает уже активную
+import logging
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, or_, and_
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.models import SyncJob
+from app.services.sync_writer import dialect_insert
+from app.services.resilience import PlatformUnavailable
+from app.services.youtube_quota import BACKGROUND, QuotaExceeded
+
+ACTIVE_STATUSES = ("queued", "running")
+RETRY_BASE_DELAY = timedelta(seconds=30)
+STALE_AFTER = timedelta(minutes=30)  # running дольше — воркер, скорее всего, умер
+POLL_INTERVAL = 2.0
+
+
+def job_to_dict(job: SyncJob):
+    return {
+        "id": job.id,
+        "user_id": job.user_id,
+        "platform": job.platform,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "error": job.error,
+        "run_after": job.run_after,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def get_active_job(db: Session, user_id: int, platform: str):
+    return db.query(SyncJob).filter(
+        SyncJob.user_id == user_id,
+        SyncJob.platform == platform,
+        SyncJob.status.in_(ACTIVE_STATUSES),
+    ).first()
+
+
+def enqueue_sync(db: Session, user_id: int, platform: str) -> SyncJob:
+    now = datetime.utcnow()
+    stmt = dialect_insert(db, SyncJob).values(
+        user_id=user_id,
+        platform=platform,
+        status="queued",
+        attempts=0,
+        max_attempts=3,
+        run_after=now,
+        created_at=now,
+    )
+    db.execute(stmt.on_conflict_do_nothing(
+        index_elements=[SyncJob.user_id, SyncJob.platform],
+        index_where=SyncJob.status.in_(ACTIVE_STATUSES),
+    ))
+    db.commit()
+    job = get_active_job(db, user_id, platform)
+    logging.info(f"[SYNC JOBS] user_id={user_id} platform={platform} -> job {job.id if job else None}")
+    return job
+
+
+def claim_next_job(db: Session):
+    now = datetime.utcnow()
+    job = db.execute(
+        select(SyncJob)
+        .where(or_(
+            and_(SyncJob.status == "queued", SyncJob.run_after <= now),
+            and_(SyncJob.status == "running", SyncJob.started_at < now - STALE_AFTER),
+        ))
+        .order_by(SyncJob.run_after)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    ).scalar_one_or_none()
+    if not job:
+        db.rollback()
+        return None
+    job.status = "running"
+    job.attempts += 1
+    job.started_at = now
+    job.error = None
+    db.commit()
+    return job.id
+
+
+def run_job(job_id: int):
+    from app.services.sync_lock import run_platform_sync
+    db = SessionLocal()
+    try:
+        job = db.get(SyncJob, job_id)
+        try:
+            # Тот же лок, что и у ручных /sync — задача не гоняет синхронизацию параллельно с ними
+            run_platform_sync(db, job.user_id, job.platform, priority=BACKGROUND)
+        except (QuotaExceeded, PlatformUnavailable) as e:
+            # Фоновая синхронизация уступает квоту интерактивным запросам — переносим на сброс квоты
+            # (или на закрытие breaker лежащей платформы), попытку не засчитываем
+            db.rollback()
+            job = db.get(SyncJob, job_id)
+            job.status = "queued"
+            job.attempts -= 1
+            job.error = str(e)[:1000]
+            job.run_after = e.retry_at
+            db.commit()
+            logging.info(f"[SYNC JOBS] job {job_id} отложен до {e.retry_at}: {e}")
+            return
+        except Exception as e:
+            db.rollback()
+            job = db.get(SyncJob, job_id)
+            job.error = str(e)[:1000]
+            if job.attempts < job.max_attempts:
+                job.status = "queued"
+                job.run_after = datetime.utcnow() + RETRY_BASE_DELAY * (2 ** (job.attempts - 1))
+                logging.warning(f"[SYNC JOBS] job {job_id} упал (попытка {job.attempts}), повтор после {job.run_after}: {e}")
+            else:
+                job.status = "failed"
+                job.finished_at = datetime.utcnow()
+                logging.error(f"[SYNC JOBS] job {job_id} failed: {e}", exc_info=True)
+            db.commit()
+            return
+        job.status = "done"
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        logging.info(f"[SYNC JOBS] job {job_id} done ({job.platform}, user_id={job.user_id})")
+    finally:
+        db.close()
+
+
+def work_forever(poll_interval: float = POLL_INTERVAL, recheck_share: float = 1.0):
+    # Те же воркеры разбирают и переносы плейлистов; синхронизации — в первую очередь.
+    # Раз в TICK — проход перепроверки доступности, recheck_share — доля этого процесса
+    from app.services.playlist_migration import claim_next_migration, run_migration
+    from app.services.availability_recheck import run_recheck_tick, TICK
+    logging.info("[SYNC JOBS] worker started")
+    next_recheck = time.monotonic()
+    while True:
+        if time.monotonic() >= next_recheck:
+            try:
+                run_recheck_tick(recheck_share)
+            except Exception as e:
+                # Упавшая перепроверка (например, БД недоступна) не должна останавливать воркер
+                logging.error(f"[SYNC JOBS] availability recheck error: {e}", exc_info=True)
+            next_recheck = time.monotonic() + TICK
+        db = SessionLocal()
+        job_id = migration_id = None
+        try:
+            job_id = claim_next_job(db)
+            if job_id is None:
+                migration_id = claim_next_migration(db)
+        except Exception as e:
+            logging.error(f"[SYNC JOBS] claim error: {e}")
+        finally:
+            db.close()
+        if job_id is not None:
+            run_job(job_id)
+        elif migration_id is not None:
+            run_migration(migration_id)
+        else:
+            time.sleep(poll_interval)
@@ -0,0 +1,80 @@
+# Одна синхронизация на (user_id, platform). Внутри процесса второй вызов не запускает
+# свою синхронизацию, а присоединяется к идущей и получает её результат (single-flight).
+# Между процессами (API и воркеры очереди) то же обеспечивает advisory lock Postgres:
+# если ключ занят, ждём окончания чужой синхронизации и считаем её своей.
+import logging
+import threading
+import zlib
+from concurrent.futures import Future
+from contextlib import contextmanager
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.database import engine
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def single_flight(key, fn):
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _inflight[key] = future
+    if not leader:
+        logging.info(f"[SYNC LOCK] {key}: присоединились к уже идущей синхронизации")
+        return future.result()
+    try:
+        result = fn()
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+@contextmanager
+def advisory_lock(user_id: int, platform: str):
+    """Возвращает True, если лок взят нами, и False, если дождались чужой синхронизации."""
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+    key2 = zlib.crc32(platform.encode()) & 0x7FFFFFFF
+    # Отдельное соединение: сессия синхронизации коммитит и отдаёт своё соединение в пул
+    with engine.connect() as conn:
+        acquired = conn.execute(text("SELECT pg_try_advisory_lock(:k1, :k2)"), {"k1": user_id, "k2": key2}).scalar()
+        if not acquired:
+            logging.info(f"[SYNC LOCK] ({user_id}, {platform}) синхронизируется другим процессом, ждём")
+            conn.execute(text("SELECT pg_advisory_lock(:k1, :k2)"), {"k1": user_id, "k2": key2})
+        # Лок сессионный — транзакцию не держим открытой всё время синхронизации
+        conn.commit()
+        try:
+            yield acquired
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:k1, :k2)"), {"k1": user_id, "k2": key2})
+            conn.commit()
+
+
+def run_platform_sync(db: Session, user_id: int, platform: str, priority: str = "interactive"):
+    """Синхронизация платформы с объединением параллельных запусков для того же пользователя.
+    priority: interactive — запрос пользователя, background — задача из очереди."""
+    from app.services.platforms.platforms import get_platform_service, PLATFORM_BY_CONNECTION
+    # 'yandex-music' и 'yandex' — одна синхронизация: ключи лока и single-flight по каноническому имени
+    platform = PLATFORM_BY_CONNECTION.get(platform, platform)
+
+    def leader():
+        with advisory_lock(user_id, platform) as acquired:
+            if not acquired:
+                return {"user_id": user_id, "platform": platform, "coalesced": True}
+            service = get_platform_service(platform, db, user_id)
+            service.priority = priority
+            with service.operation():
+                service.sync_user_playlists_and_favorites()
+            return {"user_id": user_id, "platform": platform, "coalesced": False}
+
+    return single_flight((user_id, platform), leader)
@@ -0,0 +1,57 @@
+# Конвейер синхронизации плейлистов: треки скачиваются параллельно ограниченным пулом,
+# а запись в БД идёт в вызывающем потоке (сессия SQLAlchemy не потокобезопасна).
+# Одновременно в работе не больше max_in_flight плейлистов — это и есть backpressure:
+# пока писатель не освободил слот, новые плейлисты не скачиваются и память не растёт.
+# Ошибка одного плейлиста пропускает только его; исчерпанная квота или лежащая платформа
+# останавливает выдачу новых загрузок и пробрасывается после записи уже скачанного —
+# задача синхронизации переносится целиком (sync_jobs.run_job), а не завершается неполной.
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from app.services.resilience import PlatformUnavailable
+from app.services.youtube_quota import QuotaExceeded
+
+FETCH_WORKERS = 4
+MAX_IN_FLIGHT = 8
+
+
+def run_sync_pipeline(items, fetch, write, workers=FETCH_WORKERS, max_in_flight=MAX_IN_FLIGHT, label="SYNC"):
+    """fetch(item) выполняется в пуле, write(item, result) — в текущем потоке по мере готовности.
+    Возвращает (записано, ошибок скачивания); QuotaExceeded и PlatformUnavailable пробрасывает."""
+    items = iter(items)
+    written = failed = 0
+    fatal = None
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+
+        def submit_next():
+            if fatal is not None:
+                return False
+            for item in items:
+                pending[pool.submit(fetch, item)] = item
+                return True
+            return False
+
+        while len(pending) < max(max_in_flight, 1) and submit_next():
+            pass
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    result = future.result()
+                except (QuotaExceeded, PlatformUnavailable) as e:
+                    # Остальные плейлисты упрутся в то же — дописываем уже скачанные и выходим
+                    failed += 1
+                    fatal = fatal or e
+                    logging.warning(f"[{label}] Загрузка остановлена: {e}")
+                except Exception as e:
+                    # Не смогли скачать — сохранённые данные плейлиста не трогаем
+                    failed += 1
+                    logging.error(f"[{label}] Ошибка загрузки {item.get('id') if isinstance(item, dict) else item}: {e}")
+                else:
+                    write(item, result)
+                    written += 1
+                submit_next()
+    if fatal is not None:
+        raise fatal
+    return written, failed
@@ -0,0 +1,205 @@
+# Общая стадия записи для синхронизации платформ: пакетный upsert треков (по ISRC и track_key) и
+# их доступности на платформе; связи плейлист-трек пишутся диффом (playlist_diff)
+import logging
+from datetime import datetime
+from sqlalchemy import select, update, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.models.models import Track, TrackAvailability
+from app.services.playlist_diff import sync_playlist_tracks
+from app.services.track_key import track_key, candidate_keys, key_prefix, has_duration
+
+BATCH_SIZE = 1000
+
+
+def dialect_insert(session: Session, model):
+    # ON CONFLICT поддерживают и postgres, и sqlite — берём insert нужного диалекта
+    if session.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
+
+
+def _chunks(items, size=BATCH_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _isrc(t):
+    isrc = (t.get("isrc") or "").strip().upper().replace("-", "")
+    return isrc or None
+
+
+def _lookup(session: Session, column, values):
+    found = {}
+    for chunk in _chunks(list(values)):
+        rows = session.execute(select(Track.id, column).where(column.in_(chunk))).all()
+        for row in rows:
+            found[row[1]] = row.id
+    return found
+
+
+def _lookup_by_prefix(session: Session, prefixes):
+    """{"artist|title|": [[track_id, track_key, None], ...]} — строки записи с любой длительностью,
+    по возрастанию id. Третье поле — трек для вставки у строк, которых ещё нет в БД (см. upsert_tracks)."""
+    found = {}
+    for chunk in _chunks(list(prefixes)):
+        rows = session.execute(
+            select(Track.id, Track.track_key, Track.key_prefix).where(Track.key_prefix.in_(chunk)).order_by(Track.id)
+        ).all()
+        for row in rows:
+            found.setdefault(row.key_prefix, []).append([row.id, row.track_key, None])
+    return found
+
+
+def _match(key, candidates, rows):
+    """Строка из rows (та же запись, любая длительность) для ключа или None.
+    Сначала точная корзина длительности, потом соседние. Строка без длительности подходит треку
+    с длительностью, только если других корзин у записи нет; трек без длительности — любой, самой ранней."""
+    if not has_duration(key):
+        return rows[0] if rows else None
+    by_key = {row[1]: row for row in rows}
+    for c in candidates:
+        if c in by_key:
+            return by_key[c]
+    if rows and not any(has_duration(row[1]) for row in rows):
+        return rows[0]
+    return None
+
+
+def upsert_tracks(session: Session, tracks):
+    """Возвращает список track_id в том же порядке, что и входные треки.
+    Сначала один пакетный поиск по ISRC, оставшиеся — по нормализованному track_key среди строк
+    того же исполнителя и названия (один индексируемый запрос по key_prefix). Строки, которые
+    предстоит вставить, участвуют в сопоставлении наравне с найденными: версии одной записи
+    в пачке (183 с, 186 с, без длительности) сходятся в одну новую строку."""
+    keys = [track_key(t["title"], t["artist"], t.get("duration")) for t in tracks]
+    isrcs = [_isrc(t) for t in tracks]
+    by_isrc = _lookup(session, Track.isrc, {isrc for isrc in isrcs if isrc})
+    first_by_key = {}
+    for t, key, isrc in zip(tracks, keys, isrcs):
+        if isrc not in by_isrc:
+            first_by_key.setdefault(key, t)
+    rows_by_prefix = _lookup_by_prefix(session, {key_prefix(key) for key in first_by_key})
+    key_to_row = {}
+    new_rows = []
+    adopted = {}
+    for key, t in first_by_key.items():
+        candidates = candidate_keys(t["title"], t["artist"], t.get("duration"))
+        rows = rows_by_prefix.setdefault(key_prefix(key), [])
+        row = _match(key, candidates, rows)
+        if row is None:
+            row = [None, key, t]
+            rows.append(row)
+            new_rows.append(row)
+        elif has_duration(key) and not has_duration(row[1]):
+            # Строка без длительности (YouTube) получает корзину первого совпавшего трека —
+            # следующие длительности сравниваются уже с ней, а не сливаются в одну строку все подряд
+            row[1] = key
+            if row[0] is None:
+                row[2] = t
+            else:
+                adopted[row[0]] = (key, t.get("duration"))
+        key_to_row[key] = row
+    for track_id, (key, duration) in adopted.items():
+        try:
+            # Savepoint: если этот ключ параллельно занял другой трек, строка остаётся без длительности
+            with session.begin_nested():
+                session.execute(
+                    update(Track).where(Track.id == track_id)
+                    .values(track_key=key, duration=func.coalesce(Track.duration, duration))
+                )
+        except IntegrityError:
+            logging.info(f"[SYNC] track_key {key} уже занят другим треком, track_id={track_id} оставлен без длительности")
+    # Найденным по ключу трекам без ISRC дописываем его (по одному ISRC на трек)
+    backfill = {}
+    for key, isrc in zip(keys, isrcs):
+        if isrc and isrc not in by_isrc and key_to_row[key][0] is not None and isrc not in backfill.values():
+            backfill.setdefault(key_to_row[key][0], isrc)
+    for track_id, isrc in backfill.items():
+        try:
+            # Savepoint: если этот ISRC параллельно занял другой трек, теряем только дозапись
+            with session.begin_nested():
+                session.execute(
+                    update(Track).where(Track.id == track_id, Track.isrc.is_(None)).values(isrc=isrc)
+                )
+        except IntegrityError:
+            logging.info(f"[SYNC] ISRC {isrc} уже привязан к другому треку, track_id={track_id} оставлен без него")
+    now = datetime.utcnow()
+    seen_isrcs = set(backfill.values())
+    rows_to_insert = []
+    for _, key, t in new_rows:
+        isrc = _isrc(t)
+        if isrc in seen_isrcs:
+            isrc = None
+        seen_isrcs.add(isrc)
+        rows_to_insert.append({
+            "title": t["title"],
+            "artist": t["artist"],
+            "album": t.get("album"),
+            "duration": t.get("duration"),
+            "image_url": t.get("cover_url"),
+            "track_key": key,
+            "key_prefix": key_prefix(key),
+            "isrc": isrc,
+            "created_at": now,
+        })
+    inserted = {}
+    for chunk in _chunks(rows_to_insert):
+        # Без index_elements: конфликт возможен и по track_key, и по isrc
+        stmt = dialect_insert(session, Track).values(chunk)
+        rows = session.execute(stmt.on_conflict_do_nothing().returning(Track.id, Track.track_key)).all()
+        inserted.update({row.track_key: row.id for row in rows})
+    for row in new_rows:
+        row[0] = inserted.get(row[1])
+    # Строки, которые параллельная синхронизация вставила раньше нас
+    raced = [row for row in new_rows if row[0] is None]
+    if raced:
+        by_raced_key = _lookup(session, Track.track_key, {row[1] for row in raced})
+        # Ключа нет — значит, вставка упёрлась в ISRC, который уже носит другой трек
+        by_raced_isrc = _lookup(session, Track.isrc, {_isrc(row[2]) for row in raced} - {None})
+        for row in raced:
+            row[0] = by_raced_key.get(row[1]) or by_raced_isrc[_isrc(row[2])]
+    return [by_isrc[isrc] if isrc in by_isrc else key_to_row[key][0] for key, isrc in zip(keys, isrcs)]
+
+
+def upsert_availability(session: Session, platform: str, tracks, track_ids):
+    # Одна строка на (track_id, platform): при повторе в пачке оставляем первый external_id
+    now = datetime.utcnow()
+    rows = {}
+    for t, track_id in zip(tracks, track_ids):
+        if t.get("id") is None or track_id in rows:
+            continue
+        rows[track_id] = {
+            "track_id": track_id,
+            "platform": platform,
+            "external_id": str(t["id"]),
+            "url": t.get("url"),
+            "available": True,
+            "last_checked_at": now,
+        }
+    values = list(rows.values())
+    for chunk in _chunks(values):
+        stmt = dialect_insert(session, TrackAvailability).values(chunk)
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=[TrackAvailability.track_id, TrackAvailability.platform],
+            set_={
+                "external_id": stmt.excluded.external_id,
+                "available": True,
+                "last_checked_at": stmt.excluded.last_checked_at,
+            },
+        ))
+
+
+def write_tracks(session: Session, platform: str, tracks):
+    """Треки и их доступность на платформе; возвращает track_id по позициям входного списка."""
+    track_ids = upsert_tracks(session, tracks)
+    upsert_availability(session, platform, tracks, track_ids)
+    return track_ids
+
+
+def write_playlist(session: Session, playlist_id: int, platform: str, tracks):
+    """Полная запись треков плейлиста; возвращает {external_id: track_id}."""
+    track_ids = write_tracks(session, platform, tracks)
+    sync_playlist_tracks(session, playlist_id, platform, track_ids)
+    return {str(t["id"]): track_id for t, track_id in zip(tracks, track_ids) if t.get("id") is not None}
@@ -0,0 +1,198 @@
+# Access-токены платформ: кэш в памяти процесса, проактивное обновление незадолго
+# до expires_at и одно обращение к token endpoint на аккаунт при параллельных запросах
+# (лок в процессе + SELECT ... FOR UPDATE строки connected_services между процессами).
+# Токены без expires_at (xtoken Яндекса) время от времени перечитываются из БД, а на 401
+# сразу: обновить их через token endpoint нельзя, но пользователь мог ввести новый.
+import os
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from app.database import SessionLocal
+from app.models.models import ConnectedService
+from app.services.http_client import get_http_client
+
+REFRESH_SKEW = timedelta(minutes=2)  # обновляем заранее, чтобы не ловить 401 посреди синхронизации
+REVALIDATE_AFTER = timedelta(minutes=30)  # токен без expires_at перечитываем из БД не реже этого
+MAX_CACHED_TOKENS = 10000  # аккаунтов в кэше процесса; самые давно использованные вытесняются
+
+# connected_services.platform -> (token endpoint, env client_id, env client_secret)
+TOKEN_ENDPOINTS = {
+    "spotify": ("https://accounts.spotify.com/api/token", "SPOTIFY_CLIENT_ID", "SPOTIFY_CLIENT_SECRET"),
+    "youtube": ("https://oauth2.googleapis.com/token", "GOOGLE_CLIENT_ID", "GOOGLE_CLIENT_SECRET"),
+}
+
+
+@dataclass
+class CachedToken:
+    access_token: str
+    expires_at: datetime = None
+    cached_at: datetime = field(default_factory=datetime.utcnow)
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(key):
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def _is_expiring(expires_at):
+    return expires_at is not None and expires_at - REFRESH_SKEW <= datetime.utcnow()
+
+
+def _is_fresh(cached):
+    if cached is None or _is_expiring(cached.expires_at):
+        return False
+    # Бессрочный токен мог смениться в БД (переподключение) — кэшу не верим вечно
+    return cached.expires_at is not None or datetime.utcnow() - cached.cached_at < REVALIDATE_AFTER
+
+
+def _cached(key):
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+        return cached
+
+
+def expires_at_from(expires_in):
+    if not expires_in:
+        return None
+    return datetime.utcnow() + timedelta(seconds=int(expires_in))
+
+
+def remember_token(user_id: int, platform: str, access_token: str, expires_at: datetime = None):
+    key = (user_id, platform)
+    with _cache_lock:
+        _cache[key] = CachedToken(access_token, expires_at)
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_CACHED_TOKENS:
+            _cache.popitem(last=False)
+
+
+def forget_token(user_id: int, platform: str):
+    with _cache_lock:
+        _cache.pop((user_id, platform), None)
+
+
+def get_access_token(user_id: int, platform: str, connection: ConnectedService = None):
+    """Текущий токен аккаунта; при подходе к expires_at обновляет его заранее."""
+    key = (user_id, platform)
+    cached = _cached(key)
+    if _is_fresh(cached):
+        return cached.access_token
+    with _lock_for(key):
+        cached = _cached(key)
+        if _is_fresh(cached):
+            return cached.access_token
+        # Переданная строка годится только для первой загрузки; истекающий кэш перечитываем
+        # из БД — токен мог обновить другой процесс
+        if connection is None or cached is not None:
+            db = SessionLocal()
+            try:
+                connection = db.query(ConnectedService).filter_by(user_id=user_id, platform=platform).first()
+                row = (connection.access_token, connection.expires_at, connection.refresh_token) if connection else None
+            finally:
+                db.close()
+        else:
+            row = (connection.access_token, connection.expires_at, connection.refresh_token)
+        if not row:
+            return None
+        access_token, expires_at, refresh_token = row
+        if _is_expiring(expires_at) and refresh_token and platform in TOKEN_ENDPOINTS:
+            refreshed = _refresh_locked(user_id, platform)
+            if refreshed:
+                return refreshed
+        remember_token(user_id, platform, access_token, expires_at)
+        return access_token
+
+
+def refresh_access_token(user_id: int, platform: str, stale_token: str = None):
+    """Обновление после 401. Если токен уже обновил другой поток — отдаём его, без запроса."""
+    key = (user_id, platform)
+    with _lock_for(key):
+        cached = _cached(key)
+        if cached and stale_token and cached.access_token != stale_token and not _is_expiring(cached.expires_at):
+            return cached.access_token
+        if platform not in TOKEN_ENDPOINTS:
+            return _reload_locked(user_id, platform, stale_token)
+        return _refresh_locked(user_id, platform)
+
+
+def _reload_locked(user_id: int, platform: str, stale_token: str = None):
+    # Платформа без token endpoint: после 401 берём токен из БД — повторять запрос есть смысл,
+    # только если он отличается от отвергнутого
+    forget_token(user_id, platform)
+    db = SessionLocal()
+    try:
+        service = db.query(ConnectedService).filter_by(user_id=user_id, platform=platform).first()
+        row = (service.access_token, service.expires_at) if service else None
+    finally:
+        db.close()
+    if not row or not row[0]:
+        return None
+    access_token, expires_at = row
+    remember_token(user_id, platform, access_token, expires_at)
+    if access_token == stale_token:
+        logging.warning(f"[{platform.upper()}] Токен user_id={user_id} отклонён платформой, нового в БД нет")
+        return None
+    return access_token
+
+
+def _refresh_locked(user_id: int, platform: str):
+    tag = platform.upper()
+    if platform not in TOKEN_ENDPOINTS:
+        return None
+    token_url, client_id_env, client_secret_env = TOKEN_ENDPOINTS[platform]
+    db = SessionLocal()
+    try:
+        service = (
+            db.query(ConnectedService)
+            .filter_by(user_id=user_id, platform=platform)
+            .with_for_update()
+            .first()
+        )
+        if not service or not service.refresh_token:
+            logging.warning(f"[{tag}] Нет refresh_token для user_id={user_id}")
+            return None
+        # Пока ждали блокировку строки, токен мог обновить другой процесс
+        if service.expires_at and not _is_expiring(service.expires_at):
+            cached = _cached((user_id, platform))
+            if not cached or cached.access_token != service.access_token:
+                remember_token(user_id, platform, service.access_token, service.expires_at)
+                db.commit()
+                return service.access_token
+        data = {
+            "grant_type": "refresh_token",
+            "refresh_token": service.refresh_token,
+            "client_id": os.getenv(client_id_env),
+            "client_secret": os.getenv(client_secret_env),
+        }
+        resp = get_http_client().post(token_url, data=data)
+        logging.info(f"[{tag}] refresh_token status={resp.status_code} body={resp.text[:200]}")
+        if resp.status_code == 200:
+            tokens = resp.json()
+            service.access_token = tokens["access_token"]
+            service.expires_at = expires_at_from(tokens.get("expires_in"))
+            if tokens.get("refresh_token"):
+                service.refresh_token = tokens["refresh_token"]
+            db.commit()
+            remember_token(user_id, platform, service.access_token, service.expires_at)
+            logging.info(f"[{tag}] access_token обновлён для user_id={user_id}, expires_at={service.expires_at}")
+            return service.access_token
+        logging.error(f"[{tag}] Не удалось обновить access_token для user_id={user_id}. Ответ: {resp.text}")
+        if platform == "youtube" and resp.status_code == 400 and "invalid_grant" in resp.text:
+            # Удаляем сервис если refresh_token невалиден
+            db.delete(service)
+            forget_token(user_id, platform)
+            logging.warning(f"[{tag}] ConnectedService удалён для user_id={user_id} из-за невалидного refresh_token")
+        db.commit()
+        return None
+    finally:
+        db.close()
@@ -0,0 +1,83 @@
+# Нормализованный ключ трека для дедупликации между платформами: основной исполнитель,
+# название без feat./remaster/"official video" и корзина длительности. Одинаковая запись
+# со Spotify ("Artist A, Artist B"), Яндекса ("Artist A") и YouTube ("Song (Official Video)")
+# получает один ключ и одну строку tracks.
+import re
+import unicodedata
+
+DURATION_BUCKET = 10  # секунд; соседние корзины тоже считаются совпадением (см. candidate_keys)
+
+# Скобки с пометками, не меняющими запись: (feat. X), [Official Video], (Remastered 2011) ...
+_NOISE_BRACKETS = re.compile(
+    r"[\(\[][^\)\]]*\b(feat|ft|featuring|remaster|remastered|official|video|audio|lyrics|lyric|"
+    r"visualizer|hd|hq|4k|mv|explicit)\b[^\)\]]*[\)\]]",
+    re.IGNORECASE,
+)
+# Хвосты вида " - Remastered 2011", " - 2011 Remaster", " - Remastered Version"
+_REMASTER_SUFFIX = re.compile(r"\s+-\s+[^-]*\bremaster(ed)?\b.*$", re.IGNORECASE)
+# feat. без скобок — до конца строки
+_FEAT_TAIL = re.compile(r"\s+(feat|ft|featuring)\.?\s+.*$", re.IGNORECASE)
+_ARTIST_SEPARATORS = re.compile(r"\s*(?:,|;|\s(?:feat|ft|featuring)\.?\s)\s*", re.IGNORECASE)
+# Служебные каналы YouTube: "Artist - Topic", "ArtistVEVO"
+_CHANNEL_SUFFIX = re.compile(r"(\s+-\s+topic|vevo)$", re.IGNORECASE)
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def _fold(text: str):
+    # casefold + без диакритики + только буквы/цифры через одиночный пробел
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def primary_artist(artist: str):
+    artist = _CHANNEL_SUFFIX.sub("", (artist or "").strip())
+    first = _ARTIST_SEPARATORS.split(artist, maxsplit=1)[0]
+    return _fold(first) or _fold(artist)
+
+
+def normalize_title(title: str, artist: str = ""):
+    raw = title or ""
+    cleaned = _NOISE_BRACKETS.sub(" ", raw)
+    cleaned = _REMASTER_SUFFIX.sub("", cleaned)
+    cleaned = _FEAT_TAIL.sub("", cleaned)
+    folded = _fold(cleaned)
+    # YouTube: "Artist - Song" в названии видео
+    if artist and folded.startswith(artist + " ") and " - " in cleaned:
+        folded = folded[len(artist):].strip()
+    return folded or _fold(raw)
+
+
+def duration_bucket(duration):
+    if not duration:
+        return None
+    return int(round(duration / DURATION_BUCKET))
+
+
+def _compose(artist, title, bucket):
+    return f"{artist}|{title}|{'' if bucket is None else bucket}"
+
+
+def track_key(title: str, artist: str, duration=None):
+    artist_key = primary_artist(artist)
+    return _compose(artist_key, normalize_title(title, artist_key), duration_bucket(duration))
+
+
+def candidate_keys(title: str, artist: str, duration=None):
+    """Собственный ключ первым, затем ключи соседних корзин длительности (183 с и 186 с — одна запись).
+    Строку без длительности (YouTube) sync_writer подбирает отдельно, по key_prefix."""
+    artist_key = primary_artist(artist)
+    title_key = normalize_title(title, artist_key)
+    bucket = duration_bucket(duration)
+    if bucket is None:
+        return [_compose(artist_key, title_key, None)]
+    return [_compose(artist_key, title_key, b) for b in (bucket, bucket - 1, bucket + 1)]
+
+
+def key_prefix(key: str):
+    # "artist|title|" — общая часть ключей одной записи с любой длительностью
+    return key[:key.rindex("|") + 1]
+
+
+def has_duration(key: str):
+    return not key.endswith("|")
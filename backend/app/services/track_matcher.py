@@ -0,0 +1,148 @@
+# Нечёткое сопоставление треков пачками: названия и исполнители кандидатов раскладываются
+# в NumPy-матрицы хешированных символьных триграмм, и сходство целого плейлиста со всеми
+# кандидатами считается одним матричным умножением (косинус) плюс близость длительности.
+# Точные совпадения (ISRC, track_key) резолвит sync_writer — сюда попадают только остатки.
+import zlib
+import numpy as np
+from app.services.track_key import normalize_title, primary_artist
+
+DIM = 1024                 # размер хеш-пространства триграмм
+BLOCK_SIZE = 4000          # кандидатов в одной матрице: 4000 x 1024 float32 ~ 16 МБ
+MIN_CONFIDENCE = 0.75
+# Вес компонент итоговой оценки
+TITLE_WEIGHT = 0.6
+ARTIST_WEIGHT = 0.25
+DURATION_WEIGHT = 0.15
+DURATION_TOLERANCE = 3     # секунд — разница, которая ещё считается точным совпадением
+DURATION_CUTOFF = 30       # секунд — дальше длительность совпадению не помогает
+UNKNOWN_DURATION = 0.5     # оценка, если у одной из сторон длительности нет
+
+_trigram_cache = {}
+
+
+def _trigram_ids(text: str):
+    ids = _trigram_cache.get(text)
+    if ids is None:
+        padded = f"  {text} "
+        # crc32, а не hash(): одинаковые индексы в любом процессе
+        ids = [zlib.crc32(padded[i:i + 3].encode()) % DIM for i in range(len(padded) - 2)]
+        if len(_trigram_cache) < 200_000:
+            _trigram_cache[text] = ids
+    return ids
+
+
+def featurize(texts):
+    """Матрица (len(texts), DIM): счётчики триграмм, нормированные по L2 — скалярное произведение = косинус."""
+    rows, cols = [], []
+    for row, text in enumerate(texts):
+        ids = _trigram_ids(text)
+        rows.extend([row] * len(ids))
+        cols.extend(ids)
+    matrix = np.zeros((len(texts), DIM), dtype=np.float32)
+    np.add.at(matrix, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), 1.0)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def _normalized(tracks):
+    artists = [primary_artist(t.get("artist") or "") for t in tracks]
+    titles = [normalize_title(t.get("title") or "", a) for t, a in zip(tracks, artists)]
+    durations = np.array([t.get("duration") or np.nan for t in tracks], dtype=np.float32)
+    return titles, artists, durations
+
+
+def _duration_scores(query_durations, candidate_durations):
+    diff = np.abs(query_durations[:, None] - candidate_durations[None, :])
+    scores = np.clip((DURATION_CUTOFF - diff) / (DURATION_CUTOFF - DURATION_TOLERANCE), 0.0, 1.0)
+    return np.where(np.isnan(diff), UNKNOWN_DURATION, scores)
+
+
+class CandidateIndex:
+    """Признаки набора кандидатов (dict с title/artist/duration), готовые к пакетному сравнению."""
+
+    def __init__(self, candidates):
+        self.candidates = list(candidates)
+        titles, artists, self.durations = _normalized(self.candidates)
+        self.titles = featurize(titles)
+        self.artists = featurize(artists)
+        # "artist title" целиком: у YouTube исполнитель часто только в названии видео
+        self.combined = featurize([f"{a} {t}" for a, t in zip(artists, titles)])
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def score(self, queries: "QueryBatch"):
+        """Матрица оценок (запросы x кандидаты) в диапазоне 0..1."""
+        weighted = (
+            TITLE_WEIGHT * (queries.titles @ self.titles.T)
+            + ARTIST_WEIGHT * (queries.artists @ self.artists.T)
+        )
+        combined = (TITLE_WEIGHT + ARTIST_WEIGHT) * (queries.combined @ self.combined.T)
+        text = np.maximum(weighted, combined)
+        return text + DURATION_WEIGHT * _duration_scores(queries.durations, self.durations)
+
+
+class QueryBatch:
+    def __init__(self, tracks):
+        self.tracks = list(tracks)
+        titles, artists, self.durations = _normalized(self.tracks)
+        self.titles = featurize(titles)
+        self.artists = featurize(artists)
+        self.combined = featurize([f"{a} {t}" for a, t in zip(artists, titles)])
+
+
+class _BestMatches:
+    def __init__(self, size):
+        self.scores = np.full(size, -1.0, dtype=np.float32)
+        self.candidates = [None] * size
+
+    def update(self, index: CandidateIndex, scores):
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(scores.shape[0]), best]
+        for i in np.nonzero(best_scores > self.scores)[0]:
+            self.scores[i] = best_scores[i]
+            self.candidates[i] = index.candidates[best[i]]
+
+    def result(self, min_confidence):
+        return [
+            {"candidate": candidate, "confidence": round(float(score), 3)}
+            if candidate is not None and score >= min_confidence else None
+            for candidate, score in zip(self.candidates, self.scores)
+        ]
+
+
+def match_tracks(tracks, candidates, min_confidence: float = MIN_CONFIDENCE):
+    """Лучший кандидат для каждого трека: [{"candidate", "confidence"} | None] в порядке tracks."""
+    if not tracks:
+        return []
+    queries = QueryBatch(tracks)
+    best = _BestMatches(len(queries.tracks))
+    candidates = list(candidates)
+    for start in range(0, len(candidates), BLOCK_SIZE):
+        index = CandidateIndex(candidates[start:start + BLOCK_SIZE])
+        best.update(index, index.score(queries))
+    return best.result(min_confidence)
+
+
+def match_groups(tracks, candidate_groups, min_confidence: float = MIN_CONFIDENCE):
+    """Как match_tracks, но у каждого трека свои кандидаты (например, выдача поиска по нему):
+    все группы сравниваются одним умножением матриц, чужие кандидаты маскируются."""
+    if not tracks:
+        return []
+    candidates, owners = [], []
+    for i, group in enumerate(candidate_groups):
+        candidates.extend(group)
+        owners.extend([i] * len(group))
+    best = _BestMatches(len(tracks))
+    if not candidates:
+        return best.result(min_confidence)
+    queries = QueryBatch(tracks)
+    owners = np.asarray(owners)
+    rows = np.arange(len(queries.tracks))[:, None]
+    for start in range(0, len(candidates), BLOCK_SIZE):
+        index = CandidateIndex(candidates[start:start + BLOCK_SIZE])
+        own = owners[start:start + BLOCK_SIZE][None, :] == rows
+        best.update(index, np.where(own, index.score(queries), -1.0))
+    return best.result(min_confidence)
+
@@ -0,0 +1,135 @@
+# Ранжированный поиск по локальному каталогу tracks (название, исполнитель, альбом).
+# На Postgres — GIN-индексы pg_trgm и tsvector по одному выражению-документу: полные слова
+# ранжирует ts_rank_cd, опечатки и недописанные слова ловит word_similarity. На остальных
+# СУБД (SQLite в тестовых прогонах) — инвертированный индекс в памяти процесса, который
+# дочитывает новые строки tracks по id (изменённые и удалённые строки он не замечает).
+import bisect
+import math
+import threading
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+from app.models.models import Track
+from app.services.track_key import normalize_title
+
+# Выражение должно совпадать с индексами символ в символ, иначе планировщик их не возьмёт
+SEARCH_DOCUMENT = "lower(coalesce(title, '') || ' ' || coalesce(artist, '') || ' ' || coalesce(album, ''))"
+SEARCH_INDEX_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tracks_search_trgm ON tracks USING gin (({SEARCH_DOCUMENT}) gin_trgm_ops)",
+    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tracks_search_tsv ON tracks USING gin (to_tsvector('simple', {SEARCH_DOCUMENT}))",
+]
+MAX_LIMIT = 100
+
+_POSTGRES_QUERY = text(f"""
+    SELECT id, title, artist, album, duration, image_url,
+           ts_rank_cd(to_tsvector('simple', {SEARCH_DOCUMENT}), query) + word_similarity(:q, {SEARCH_DOCUMENT}) AS score
+    FROM tracks, plainto_tsquery('simple', :q) AS query
+    WHERE to_tsvector('simple', {SEARCH_DOCUMENT}) @@ query
+       OR :q <% {SEARCH_DOCUMENT}
+    ORDER BY score DESC, id
+    LIMIT :limit
+""")
+
+
+def _tokens(text_):
+    return normalize_title(text_ or "").split()
+
+
+class InvertedIndex:
+    """token -> {track_id: вхождений}; словарь отсортирован для поиска по префиксу последнего слова."""
+
+    def __init__(self):
+        self.postings = {}
+        self.vocabulary = []
+        self.tracks = {}
+        self.last_id = 0
+        self._lock = threading.Lock()
+
+    def refresh(self, db: Session, batch: int = 5000):
+        with self._lock:
+            result = db.execute(
+                select(Track.id, Track.title, Track.artist, Track.album, Track.duration, Track.image_url)
+                .where(Track.id > self.last_id)
+                .order_by(Track.id)
+                .execution_options(yield_per=batch)
+            )
+            added = set()
+            for row in result:
+                self.tracks[row.id] = row
+                for token in _tokens(f"{row.title} {row.artist} {row.album or ''}"):
+                    postings = self.postings.setdefault(token, {})
+                    postings[row.id] = postings.get(row.id, 0) + 1
+                    added.add(token)
+                self.last_id = row.id
+            if added:
+                self.vocabulary = sorted(self.postings)
+
+    def _expand(self, prefix):
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + "\uffff")
+        return self.vocabulary[start:end]
+
+    def search(self, query: str, limit: int):
+        tokens = _tokens(query)
+        if not tokens:
+            return []
+        with self._lock:
+            return self._search(tokens, limit)
+
+    def _search(self, tokens, limit):
+        total = max(len(self.tracks), 1)
+        scores = None
+        for i, token in enumerate(tokens):
+            # Последнее слово запроса может быть недописанным — берём все слова с таким префиксом
+            variants = self._expand(token) if i == len(tokens) - 1 else [token]
+            token_scores = {}
+            for variant in variants:
+                postings = self.postings.get(variant, {})
+                idf = math.log(1 + total / (1 + len(postings)))
+                for track_id, count in postings.items():
+                    token_scores[track_id] = max(token_scores.get(track_id, 0), idf * (1 + math.log(count)))
+            # Все слова запроса обязательны
+            scores = token_scores if scores is None else {
+                track_id: score + token_scores[track_id] for track_id, score in scores.items() if track_id in token_scores
+            }
+            if not scores:
+                return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [(self.tracks[track_id], score) for track_id, score in ranked]
+
+
+_memory_index = InvertedIndex()
+
+
+def _row_to_dict(row, score):
+    return {
+        "id": row.id,
+        "title": row.title,
+        "artist": row.artist,
+        "album": row.album,
+        "duration": row.duration,
+        "image_url": row.image_url,
+        "score": round(float(score), 4),
+    }
+
+
+def search_tracks(db: Session, query: str, limit: int = 20):
+    """Треки каталога по убыванию релевантности: [{"id", "title", "artist", "album", "duration", "image_url", "score"}]."""
+    query = (query or "").strip()
+    limit = max(1, min(limit, MAX_LIMIT))
+    if not query:
+        return []
+    if db.get_bind().dialect.name == "postgresql":
+        rows = db.execute(_POSTGRES_QUERY, {"q": query.lower(), "limit": limit}).all()
+        return [_row_to_dict(row, row.score) for row in rows]
+    _memory_index.refresh(db)
+    return [_row_to_dict(row, score) for row, score in _memory_index.search(query, limit)]
+
+
+def ensure_search_indexes(engine):
+    # Для баз, созданных через init_db (create_all) без alembic; CONCURRENTLY — вне транзакции
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for ddl in SEARCH_INDEX_DDL:
+            conn.execute(text(ddl))
@@ -0,0 +1,133 @@
+# Учёт квоты YouTube Data API: 10 000 единиц в сутки на весь проект, сброс в полночь по
+# тихоокеанскому времени. Каждый вызов заранее списывает свою стоимость в общий для всех
+# процессов счётчик (api_quota_usage), а приоритет вызова определяет, до какого остатка он
+# вправе тратить квоту: interactive — до нуля, background (синхронизации из очереди) — не
+# трогает резерв интерактивных запросов, deferrable (догрузка длительностей) — идёт, только
+# пока квоты с запасом. Не пущенный вызов получает QuotaExceeded со временем сброса.
+import os
+import logging
+from datetime import datetime, time, timedelta, timezone
+from sqlalchemy import select, update
+from app.database import SessionLocal
+from app.models.models import ApiQuotaUsage
+from app.services.sync_writer import dialect_insert
+
+PLATFORM = "youtube"
+DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+DEFERRABLE = "deferrable"
+# Сколько единиц должно остаться нетронутыми для более важных вызовов
+RESERVES = {
+    INTERACTIVE: 0,
+    BACKGROUND: DAILY_QUOTA // 10,
+    DEFERRABLE: DAILY_QUOTA * 3 // 10,
+}
+# Стоимость методов в единицах: https://developers.google.com/youtube/v3/determine_quota_cost
+UNIT_COSTS = {
+    "playlists.list": 1,
+    "playlistItems.list": 1,
+    "videos.list": 1,
+    "search.list": 100,
+    "playlists.insert": 50,
+    "playlistItems.insert": 50,
+}
+
+try:
+    from zoneinfo import ZoneInfo
+    QUOTA_TZ = ZoneInfo("America/Los_Angeles")
+except Exception:
+    # Нет базы часовых поясов (slim-образ без tzdata) — PST без учёта летнего времени
+    QUOTA_TZ = timezone(timedelta(hours=-8))
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, priority: str, retry_at: datetime):
+        super().__init__(f"YouTube quota budget for {priority} calls is exhausted until {retry_at:%Y-%m-%d %H:%M} UTC")
+        self.priority = priority
+        self.retry_at = retry_at
+
+
+def quota_day():
+    return datetime.now(QUOTA_TZ).date()
+
+
+def reset_at():
+    """Время сброса квоты в UTC (naive, как остальные даты в БД)."""
+    midnight = datetime.combine(quota_day() + timedelta(days=1), time.min, tzinfo=QUOTA_TZ)
+    return midnight.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def method_for_url(url: str, action: str = "list"):
+    # .../youtube/v3/playlistItems?... -> playlistItems.list (POST — playlistItems.insert)
+    return url.split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1] + "." + action
+
+
+def spend(method: str, priority: str = INTERACTIVE, calls: int = 1):
+    """Списывает стоимость calls вызовов method или бросает QuotaExceeded, не списав ничего."""
+    cost = UNIT_COSTS.get(method, 1) * calls
+    ceiling = DAILY_QUOTA - RESERVES.get(priority, 0)
+    day = quota_day()
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        db.execute(
+            dialect_insert(db, ApiQuotaUsage)
+            .values(platform=PLATFORM, day=day, units=0, updated_at=now)
+            .on_conflict_do_nothing(index_elements=["platform", "day"])
+        )
+        # Проверка и списание одним UPDATE — параллельные процессы не перерасходуют остаток
+        result = db.execute(
+            update(ApiQuotaUsage)
+            .where(
+                ApiQuotaUsage.platform == PLATFORM,
+                ApiQuotaUsage.day == day,
+                ApiQuotaUsage.units + cost <= ceiling,
+            )
+            .values(units=ApiQuotaUsage.units + cost, updated_at=now)
+        )
+        db.commit()
+    finally:
+        db.close()
+    if result.rowcount == 0:
+        logging.warning(f"[YOUTUBE QUOTA] {method} x{calls} ({priority}) отклонён: бюджет исчерпан")
+        raise QuotaExceeded(priority, reset_at())
+    logging.debug(f"[YOUTUBE QUOTA] {method} x{calls} ({priority}): -{cost}")
+
+
+def mark_exhausted():
+    # Google ответил quotaExceeded — наш счётчик разошёлся с реальным, до сброса считаем квоту выбранной
+    db = SessionLocal()
+    try:
+        stmt = dialect_insert(db, ApiQuotaUsage).values(
+            platform=PLATFORM, day=quota_day(), units=DAILY_QUOTA, updated_at=datetime.utcnow()
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["platform", "day"],
+            set_={"units": DAILY_QUOTA, "updated_at": stmt.excluded.updated_at},
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def usage():
+    day = quota_day()
+    db = SessionLocal()
+    try:
+        used = db.execute(
+            select(ApiQuotaUsage.units).where(ApiQuotaUsage.platform == PLATFORM, ApiQuotaUsage.day == day)
+        ).scalar() or 0
+    finally:
+        db.close()
+    remaining = max(DAILY_QUOTA - used, 0)
+    return {
+        "day": day.isoformat(),
+        "limit": DAILY_QUOTA,
+        "used": used,
+        "remaining": remaining,
+        "reset_at": reset_at(),
+        # Сколько ещё может потратить каждый приоритет
+        "available": {priority: max(remaining - reserve, 0) for priority, reserve in RESERVES.items()},
+    }
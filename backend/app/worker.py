@@ -0,0 +1,41 @@
+# Процессы-воркеры фоновой синхронизации: python -m app.worker --processes 2
+import argparse
+import logging
+import multiprocessing
+from app.services.sync_jobs import work_forever, POLL_INTERVAL
+from app.services.resilience import set_rate_share
+
+
+def _run(poll_interval, rate_share, recheck_share):
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(processName)s - %(levelname)s - %(message)s"
+    )
+    # Лимиты платформ общие на всех воркеров — каждый процесс берёт свою долю
+    set_rate_share(rate_share)
+    work_forever(poll_interval, recheck_share)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Orbitune sync workers")
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    parser.add_argument("--rate-share", type=float, default=0.5,
+                        help="доля лимитов платформ на все процессы воркера (остальное — API)")
+    args = parser.parse_args()
+    # spawn, а не fork: каждому процессу свой engine, пул соединений и HTTP-клиент
+    ctx = multiprocessing.get_context("spawn")
+    processes = max(args.processes, 1)
+    workers = [
+        # Перепроверку доступности процессы тоже делят поровну
+        ctx.Process(target=_run, args=(args.poll_interval, args.rate_share / processes, 1.0 / processes), name=f"sync-worker-{i}")
+        for i in range(processes)
+    ]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+# Тесты запускаются из backend/: `python -m pytest`. app.database создаёт engine при импорте,
+# поэтому без DATABASE_URL берём sqlite в памяти; TEST_DATABASE_URL — прогон на Postgres
+import os
+
+os.environ.setdefault("DATABASE_URL", os.getenv("TEST_DATABASE_URL", "sqlite://"))
+
+# Сервисы платформ читают базовые URL при импорте: в тестах — только фейковые хосты,
+# которые обслуживает подменённый транспорт (tests/conftest.py: fake_http)
+os.environ["SPOTIFY_API_BASE"] = "http://spotify.test/v1"
+os.environ["YANDEX_API_BASE"] = "http://yandex.test"
+os.environ["YOUTUBE_API_BASE"] = "http://youtube.test/youtube/v3"
@@ -0,0 +1,63 @@
+# Общие фикстуры: сессия на тестовой БД (app.database, DATABASE_URL из ../conftest.py) и
+# подменённый HTTP-транспорт — запросы к платформам уходят в фейковый сервер теста.
+import json
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from app.database import SessionLocal, engine
+from app.models.models import Base
+from app.services import resilience, token_manager
+from app.services.http_client import set_http_transport
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
+
+
+class FakeTransport(BaseAdapter):
+    """Транспорт requests, который отвечает из handler(request) -> (status, json | None)."""
+
+    def __init__(self, handler):
+        super().__init__()
+        self.handler = handler
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        status, body = self.handler(request)
+        resp = requests.Response()
+        resp.status_code = status
+        resp._content = json.dumps(body).encode() if body is not None else b""
+        resp.headers["Content-Type"] = "application/json"
+        resp.url = request.url
+        resp.request = request
+        return resp
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_http():
+    """fake_http(handler) ставит транспорт процесса; лимиты, breaker'ы и кэш токенов — с чистого листа."""
+    resilience.set_rate_share(1000.0)
+    resilience._breakers.clear()
+
+    def install(handler):
+        transport = FakeTransport(handler)
+        set_http_transport(transport)
+        return transport
+
+    yield install
+    set_http_transport()
+    resilience.set_rate_share(1.0)
+    resilience._breakers.clear()
+    with token_manager._cache_lock:
+        token_manager._cache.clear()
@@ -0,0 +1,56 @@
+# Колоночная доступность: по массиву id/ссылок на платформу, выровненному по track_ids —
+# None там, где трека на платформе нет или он помечен недоступным.
+import pytest
+from app.models.models import PlaylistTrack, Track, TrackAvailability, User, UserPlaylist
+from app.services.availability import resolve_playlist, resolve_tracks
+
+
+@pytest.fixture
+def playlist(db):
+    user = User(email="u@example.com", password_hash="x", nickname="u")
+    db.add(user)
+    db.flush()
+    playlist = UserPlaylist(user_id=user.id, title="p", tracks_number=3)
+    db.add(playlist)
+    tracks = [Track(title=f"Song {i}", artist="Artist") for i in range(3)]
+    db.add_all(tracks)
+    db.flush()
+    # Порядок плейлиста — 2, 0, 1 (не порядок id)
+    for order_index, track in zip((1, 2, 0), tracks):
+        db.add(PlaylistTrack(playlist_id=playlist.id, track_id=track.id, order_index=order_index))
+    db.add_all([
+        TrackAvailability(track_id=tracks[0].id, platform="spotify", external_id="sp0", url="https://sp/0"),
+        TrackAvailability(track_id=tracks[2].id, platform="spotify", external_id="sp2", url="https://sp/2"),
+        TrackAvailability(track_id=tracks[1].id, platform="youtube", external_id="yt1", url="https://yt/1"),
+        TrackAvailability(track_id=tracks[2].id, platform="youtube", external_id="yt2", available=False),
+    ])
+    db.commit()
+    return playlist.id, [t.id for t in tracks]
+
+
+def test_playlist_columns_follow_playlist_order(db, playlist):
+    playlist_id, (t0, t1, t2) = playlist
+    result = resolve_playlist(db, playlist_id)
+    assert result["track_ids"] == [t2, t0, t1]
+    assert result["platforms"] == {
+        "spotify": {"ids": ["sp2", "sp0", None], "urls": ["https://sp/2", "https://sp/0", None]},
+        # Недоступный yt2 не отдаётся
+        "youtube": {"ids": [None, None, "yt1"], "urls": [None, None, "https://yt/1"]},
+    }
+
+
+def test_playlist_platform_filter_keeps_tracks_without_availability(db, playlist):
+    playlist_id, (t0, t1, t2) = playlist
+    result = resolve_playlist(db, playlist_id, platforms=["youtube"])
+    assert result["track_ids"] == [t2, t0, t1]
+    assert result["platforms"] == {"youtube": {"ids": [None, None, "yt1"], "urls": [None, None, "https://yt/1"]}}
+
+
+def test_tracks_follow_request_order_across_batches(db, playlist, monkeypatch):
+    _, (t0, t1, t2) = playlist
+    # Запрос режется на пачки — выравнивание не должно зависеть от порядка строк из БД
+    monkeypatch.setattr("app.services.availability.BATCH_SIZE", 1)
+    result = resolve_tracks(db, [t1, t2, t1, t0, 999])
+    assert result["track_ids"] == [t1, t2, t0, 999]
+    assert result["platforms"]["spotify"]["ids"] == [None, "sp2", "sp0", None]
+    assert result["platforms"]["youtube"]["ids"] == ["yt1", None, None, None]
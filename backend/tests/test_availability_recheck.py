@@ -0,0 +1,72 @@
+# Перепроверка доступности: пачка на проход рассчитана так, чтобы все строки платформы
+# проверялись раз в RECHECK_INTERVAL; запросы к платформе — по LOOKUP_BATCH id.
+import contextlib
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import update
+from app.models.models import Track, TrackAvailability
+from app.services import availability_recheck
+from app.services.availability_recheck import MAX_BATCH, RECHECK_INTERVAL, TICK, batch_size, recheck_platform
+
+TICKS = RECHECK_INTERVAL.total_seconds() / TICK
+
+
+@pytest.mark.parametrize("total", [0, 1, 999, 10_080, 123_457])
+def test_batch_covers_all_rows_within_interval(total):
+    size = batch_size(total)
+    assert size * TICKS >= total
+    # Не больше одного лишнего прохода на каждую строку: пачка — ceil, а не с запасом
+    assert size <= total / TICKS + 1
+
+
+def test_batch_is_split_between_workers_and_capped():
+    total = 1_000_000
+    assert batch_size(total, share=0.25) == pytest.approx(batch_size(total) / 4, abs=1)
+    assert batch_size(10 ** 9) == MAX_BATCH
+
+
+class FakeLookupService:
+    LOOKUP_BATCH = 2
+
+    def __init__(self, gone):
+        self.gone = gone
+        self.batches = []
+
+    def operation(self):
+        return contextlib.nullcontext()
+
+    def lookup_availability(self, external_ids):
+        self.batches.append(list(external_ids))
+        return {external_id: external_id not in self.gone for external_id in external_ids}
+
+
+def test_recheck_claims_oldest_rows_and_looks_up_in_batches(db, monkeypatch):
+    now = datetime.utcnow()
+    tracks = [Track(title=f"Song {i}", artist="Artist") for i in range(6)]
+    db.add_all(tracks)
+    db.flush()
+    stale = now - RECHECK_INTERVAL - timedelta(hours=1)
+    checked = [
+        None,                          # ещё ни разу не проверялась — первой
+        stale - timedelta(days=3),
+        stale - timedelta(days=2),
+        stale - timedelta(days=1),
+        stale,                         # за пределами limit
+        now - timedelta(hours=1),      # проверена недавно — не трогаем
+    ]
+    for i, (track, last_checked_at) in enumerate(zip(tracks, checked)):
+        db.add(TrackAvailability(track_id=track.id, platform="spotify", external_id=f"sp{i}", last_checked_at=last_checked_at))
+    db.flush()
+    # None в конструкторе заменяется default колонки — NULL пишем явно
+    db.execute(update(TrackAvailability).where(TrackAvailability.external_id == "sp0").values(last_checked_at=None))
+    db.commit()
+    service = FakeLookupService(gone={"sp2"})
+    monkeypatch.setattr(availability_recheck, "_service_for", lambda db_, platform: service)
+
+    assert recheck_platform(db, "spotify", limit=4) == 4
+
+    assert service.batches == [["sp0", "sp1"], ["sp2", "sp3"]]
+    rows = {row.external_id: row for row in db.query(TrackAvailability)}
+    assert [external_id for external_id, row in rows.items() if not row.available] == ["sp2"]
+    assert all(rows[f"sp{i}"].last_checked_at >= now for i in range(4))
+    assert rows["sp4"].last_checked_at == stale
@@ -0,0 +1,107 @@
+# Федеративный поиск: кэш ответов платформ по нормализованному запросу, общий бюджет времени
+# на платформы (опоздавшие и упавшие не кэшируются) и слияние одной записи из разных источников.
+import threading
+import time
+import pytest
+from app.models.models import Track, TrackAvailability
+from app.services import federated_search, track_search
+from app.services.federated_search import TTLCache, normalize_query, search
+
+
+class FakeService:
+    def __init__(self, results=(), delay=0.0, error=None):
+        self.results = list(results)
+        self.delay = delay
+        self.error = error
+        self.queries = []
+        self.release = threading.Event()
+
+    def search(self, query, limit=10):
+        self.queries.append(query)
+        if self.delay:
+            self.release.wait(self.delay)
+        if self.error:
+            raise self.error
+        return self.results[:limit]
+
+
+def _found(id, title="Song", artist="Artist", duration=200):
+    return {"id": id, "title": title, "artist": artist, "duration": duration, "url": f"https://x/{id}"}
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(federated_search, "_cache", TTLCache(federated_search.CACHE_SIZE, federated_search.CACHE_TTL))
+    # Таблицы пересоздаются в каждом тесте — индекс в памяти не должен помнить старые id
+    monkeypatch.setattr(track_search, "_memory_index", track_search.InvertedIndex())
+
+
+def test_normalize_query_folds_only_case_and_whitespace():
+    assert normalize_query("  Song   FEAT. Someone ") == "song feat. someone"
+    assert normalize_query("Song (Remastered)") != normalize_query("Song")
+    assert normalize_query(None) == ""
+
+
+def test_platform_answers_are_cached_by_normalized_query(db):
+    spotify = FakeService([_found("sp1")])
+    first = search(db, "Song Artist", services={"spotify": spotify})
+    assert first["platforms"] == {"spotify": "ok"}
+
+    again = search(db, "  song   ARTIST", services={"spotify": spotify})
+    assert again["platforms"] == {"spotify": "cache"}
+    assert again["results"] == first["results"]
+    assert spotify.queries == ["Song Artist"]
+
+    # Пунктуация меняет выдачу платформы — это другой ключ
+    search(db, "Song - Artist", services={"spotify": spotify})
+    assert spotify.queries == ["Song Artist", "Song - Artist"]
+
+
+def test_slow_and_failing_platforms_do_not_block_or_get_cached(db, monkeypatch):
+    monkeypatch.setattr(federated_search, "PLATFORM_TIMEOUT", 0.2)
+    slow = FakeService([_found("yt1")], delay=5.0)
+    broken = FakeService(error=RuntimeError("quota"))
+    fast = FakeService([_found("sp1")])
+    services = {"youtube": slow, "yandex": broken, "spotify": fast}
+
+    started = time.monotonic()
+    result = search(db, "song", services=services)
+    assert time.monotonic() - started < 1.0
+    slow.release.set()
+
+    assert result["platforms"] == {"youtube": "timeout", "yandex": "error", "spotify": "ok"}
+    assert [item["platforms"] for item in result["results"]] == [{"spotify": {"id": "sp1", "url": "https://x/sp1"}}]
+
+    again = search(db, "song", services=services)
+    assert again["platforms"]["spotify"] == "cache"
+    assert again["platforms"]["youtube"] != "cache"
+    assert again["platforms"]["yandex"] == "error"
+
+
+def test_results_merge_with_local_catalog(db):
+    track = Track(title="Song", artist="Artist", album="Album", duration=183)
+    db.add(track)
+    db.flush()
+    db.add(TrackAvailability(track_id=track.id, platform="yandex", external_id="ya1", url="https://ya/1"))
+    db.commit()
+    services = {
+        "spotify": FakeService([_found("sp1", "Song - Remastered 2011", "Artist, Guest", 186)]),
+        "youtube": FakeService([_found("yt1", "Artist - Song (Official Video)", "ArtistVEVO", None)]),
+    }
+    result = search(db, "song artist", services=services)
+    assert len(result["results"]) == 1
+    item = result["results"][0]
+    assert item["track_id"] == track.id
+    assert set(item["platforms"]) == {"yandex", "spotify", "youtube"}
+
+
+def test_ttl_cache_expires_and_evicts_least_recent():
+    cache = TTLCache(maxsize=2, ttl=0.1)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    time.sleep(0.15)
+    assert cache.get("a") is None
@@ -0,0 +1,47 @@
+# Дифф плейлиста: только вставки, удаления и перестановки относительно сохранённого порядка;
+# применённый через sync_playlist_tracks, он даёт ровно порядок платформы.
+from app.models.models import PlaylistTrack, Track, User, UserPlaylist
+from app.services.playlist_diff import diff_playlist, sync_playlist_tracks
+
+
+def test_unchanged_playlist_is_empty_diff():
+    stored = {10: (1, 0), 11: (2, 1), 12: (3, 2)}
+    assert diff_playlist(stored, [10, 11, 12]).is_empty
+
+
+def test_inserts_deletes_and_moves():
+    stored = {10: (1, 0), 11: (2, 1), 12: (3, 2)}
+    diff = diff_playlist(stored, [12, 10, 13])
+    assert diff.deletes == [2]
+    assert sorted(diff.moves) == [(1, 1), (3, 0)]
+    assert diff.inserts == [(13, 2)]
+
+
+def test_duplicate_platform_entries_keep_first_position():
+    diff = diff_playlist({}, [10, 11, 10])
+    assert diff.inserts == [(10, 0), (11, 1)]
+
+
+def test_stored_rows_without_order_index_are_renumbered():
+    diff = diff_playlist({10: (1, None)}, [10])
+    assert diff.moves == [(1, 0)]
+
+
+def test_sync_applies_diff(db):
+    user = User(email="u@example.com", password_hash="x", nickname="u")
+    db.add(user)
+    db.flush()
+    playlist = UserPlaylist(user_id=user.id, title="p", tracks_number=0)
+    tracks = [Track(title=f"Song {i}", artist="Artist") for i in range(4)]
+    db.add(playlist)
+    db.add_all(tracks)
+    db.flush()
+    ids = [t.id for t in tracks]
+
+    sync_playlist_tracks(db, playlist.id, "spotify", ids[:3])
+    diff = sync_playlist_tracks(db, playlist.id, "spotify", [ids[3], ids[2], ids[0]])
+    assert len(diff.inserts) == len(diff.deletes) == 1
+
+    rows = db.query(PlaylistTrack.track_id).filter_by(playlist_id=playlist.id).order_by(PlaylistTrack.order_index).all()
+    assert [row.track_id for row in rows] == [ids[3], ids[2], ids[0]]
+    assert sync_playlist_tracks(db, playlist.id, "spotify", [ids[3], ids[2], ids[0]]).is_empty
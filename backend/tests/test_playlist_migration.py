@@ -0,0 +1,213 @@
+# Перенос плейлиста против фейкового Spotify (SPOTIFY_API_BASE): промахи ищутся на платформе,
+# известные по tracks_availability — нет; треки добавляются пачками по ADD_TRACKS_BATCH, а
+# упавший на create или add перенос продолжается без дублей на платформе.
+import json
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit, parse_qs
+import pytest
+from app.database import SessionLocal
+from app.models.models import (
+    ConnectedService, PlaylistMigration, PlaylistTrack, Track, TrackAvailability, User, UserPlaylist,
+)
+from app.services.platforms.spotify import SpotifyService
+from app.services.playlist_migration import enqueue_migration, migration_to_dict, run_migration
+
+KNOWN = 30     # треков уже есть в tracks_availability для Spotify
+FOUND = 190    # находятся поиском по ISRC
+MISSING = 10   # на платформе их нет
+
+
+class FakeSpotify:
+    """Минимальный Spotify Web API: поиск по каталогу, профиль, плейлисты аккаунта и запись в них."""
+
+    def __init__(self, catalog):
+        self.catalog = {t["external_ids"]["isrc"]: t for t in catalog}
+        self.playlists = {}  # id -> {"name", "uris"}
+        self.searches = []
+        self.adds = []
+        self.calls = Counter()
+        self.fail = {}  # "create" / "add" -> (номер запроса, применить ли его, прежде чем ответить 500)
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        url = urlsplit(request.url)
+        path = url.path[len("/v1"):]
+        query = parse_qs(url.query)
+        with self._lock:
+            if request.method == "GET" and path == "/me":
+                return 200, {"id": "fake-user"}
+            if request.method == "GET" and path == "/search":
+                return 200, self._search(query["q"][0])
+            if request.method == "GET" and path == "/me/playlists":
+                offset = int(query["offset"][0])
+                items = [
+                    {"id": pid, "name": pl["name"], "tracks": {"total": len(pl["uris"])}, "images": []}
+                    for pid, pl in self.playlists.items()
+                ]
+                return 200, {"items": items[offset:offset + int(query["limit"][0])]}
+            if request.method == "POST" and path == "/users/fake-user/playlists":
+                return self._write("create", lambda: self._create(request))
+            if request.method == "POST" and path.endswith("/tracks"):
+                pid = path.split("/")[2]
+                return self._write("add", lambda: self._add(pid, request))
+            if request.method == "GET" and path.startswith("/playlists/"):
+                return 200, {"tracks": {"total": len(self.playlists[path.split("/")[2]]["uris"])}}
+        return 404, None
+
+    def _search(self, q):
+        self.searches.append(q)
+        found = self.catalog.get(q[len("isrc:"):]) if q.startswith("isrc:") else None
+        return {"tracks": {"items": [found] if found else []}}
+
+    def _write(self, kind, apply):
+        self.calls[kind] += 1
+        nth, applied = self.fail.get(kind, (None, False))
+        if self.calls[kind] == nth:
+            # Ответ потерялся: запрос мог и выполниться на платформе
+            if applied:
+                apply()
+            return 500, None
+        return 201, apply()
+
+    def _create(self, request):
+        pid = f"pl{len(self.playlists) + 1}"
+        self.playlists[pid] = {"name": json.loads(request.body)["name"], "uris": []}
+        return {"id": pid}
+
+    def _add(self, pid, request):
+        uris = json.loads(request.body)["uris"]
+        self.adds.append(uris)
+        self.playlists[pid]["uris"].extend(uris)
+        return {"snapshot_id": str(len(self.adds))}
+
+
+def _api_track(i):
+    return {
+        "id": f"sp{i}",
+        "name": f"Song {i}",
+        "artists": [{"name": f"Artist {i}"}],
+        "album": {"name": "Album", "images": []},
+        "duration_ms": 200_000,
+        "external_ids": {"isrc": f"ISRC{i:08d}"},
+    }
+
+
+@pytest.fixture
+def migration_id(db):
+    user = User(email="u@example.com", password_hash="x", nickname="u")
+    db.add(user)
+    db.flush()
+    db.add(ConnectedService(
+        user_id=user.id, platform="spotify", external_user_id="fake-user",
+        access_token="token", expires_at=datetime.utcnow() + timedelta(hours=1),
+    ))
+    playlist = UserPlaylist(user_id=user.id, title="Road trip", source_platform="youtube", tracks_number=0)
+    db.add(playlist)
+    db.flush()
+    total = KNOWN + FOUND + MISSING
+    for i in range(total):
+        track = Track(title=f"Song {i}", artist=f"Artist {i}", duration=200, isrc=f"ISRC{i:08d}")
+        db.add(track)
+        db.flush()
+        db.add(PlaylistTrack(playlist_id=playlist.id, track_id=track.id, order_index=i))
+        if i < KNOWN:
+            db.add(TrackAvailability(track_id=track.id, platform="spotify", external_id=f"sp{i}"))
+    playlist.tracks_number = total
+    db.commit()
+    return enqueue_migration(db, user.id, playlist.id, "spotify").id
+
+
+@pytest.fixture
+def spotify(fake_http):
+    assert SpotifyService.BASE_URL == "http://spotify.test/v1"
+    # В каталоге всё, кроме последних MISSING треков плейлиста
+    server = FakeSpotify([_api_track(i) for i in range(KNOWN + FOUND)])
+    fake_http(server)
+    return server
+
+
+def _migration(migration_id):
+    db = SessionLocal()
+    try:
+        return migration_to_dict(db.get(PlaylistMigration, migration_id))
+    finally:
+        db.close()
+
+
+def _expected_uris():
+    return [f"spotify:track:sp{i}" for i in range(KNOWN + FOUND)]
+
+
+def test_searches_only_unknown_tracks_and_adds_in_batches(spotify, migration_id):
+    run_migration(migration_id)
+
+    migration = _migration(migration_id)
+    assert migration["status"] == "done"
+    assert migration["stage"] == "done"
+    assert migration["total_tracks"] == KNOWN + FOUND + MISSING
+    assert migration["matched_tracks"] == KNOWN + FOUND
+    assert migration["searched_tracks"] == FOUND + MISSING
+    assert migration["missing_tracks"] == MISSING
+    assert migration["tracks_to_add"] == migration["added_tracks"] == KNOWN + FOUND
+
+    # Известные по tracks_availability на платформе не ищутся; промах ISRC добирается текстовым поиском
+    isrc_searches = {q for q in spotify.searches if q.startswith("isrc:")}
+    assert isrc_searches == {f"isrc:ISRC{i:08d}" for i in range(KNOWN, KNOWN + FOUND + MISSING)}
+    assert len(spotify.searches) == FOUND + 2 * MISSING
+
+    assert [len(uris) for uris in spotify.adds] == [100, 100, 20]
+    assert list(spotify.playlists) == ["pl1"]
+    assert spotify.playlists["pl1"]["uris"] == _expected_uris()
+
+    # Найденное сохранено как доступность: повторный перенос искать уже не будет
+    db = SessionLocal()
+    try:
+        assert db.query(TrackAvailability).filter_by(platform="spotify").count() == KNOWN + FOUND
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("applied", [True, False])
+def test_resumes_after_failed_create(spotify, migration_id, applied):
+    spotify.fail["create"] = (1, applied)
+    run_migration(migration_id)
+
+    migration = _migration(migration_id)
+    assert migration["status"] == "queued"
+    assert migration["stage"] == "creating"
+    assert migration["target_playlist_id"] is None
+    assert len(spotify.playlists) == (1 if applied else 0)
+
+    searches = len(spotify.searches)
+    run_migration(migration_id)
+
+    migration = _migration(migration_id)
+    assert migration["status"] == "done"
+    # Плейлист, созданный упавшей попыткой, подхвачен, а не создан второй раз; поиск не повторялся
+    assert list(spotify.playlists) == ["pl1"]
+    assert migration["target_playlist_id"] == "pl1"
+    assert len(spotify.searches) == searches
+    assert spotify.playlists["pl1"]["uris"] == _expected_uris()
+
+
+@pytest.mark.parametrize("applied", [True, False])
+def test_resumes_after_failed_add(spotify, migration_id, applied):
+    spotify.fail["add"] = (2, applied)
+    run_migration(migration_id)
+
+    migration = _migration(migration_id)
+    assert migration["status"] == "queued"
+    assert migration["stage"] == "adding"
+    assert migration["added_tracks"] == 100
+
+    run_migration(migration_id)
+
+    migration = _migration(migration_id)
+    assert migration["status"] == "done"
+    assert migration["added_tracks"] == KNOWN + FOUND
+    # Дошедшая пачка засчитана по размеру плейлиста, не дошедшая — отправлена снова
+    assert spotify.playlists["pl1"]["uris"] == _expected_uris()
+    assert [len(uris) for uris in spotify.adds] == [100, 100, 20]
+    assert spotify.calls["add"] == (3 if applied else 4)
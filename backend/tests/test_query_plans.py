@@ -0,0 +1,51 @@
+# Регрессия планов горячих запросов: keyset-страницы треков плейлиста, список плейлистов
+# пользователя и поиск треков по key_prefix должны идти по индексам, а не полным сканированием.
+# По умолчанию — sqlite в памяти; TEST_DATABASE_URL=postgresql://... проверяет планы Postgres.
+import os
+import pytest
+from sqlalchemy import create_engine, select, text
+from app.models.models import Base, Track, UserPlaylist
+from app.routers.playlists import _tracks_query
+
+
+@pytest.fixture
+def conn():
+    engine = create_engine(os.getenv("TEST_DATABASE_URL", "sqlite://"))
+    with engine.connect() as conn:
+        trans = conn.begin()
+        Base.metadata.create_all(conn)
+        if conn.dialect.name == "postgresql":
+            # На пустых таблицах seq scan всегда дешевле — проверяем, что индекс вообще применим
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+        yield conn
+        trans.rollback()
+    engine.dispose()
+
+
+def explain(conn, stmt):
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "sqlite":
+        return "\n".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+    return "\n".join(row[0] for row in conn.execute(text(f"EXPLAIN {sql}")))
+
+
+@pytest.mark.parametrize("after", [None, (10, 100)])
+def test_playlist_tracks_page_uses_order_index(conn, after):
+    plan = explain(conn, _tracks_query(1, after=after, limit=50))
+    assert "ix_playlist_tracks_playlist_order" in plan, plan
+    if conn.dialect.name == "sqlite":
+        # Порядок (order_index, id) отдаёт индекс — без отдельной сортировки страницы
+        assert "USE TEMP B-TREE FOR ORDER BY" not in plan, plan
+
+
+def test_user_playlists_by_platform_uses_index(conn):
+    stmt = select(UserPlaylist.id).where(UserPlaylist.user_id == 1, UserPlaylist.source_platform == "spotify")
+    plan = explain(conn, stmt)
+    assert "ix_user_playlists_user_platform_external" in plan, plan
+
+
+def test_tracks_by_key_prefix_uses_index(conn):
+    # sync_writer ищет строки записи с любой длительностью по key_prefix, а не LIKE по track_key
+    stmt = select(Track.id, Track.key_prefix).where(Track.key_prefix.in_(["artist|song|", "other|song|"]))
+    plan = explain(conn, stmt)
+    assert "ix_tracks_key_prefix" in plan, plan
@@ -0,0 +1,107 @@
+# Breaker и token bucket платформ: breaker открывается после FAILURE_THRESHOLD ошибок подряд,
+# через open_timeout пропускает ровно один пробный запрос; bucket выдаёт burst сразу, дальше —
+# с ожиданием по rate, а Retry-After останавливает выдачу для всех.
+import time
+import pytest
+from app.services import resilience
+from app.services.resilience import CircuitBreaker, PlatformUnavailable, RequestGuard, TokenBucket
+
+OPEN = 0.05
+
+
+def _open_breaker(threshold=3):
+    breaker = CircuitBreaker("spotify", threshold=threshold, open_timeout=OPEN)
+    for _ in range(threshold):
+        breaker.check()
+        breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker("spotify", threshold=3, open_timeout=OPEN)
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.check()
+    breaker.record_failure()
+    with pytest.raises(PlatformUnavailable) as e:
+        breaker.check()
+    assert e.value.platform == "spotify"
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker("spotify", threshold=3, open_timeout=OPEN)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.check()
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = _open_breaker()
+    time.sleep(OPEN * 1.5)
+    breaker.check()
+    # Пока пробный запрос не вернулся, остальные ждут
+    with pytest.raises(PlatformUnavailable):
+        breaker.check()
+    breaker.record_success()
+    breaker.check()
+    breaker.check()
+
+
+def test_failed_probe_reopens_immediately():
+    breaker = _open_breaker()
+    time.sleep(OPEN * 1.5)
+    breaker.check()
+    breaker.record_failure()
+    with pytest.raises(PlatformUnavailable):
+        breaker.check()
+
+
+def test_released_or_lost_probe_frees_the_slot(monkeypatch):
+    breaker = _open_breaker()
+    time.sleep(OPEN * 1.5)
+    breaker.check()
+    breaker.release_probe()
+    breaker.check()
+    # Пробный запрос без исхода дольше PROBE_TIMEOUT тоже освобождает слот
+    monkeypatch.setattr(resilience, "PROBE_TIMEOUT", OPEN)
+    time.sleep(OPEN * 1.5)
+    breaker.check()
+
+
+def test_guard_releases_probe_when_send_raises(monkeypatch):
+    breaker = _open_breaker()
+    monkeypatch.setitem(resilience._breakers, "spotify", breaker)
+    guard = RequestGuard("spotify", account=1)
+    time.sleep(OPEN * 1.5)
+
+    def send():
+        raise ValueError("unexpected")
+
+    with pytest.raises(ValueError):
+        guard.call(send)
+    breaker.check()
+
+
+def test_bucket_gives_burst_then_waits_by_rate():
+    bucket = TokenBucket(rate=10.0, capacity=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Токены выдаются в долг: каждый следующий ждёт ещё 1/rate
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.02)
+
+
+def test_bucket_refills_up_to_capacity():
+    bucket = TokenBucket(rate=100.0, capacity=2)
+    bucket.reserve()
+    bucket.reserve()
+    time.sleep(0.1)
+    assert [bucket.reserve() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.reserve() > 0
+
+
+def test_bucket_pause_holds_everyone():
+    bucket = TokenBucket(rate=10.0, capacity=5)
+    bucket.pause(2.0)
+    assert bucket.reserve() == pytest.approx(2.1, abs=0.05)
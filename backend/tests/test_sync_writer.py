@@ -0,0 +1,95 @@
+# upsert_tracks: одна строка tracks на запись — по ISRC, затем по track_key среди строк того же
+# исполнителя и названия (key_prefix) с допуском в соседнюю корзину длительности.
+from app.models.models import Track
+from app.services.sync_writer import upsert_tracks
+
+
+def _track(title="Song", artist="Artist", duration=None, isrc=None):
+    return {"title": title, "artist": artist, "duration": duration, "isrc": isrc}
+
+
+def _rows(db):
+    return db.query(Track.id, Track.track_key, Track.duration).order_by(Track.id).all()
+
+
+def test_neighbouring_bucket_is_same_recording(db):
+    first, = upsert_tracks(db, [_track(duration=183)])
+    second, = upsert_tracks(db, [_track(duration=186)])
+    assert first == second
+    assert len(_rows(db)) == 1
+
+
+def test_unknown_duration_matches_any_bucket(db):
+    timed, = upsert_tracks(db, [_track(duration=183)])
+    youtube, = upsert_tracks(db, [_track("Song (Official Video)")])
+    assert youtube == timed
+
+
+def test_bucketless_row_takes_bucket_of_first_timed_match(db):
+    youtube, = upsert_tracks(db, [_track()])
+    short, = upsert_tracks(db, [_track(duration=183)])
+    long, = upsert_tracks(db, [_track(duration=240)])
+    # Строка с YouTube стала записью на 183 с; 240 с — другая запись, а не ещё одна длительность той же строки
+    assert short == youtube
+    assert long != youtube
+    assert [(row.track_key, row.duration) for row in _rows(db)] == [
+        ("artist|song|18", 183), ("artist|song|24", 240),
+    ]
+
+
+def test_bucketless_row_not_used_when_bucketed_rows_exist(db):
+    short, = upsert_tracks(db, [_track(duration=183)])
+    db.add(Track(title="Song", artist="Artist", track_key="artist|song|", key_prefix="artist|song|"))
+    db.flush()
+    long, = upsert_tracks(db, [_track(duration=240)])
+    assert long != short
+    assert len(_rows(db)) == 3
+
+
+def test_versions_in_one_batch_collapse_into_one_row(db):
+    ids = upsert_tracks(db, [
+        _track(duration=183),
+        _track(duration=186),
+        _track("Song - Remastered 2011"),
+    ])
+    assert len(set(ids)) == 1
+    assert [(row.track_key, row.duration) for row in _rows(db)] == [("artist|song|18", 183)]
+
+
+def test_bucketless_track_first_in_batch_takes_timed_bucket(db):
+    ids = upsert_tracks(db, [
+        _track("Song (Official Video)"),
+        _track(duration=183),
+        _track(duration=240),
+    ])
+    assert ids[0] == ids[1] != ids[2]
+    assert [(row.track_key, row.duration) for row in _rows(db)] == [
+        ("artist|song|18", 183), ("artist|song|24", 240),
+    ]
+
+
+def test_isrc_match_wins_over_title(db):
+    spotify, = upsert_tracks(db, [_track("Song", duration=183, isrc="USABC1234567")])
+    # Другое написание и длительность вне соседних корзин, но тот же ISRC — та же запись
+    yandex, = upsert_tracks(db, [_track("Song (Live Version)", duration=250, isrc="us-abc-12-34567")])
+    assert yandex == spotify
+    assert len(_rows(db)) == 1
+
+
+def test_isrc_backfilled_on_key_match(db):
+    youtube, = upsert_tracks(db, [_track(duration=183)])
+    spotify, = upsert_tracks(db, [_track(duration=184, isrc="USABC1234567")])
+    assert spotify == youtube
+    assert db.get(Track, youtube).isrc == "USABC1234567"
+    # Следующий трек с этим ISRC находится по нему, даже если ключ не совпадает
+    other, = upsert_tracks(db, [_track("Totally Different", isrc="USABC1234567")])
+    assert other == youtube
+
+
+def test_isrc_match_wins_over_key_match(db):
+    first, = upsert_tracks(db, [_track("Other", duration=200, isrc="USABC1234567")])
+    keyed, = upsert_tracks(db, [_track(duration=183)])
+    # Ключ совпадает со строкой без ISRC, но ISRC уже носит другая строка — резолвим по нему
+    again, = upsert_tracks(db, [_track(duration=183, isrc="USABC1234567")])
+    assert again == first != keyed
+    assert db.get(Track, keyed).isrc is None
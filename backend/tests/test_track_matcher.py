@@ -0,0 +1,46 @@
+# match_groups: у каждого трека своя выдача поиска — лучший кандидат ищется только среди неё,
+# даже если чужая выдача совпадает лучше (все группы считаются одним умножением матриц).
+import pytest
+from app.services import track_matcher
+from app.services.track_matcher import match_groups
+
+
+def _t(title, artist, duration=None, id=None):
+    return {"id": id, "title": title, "artist": artist, "duration": duration}
+
+
+TRACKS = [
+    _t("Yesterday", "The Beatles", 125),
+    _t("Bohemian Rhapsody", "Queen", 354),
+    _t("Smells Like Teen Spirit", "Nirvana", 301),
+]
+
+
+def _groups():
+    return [
+        # Своя выдача первого трека — только чужие песни; его точная копия лежит во второй группе
+        [_t("Let It Be", "The Beatles", 243, "a1")],
+        [_t("Yesterday", "The Beatles", 125, "b1"), _t("Bohemian Rhapsody (Remastered 2011)", "Queen", 355, "b2")],
+        [],
+    ]
+
+
+@pytest.mark.parametrize("block_size", [track_matcher.BLOCK_SIZE, 1, 2])
+def test_candidates_of_other_tracks_are_masked(monkeypatch, block_size):
+    # Маска владельцев должна совпадать с кандидатами и на стыках блоков
+    monkeypatch.setattr(track_matcher, "BLOCK_SIZE", block_size)
+    first, second, third = match_groups(TRACKS, _groups())
+    assert first is None
+    assert second["candidate"]["id"] == "b2"
+    assert second["confidence"] >= track_matcher.MIN_CONFIDENCE
+    assert third is None
+
+
+def test_best_candidate_within_own_group():
+    result = match_groups(TRACKS[:1], [[_t("Let It Be", "The Beatles", 243, "x"), _t("Yesterday", "The Beatles", 126, "y")]])
+    assert result[0]["candidate"]["id"] == "y"
+
+
+def test_no_candidates_at_all():
+    assert match_groups(TRACKS, [[], [], []]) == [None, None, None]
+    assert match_groups([], []) == []
@@ -0,0 +1,46 @@
+# Поиск по локальному каталогу на sqlite: инвертированный индекс в памяти — все слова
+# обязательны, последнее ищется по префиксу, новые строки tracks дочитываются по id.
+import pytest
+from app.models.models import Track
+from app.services import track_search
+from app.services.track_search import InvertedIndex, search_tracks
+
+
+@pytest.fixture
+def catalog(db, monkeypatch):
+    monkeypatch.setattr(track_search, "_memory_index", InvertedIndex())
+    db.add_all([
+        Track(title="Yesterday", artist="The Beatles", album="Help!", duration=125),
+        Track(title="Let It Be", artist="The Beatles", album="Let It Be", duration=243),
+        Track(title="Yesterday Once More", artist="Carpenters", album="Now & Then", duration=238),
+        Track(title="Bohemian Rhapsody", artist="Queen", album="A Night at the Opera", duration=354),
+    ])
+    db.commit()
+    return db
+
+
+def _titles(results):
+    return [row["title"] for row in results]
+
+
+def test_all_words_required(catalog):
+    assert _titles(search_tracks(catalog, "yesterday beatles")) == ["Yesterday"]
+    assert search_tracks(catalog, "yesterday queen") == []
+
+
+def test_last_word_matches_by_prefix(catalog):
+    assert _titles(search_tracks(catalog, "bohemian rhaps")) == ["Bohemian Rhapsody"]
+    assert set(_titles(search_tracks(catalog, "yester"))) == {"Yesterday", "Yesterday Once More"}
+
+
+def test_new_rows_are_picked_up_and_limit_applies(catalog):
+    assert search_tracks(catalog, "hey jude") == []
+    catalog.add(Track(title="Hey Jude", artist="The Beatles", duration=431))
+    catalog.commit()
+    assert _titles(search_tracks(catalog, "hey jude")) == ["Hey Jude"]
+    assert len(search_tracks(catalog, "beatles", limit=2)) == 2
+
+
+def test_empty_query(catalog):
+    assert search_tracks(catalog, "   ") == []
+    assert search_tracks(catalog, "!!!") == []
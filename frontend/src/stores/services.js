@@ -6,6 +6,7 @@ export const useServicesStore = defineStore('services', {
     playlists: {}, // { [platform]: Playlist[] }
     favorites: {}, // { [platform]: Track[] }
     favoritesTotal: 0,
+    availability: {}, // { [playlistId]: { track_ids, platforms: { [platform]: { ids, urls } } } }
     loading: false,
     error: '',
   }),
@@ -26,19 +27,54 @@ export const useServicesStore = defineStore('services', {
         this.loading = false;
       }
     },
-    async fetchPlaylistTracks(userId, playlistId, platform) {
+    async fetchPlaylistTracks(userId, playlistId, platform, onProgress) {
       if (!userId || !playlistId || !platform) return;
       const pl = this.playlists[platform]?.find(p => String(p.id) === String(playlistId));
       if (pl && pl.tracks && pl.tracks.length > 0) return;
+      // Один реактивный массив на весь поток: строки дописываются в него, без копий на каждую порцию
+      let tracks = [];
+      if (pl) {
+        pl.tracks = tracks;
+        tracks = pl.tracks;
+      }
       try {
-        const res = await axios.get(`/playlists/${playlistId}/tracks`, { params: { platform, user_id: userId }, withCredentials: true });
-        this.playlists[platform] = this.playlists[platform].map(pl =>
-          String(pl.id) === String(playlistId)
-            ? { ...pl, tracks: res.data.tracks || [] }
-            : pl
-        );
+        // NDJSON: по треку на строку — показываем их по мере прихода, не дожидаясь всего плейлиста
+        const params = new URLSearchParams({ platform, user_id: userId, stream: 'true' });
+        const res = await fetch(`/playlists/${playlistId}/tracks?${params}`, { credentials: 'include' });
+        if (!res.ok || !res.body) throw new Error(`Failed to load tracks for playlist ${playlistId}`);
+        const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        while (true) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += value;
+          const lines = buffer.split('\n');
+          buffer = lines.pop();
+          for (const line of lines) {
+            if (line) tracks.push(JSON.parse(line));
+          }
+          if (onProgress) onProgress(tracks);
+        }
+        if (buffer.trim()) tracks.push(JSON.parse(buffer));
+        if (onProgress) onProgress(tracks);
       } catch (e) {
-        this.error = e?.response?.data?.detail || e?.message || `Failed to load tracks for playlist ${playlistId}`;
+        // Оборванный поток не оставляет в сторе часть плейлиста: пустой список загрузится заново
+        tracks.splice(0);
+        if (onProgress) onProgress(tracks);
+        this.error = e?.message || `Failed to load tracks for playlist ${playlistId}`;
+      }
+    },
+    async fetchPlaylistAvailability(playlistId, platforms) {
+      if (!playlistId) return null;
+      try {
+        // Один запрос на весь плейлист: по массиву id/ссылок на платформу в порядке треков
+        const params = platforms ? { platforms: platforms.join(',') } : {};
+        const res = await axios.get(`/availability/playlists/${playlistId}`, { params, withCredentials: true });
+        this.availability[playlistId] = res.data;
+        return res.data;
+      } catch (e) {
+        this.error = e?.response?.data?.detail || e?.message || `Failed to load availability for playlist ${playlistId}`;
+        return null;
       }
     },
     async fetchFavorites(userId, platform) {